@@ -0,0 +1,95 @@
+"""
+Write-coalesced tracking of ``User.last_active``.
+
+Requests record activity into a Redis hash (user id -> timestamp) instead of
+writing the users table. The ``flush_last_active`` command, run every
+``ACTIVITY_FLUSH_INTERVAL`` outside the request path, drains the hash and
+applies it with one ``UPDATE ... FROM (VALUES ...)`` statement per chunk.
+Tracking is best-effort: with Redis unavailable activity is not recorded
+and reads fall back to the stored column.
+"""
+
+import logging
+from datetime import datetime, timezone as dt_timezone
+
+from redis import RedisError
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from africanmealplanner.caching import LocalTTLCache, get_redis
+from .models import User
+
+BUFFER_KEY = 'activity:last-active'
+FLUSHING_KEY = 'activity:last-active:flushing'
+FLUSH_CHUNK_SIZE = 1000
+
+# Users recorded recently by this process; skips redundant Redis writes.
+_recently_recorded = LocalTTLCache(ttl=settings.ACTIVITY_RECORD_INTERVAL)
+
+logger = logging.getLogger(__name__)
+
+
+def record_activity(user_id, when=None):
+    """Buffer an activity timestamp for ``user_id``"""
+    if _recently_recorded.get(user_id):
+        return
+    _recently_recorded.set(user_id, True)
+    when = when or timezone.now()
+    try:
+        get_redis().hset(BUFFER_KEY, user_id, when.timestamp())
+    except RedisError:
+        logger.warning("Could not record activity of user %s", user_id, exc_info=True)
+
+
+def get_last_active(user):
+    """Return ``user.last_active`` merged with any buffered, unflushed value"""
+    pipe = get_redis().pipeline()
+    pipe.hget(BUFFER_KEY, user.pk)
+    pipe.hget(FLUSHING_KEY, user.pk)
+    try:
+        buffered = [float(value) for value in pipe.execute() if value is not None]
+    except RedisError:
+        logger.warning("Could not read buffered activity of user %s", user.pk, exc_info=True)
+        return user.last_active
+    if not buffered:
+        return user.last_active
+    latest = datetime.fromtimestamp(max(buffered), tz=dt_timezone.utc)
+    if user.last_active and user.last_active > latest:
+        return user.last_active
+    return latest
+
+
+def flush_last_active():
+    """Write all buffered timestamps to the users table; returns rows sent"""
+    redis_client = get_redis()
+    # A previous flush may have died after claiming the buffer; drain it
+    # first so RENAME below does not overwrite it.
+    if not redis_client.exists(FLUSHING_KEY):
+        if not redis_client.exists(BUFFER_KEY):
+            return 0
+        redis_client.rename(BUFFER_KEY, FLUSHING_KEY)
+
+    entries = redis_client.hgetall(FLUSHING_KEY)
+    rows = [
+        (int(user_id), datetime.fromtimestamp(float(ts), tz=dt_timezone.utc))
+        for user_id, ts in entries.items()
+    ]
+    with transaction.atomic():
+        for start in range(0, len(rows), FLUSH_CHUNK_SIZE):
+            _bulk_update_last_active(rows[start:start + FLUSH_CHUNK_SIZE])
+    redis_client.delete(FLUSHING_KEY)
+    return len(rows)
+
+
+def _bulk_update_last_active(rows):
+    table = connection.ops.quote_name(User._meta.db_table)
+    values_sql = ', '.join(['(%s::bigint, %s::timestamptz)'] * len(rows))
+    params = [value for row in rows for value in row]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} AS u SET last_active = v.last_active "
+            f"FROM (VALUES {values_sql}) AS v(id, last_active) "
+            f"WHERE u.id = v.id "
+            f"AND (u.last_active IS NULL OR u.last_active < v.last_active)",
+            params
+        )
@@ -81,7 +81,7 @@ class UserProfileAdmin(admin.ModelAdmin):
         'dietary_preferences', 'fitness_goals'
     ]
     
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['bmr', 'daily_calories', 'created_at', 'updated_at']
     
     fieldsets = (
         ('User', {
@@ -90,7 +90,7 @@ class UserProfileAdmin(admin.ModelAdmin):
         ('Health Information', {
             'fields': (
                 'health_conditions', 'allergies', 'daily_calorie_target',
-                'daily_water_target', 'activity_level'
+                'daily_water_target', 'activity_level', 'bmr', 'daily_calories'
             )
         }),
         ('Dietary Preferences', {
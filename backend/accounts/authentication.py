@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from africanmealplanner.caching import LocalTTLCache
+from .models import User
+
+# Bump the version when CACHED_USER_FIELDS changes so old tuples are ignored
+CACHE_KEY_PREFIX = 'auth-token:v2:'
+
+# The columns views and serializers read from request.user. Credentials
+# (password, last_login) are never cached; the rest are deferred and load
+# from the database on first access.
+CACHED_USER_FIELDS = (
+    'id', 'username', 'email', 'first_name', 'last_name',
+    'is_active', 'is_staff', 'is_superuser', 'date_joined',
+    'phone_number', 'date_of_birth', 'gender', 'height', 'weight',
+    'country', 'city', 'location', 'cooking_level', 'family_size',
+    'bio', 'avatar', 'notifications_enabled', 'location_enabled',
+    'offline_mode', 'created_at', 'updated_at', 'last_active',
+)
+# In model order, which is how ``Model.from_db`` matches partial values
+_CACHED_FIELDS = tuple(field for field in User._meta.concrete_fields if field.attname in CACHED_USER_FIELDS)
+
+_local_cache = LocalTTLCache(
+    ttl=settings.TOKEN_CACHE_LOCAL_TTL,
+    maxsize=settings.TOKEN_CACHE_LOCAL_SIZE,
+)
+
+
+def _cache_key(key):
+    return f"{CACHE_KEY_PREFIX}{key}"
+
+
+def _user_from_values(values):
+    """Rebuild a fresh User instance from cached column values"""
+    return User.from_db('default', [field.attname for field in _CACHED_FIELDS], values)
+
+
+def invalidate_token(key):
+    """Drop a single token from the process and shared caches"""
+    _local_cache.delete(key)
+    cache.delete(_cache_key(key))
+
+
+def invalidate_user_tokens(user):
+    """Drop every token belonging to ``user`` from the caches"""
+    keys = list(Token.objects.filter(user_id=user.pk).values_list('key', flat=True))
+    for key in keys:
+        _local_cache.delete(key)
+    if keys:
+        cache.delete_many([_cache_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that caches the token -> user lookup.
+
+    Lookups are served from a short-lived per-process cache, then from the
+    shared cache (Redis), and only then from the database. Tokens are
+    invalidated explicitly on logout, password change, account deletion and
+    user updates; the TTLs bound staleness for anything else. Invalidation
+    only reaches the local cache of the process that handles it, so a
+    revoked token stays valid in other workers for up to
+    ``TOKEN_CACHE_LOCAL_TTL`` seconds.
+    """
+
+    def authenticate_credentials(self, key):
+        values = _local_cache.get(key)
+        if values is None:
+            values = cache.get(_cache_key(key))
+            if values is None:
+                try:
+                    token = Token.objects.select_related('user').get(key=key)
+                except Token.DoesNotExist:
+                    raise exceptions.AuthenticationFailed('Invalid token.')
+                values = tuple(
+                    field.get_prep_value(field.value_from_object(token.user))
+                    for field in _CACHED_FIELDS
+                )
+                cache.set(_cache_key(key), values, settings.TOKEN_CACHE_TTL)
+            _local_cache.set(key, values)
+
+        user = _user_from_values(values)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+        token = Token(key=key, user=user)
+        token._state.adding = False
+        return (user, token)
@@ -0,0 +1,57 @@
+"""
+Versioned bootstrap payload of every reference vocabulary the app needs
+during onboarding and on the profile screen.
+"""
+
+import hashlib
+import json
+from collections import namedtuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+from africanmealplanner.caching import GenerationalSnapshot
+from recipes.models import Region, Cuisine, Ingredient
+from recipes.serializers import RegionSerializer, CuisineSerializer, IngredientSerializer
+from .models import HealthCondition, Allergy, DietaryPreference, FitnessGoal, Achievement
+from .serializers import (
+    HealthConditionSerializer, AllergySerializer, DietaryPreferenceSerializer,
+    FitnessGoalSerializer, AchievementSerializer
+)
+
+ReferenceData = namedtuple('ReferenceData', ['version', 'body'])
+
+# Models whose writes invalidate the payload
+REFERENCE_MODELS = (
+    Region, Cuisine, Ingredient, HealthCondition, Allergy,
+    DietaryPreference, FitnessGoal, Achievement,
+)
+
+
+def build_reference_data():
+    data = {
+        'regions': RegionSerializer(Region.objects.all(), many=True).data,
+        'cuisines': CuisineSerializer(
+            Cuisine.objects.select_related('region'), many=True
+        ).data,
+        'ingredients': IngredientSerializer(
+            Ingredient.objects.filter(is_active=True).prefetch_related('common_regions'),
+            many=True
+        ).data,
+        'health_conditions': HealthConditionSerializer(
+            HealthCondition.objects.all(), many=True
+        ).data,
+        'allergies': AllergySerializer(Allergy.objects.all(), many=True).data,
+        'dietary_preferences': DietaryPreferenceSerializer(
+            DietaryPreference.objects.all(), many=True
+        ).data,
+        'fitness_goals': FitnessGoalSerializer(FitnessGoal.objects.all(), many=True).data,
+        'achievements': AchievementSerializer(
+            Achievement.objects.filter(is_active=True), many=True
+        ).data,
+    }
+    content = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+    version = hashlib.sha256(content.encode()).hexdigest()[:20]
+    body = '{"version": "%s", "data": %s}' % (version, content)
+    return ReferenceData(version=version, body=body.encode())
+
+
+reference_data = GenerationalSnapshot('reference-data', build_reference_data)
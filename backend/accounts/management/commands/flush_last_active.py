@@ -0,0 +1,30 @@
+import time
+
+from redis import RedisError
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from accounts.activity import flush_last_active
+
+
+class Command(BaseCommand):
+    help = 'Write buffered last-active timestamps to the users table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep flushing every ACTIVITY_FLUSH_INTERVAL seconds instead of once'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                count = flush_last_active()
+            except RedisError as error:
+                if not options['loop']:
+                    raise
+                self.stderr.write(f'Could not flush last_active: {error}')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'Flushed last_active for {count} users'))
+            if not options['loop']:
+                break
+            time.sleep(settings.ACTIVITY_FLUSH_INTERVAL)
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from accounts.models import UserProfile
+from accounts.targets import birthday_profile_ids, recompute_calorie_targets, CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Recompute cached BMR, daily calories and calorie targets of user profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--birthdays', action='store_true',
+            help="Only profiles whose user's age changed today (run daily)"
+        )
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options['birthdays']:
+            profile_ids = birthday_profile_ids()
+        else:
+            profile_ids = list(UserProfile.objects.order_by('pk').values_list('pk', flat=True))
+        updated = recompute_calorie_targets(profile_ids, chunk_size=options['chunk_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed calorie targets of {updated} profiles in {elapsed:.1f}s'
+        ))
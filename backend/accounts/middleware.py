@@ -0,0 +1,33 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from .activity import record_activity
+
+
+class LastActiveMiddleware:
+    """Buffer last-active timestamps for authenticated requests"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Under ASGI, staying async keeps async views off the sync thread
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self.record(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        await sync_to_async(self.record)(request)
+        return response
+
+    def record(self, request):
+        # DRF writes the authenticated user back onto the Django request,
+        # so token-authenticated API calls are covered here as well.
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            record_activity(user.pk)
@@ -1,9 +1,11 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
+from africanmealplanner.tracking import FieldTrackerMixin
 
 
-class User(AbstractUser):
+class User(FieldTrackerMixin, AbstractUser):
     """Custom User model with additional fields for African Meal Planner"""
     
     GENDER_CHOICES = [
@@ -68,11 +70,18 @@ class User(AbstractUser):
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    last_active = models.DateTimeField(auto_now=True)
+    last_active = models.DateTimeField(
+        default=timezone.now,
+        help_text="Flushed periodically from the activity buffer; read via accounts.activity.get_last_active"
+    )
     
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
     
+    # Inputs to the profile's cached BMR and daily calorie figures
+    BODY_METRIC_FIELDS = ('weight', 'height', 'date_of_birth', 'gender')
+    tracked_fields = BODY_METRIC_FIELDS
+    
     class Meta:
         db_table = 'users'
         verbose_name = 'User'
@@ -110,6 +119,8 @@ class HealthCondition(models.Model):
         help_text="Comma-separated list of dietary restrictions"
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Compared with RecipeCompatibility.computed_at to find stale results
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'health_conditions'
@@ -161,6 +172,7 @@ class DietaryPreference(models.Model):
         help_text="Comma-separated list of restricted food categories"
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'dietary_preferences'
@@ -170,7 +182,7 @@ class DietaryPreference(models.Model):
         return self.name
 
 
-class FitnessGoal(models.Model):
+class FitnessGoal(FieldTrackerMixin, models.Model):
     """Fitness and health goals"""
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
@@ -184,6 +196,8 @@ class FitnessGoal(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     
+    tracked_fields = ('target_calories_adjustment',)
+    
     class Meta:
         db_table = 'fitness_goals'
         ordering = ['name']
@@ -192,7 +206,7 @@ class FitnessGoal(models.Model):
         return self.name
 
 
-class UserProfile(models.Model):
+class UserProfile(FieldTrackerMixin, models.Model):
     """Extended user profile with health and dietary information"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     
@@ -204,6 +218,16 @@ class UserProfile(models.Model):
     
     # Calculated Fields
     daily_calorie_target = models.PositiveIntegerField(null=True, blank=True)
+    bmr = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Cached basal metabolic rate, see refresh_nutrition_targets"
+    )
+    daily_calories = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Cached daily calorie needs (TDEE plus fitness goal adjustments)"
+    )
     daily_water_target = models.FloatField(
         null=True, 
         blank=True,
@@ -223,6 +247,13 @@ class UserProfile(models.Model):
         choices=ACTIVITY_LEVELS,
         default='moderate'
     )
+    ACTIVITY_MULTIPLIERS = {
+        'sedentary': 1.2,
+        'light': 1.375,
+        'moderate': 1.55,
+        'very': 1.725,
+        'extra': 1.9,
+    }
     
     # Preferences
     preferred_meal_times = models.JSONField(
@@ -245,12 +276,24 @@ class UserProfile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    NUTRITION_TARGET_FIELDS = ('bmr', 'daily_calories', 'daily_calorie_target')
+    tracked_fields = ('activity_level',)
+    
     class Meta:
         db_table = 'user_profiles'
     
     def __str__(self):
         return f"{self.user.get_full_name()}'s Profile"
     
+    def save(self, *args, **kwargs):
+        if self.has_changed('activity_level'):
+            self.refresh_nutrition_targets(save=False)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = (
+                    set(kwargs['update_fields']) | set(self.NUTRITION_TARGET_FIELDS)
+                )
+        super().save(*args, **kwargs)
+    
     def calculate_bmr(self):
         """Calculate Basal Metabolic Rate using Mifflin-St Jeor Equation"""
         if not all([self.user.weight, self.user.height, self.user.age, self.user.gender]):
@@ -270,22 +313,31 @@ class UserProfile(models.Model):
         if not bmr:
             return None
         
-        activity_multipliers = {
-            'sedentary': 1.2,
-            'light': 1.375,
-            'moderate': 1.55,
-            'very': 1.725,
-            'extra': 1.9,
-        }
-        
-        multiplier = activity_multipliers.get(self.activity_level, 1.55)
+        multiplier = self.ACTIVITY_MULTIPLIERS.get(self.activity_level, 1.55)
         daily_calories = bmr * multiplier
         
         # Apply fitness goal adjustments
-        for goal in self.fitness_goals.all():
-            daily_calories += goal.target_calories_adjustment
+        if self.pk:
+            for goal in self.fitness_goals.all():
+                daily_calories += goal.target_calories_adjustment
         
         return round(daily_calories)
+    
+    def refresh_nutrition_targets(self, save=True):
+        """
+        Recompute the cached BMR and daily calorie figures. The calorie
+        target follows them unless the user set it to something else.
+        """
+        previous = self.daily_calories
+        self.bmr = self.calculate_bmr()
+        self.daily_calories = self.calculate_daily_calories()
+        if (
+            self.onboarding_completed and self.daily_calories
+            and self.daily_calorie_target in (None, previous)
+        ):
+            self.daily_calorie_target = self.daily_calories
+        if save:
+            super().save(update_fields=list(self.NUTRITION_TARGET_FIELDS))
 
 
 class Achievement(models.Model):
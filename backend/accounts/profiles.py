@@ -0,0 +1,24 @@
+from .models import UserProfile
+
+PROFILE_RELATIONS = (
+    'health_conditions', 'allergies', 'dietary_preferences', 'fitness_goals'
+)
+
+
+def profile_queryset():
+    """UserProfile queryset with every relation UserProfileSerializer renders"""
+    return UserProfile.objects.prefetch_related(*PROFILE_RELATIONS)
+
+
+def load_profile(user):
+    """
+    Attach ``user.profile`` with its four M2M relations prefetched.
+
+    Costs a fixed five queries (profile plus one per relation) regardless of
+    how many conditions, allergies, preferences or goals the user has.
+    """
+    profile = profile_queryset().filter(user=user).first()
+    if profile is not None:
+        profile.user = user
+        user.profile = profile
+    return user
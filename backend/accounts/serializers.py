@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
+from .activity import get_last_active
 from .models import (
     User, UserProfile, HealthCondition, Allergy, 
     DietaryPreference, FitnessGoal, Achievement, UserAchievement
@@ -106,8 +107,8 @@ class UserProfileSerializer(serializers.ModelSerializer):
         required=False
     )
     
-    bmr = serializers.ReadOnlyField(source='calculate_bmr')
-    daily_calories = serializers.ReadOnlyField(source='calculate_daily_calories')
+    bmr = serializers.ReadOnlyField()
+    daily_calories = serializers.ReadOnlyField()
     
     class Meta:
         model = UserProfile
@@ -150,6 +151,7 @@ class UserSerializer(serializers.ModelSerializer):
     profile = UserProfileSerializer(read_only=True)
     age = serializers.ReadOnlyField()
     bmi = serializers.ReadOnlyField()
+    last_active = serializers.SerializerMethodField()
     
     class Meta:
         model = User
@@ -161,6 +163,9 @@ class UserSerializer(serializers.ModelSerializer):
             'offline_mode', 'age', 'bmi', 'profile', 'date_joined', 'last_active'
         ]
         read_only_fields = ['id', 'date_joined']
+    
+    def get_last_active(self, obj):
+        return serializers.DateTimeField().to_representation(get_last_active(obj))
 
 
 class UserUpdateSerializer(serializers.ModelSerializer):
@@ -174,6 +179,13 @@ class UserUpdateSerializer(serializers.ModelSerializer):
             'cooking_level', 'family_size', 'bio', 'avatar',
             'notifications_enabled', 'location_enabled', 'offline_mode'
         ]
+    
+    def update(self, instance, validated_data):
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        # Write only the submitted columns so concurrent edits aren't undone
+        instance.save(update_fields=list(validated_data))
+        return instance
 
 
 class AchievementSerializer(serializers.ModelSerializer):
@@ -232,17 +244,20 @@ class OnboardingSerializer(serializers.Serializer):
         
         # Calculate date of birth from age
         age = self.validated_data.get('age')
+        changed = []
         if age:
             current_year = date.today().year
             birth_year = current_year - age
             user.date_of_birth = date(birth_year, 1, 1)
+            changed.append('date_of_birth')
         
         # Update user fields
         user_fields = ['height', 'weight', 'gender', 'cooking_level', 'family_size', 'location']
         for field in user_fields:
             if field in self.validated_data:
                 setattr(user, field, self.validated_data[field])
-        user.save()
+                changed.append(field)
+        user.save(update_fields=changed)
         
         # Update profile
         profile = user.profile
@@ -251,10 +266,10 @@ class OnboardingSerializer(serializers.Serializer):
         profile.onboarding_completed_at = timezone.now()
         
         # Calculate daily calorie target
-        profile.daily_calorie_target = profile.calculate_daily_calories()
+        profile.refresh_nutrition_targets(save=False)
         profile.save()
         
-        # Set many-to-many relationships
+        # Set many-to-many relationships (fitness goals refresh the targets)
         if 'health_condition_ids' in self.validated_data:
             profile.health_conditions.set(self.validated_data['health_condition_ids'])
         if 'allergy_ids' in self.validated_data:
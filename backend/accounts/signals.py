@@ -0,0 +1,91 @@
+from django.db import transaction
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from recipes.models import Ingredient
+from .authentication import invalidate_token, invalidate_user_tokens
+from .bootstrap import REFERENCE_MODELS, reference_data
+from .models import User, UserProfile, FitnessGoal
+from .targets import recompute_calorie_targets, recompute_for_goals
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_user(sender, instance, created, **kwargs):
+    """Keep cached token users in sync with the users table"""
+    if not created:
+        invalidate_user_tokens(instance)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def refresh_targets_on_body_metrics(sender, instance, created, **kwargs):
+    """Recompute cached BMR/TDEE when weight, height, age or gender change"""
+    if created or not instance.has_changed(*User.BODY_METRIC_FIELDS):
+        return
+    profile = UserProfile.objects.filter(user=instance).first()
+    if profile is not None:
+        profile.user = instance
+        profile.refresh_nutrition_targets()
+
+
+@receiver(m2m_changed, sender=UserProfile.fitness_goals.through)
+def refresh_targets_on_fitness_goals(sender, instance, action, reverse, pk_set, **kwargs):
+    """Recompute cached daily calories when a profile's fitness goals change"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        instance.refresh_nutrition_targets()
+        return
+    if pk_set:
+        recompute_calorie_targets(sorted(pk_set))
+
+
+@receiver(post_save, sender=FitnessGoal)
+def recompute_targets_on_goal_change(sender, instance, created, **kwargs):
+    """Batch-recompute every affected profile when a goal's adjustment changes"""
+    if created or not instance.has_changed('target_calories_adjustment'):
+        return
+    goal_id = instance.pk
+    transaction.on_commit(lambda: recompute_for_goals([goal_id]))
+
+
+@receiver(pre_delete, sender=FitnessGoal)
+def remember_goal_profiles(sender, instance, **kwargs):
+    instance._affected_profile_ids = list(
+        UserProfile.fitness_goals.through.objects.filter(fitnessgoal_id=instance.pk)
+        .values_list('userprofile_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=FitnessGoal)
+def recompute_targets_on_goal_delete(sender, instance, **kwargs):
+    profile_ids = sorted(getattr(instance, '_affected_profile_ids', []))
+    if profile_ids:
+        transaction.on_commit(lambda: recompute_calorie_targets(profile_ids))
+
+
+def invalidate_reference_data(sender, action=None, **kwargs):
+    # After commit, so a reader cannot cache pre-commit data under the new generation
+    if action is None or action.startswith('post_'):
+        transaction.on_commit(reference_data.invalidate)
+
+
+for model in REFERENCE_MODELS:
+    post_save.connect(
+        invalidate_reference_data, sender=model,
+        dispatch_uid=f'reference-save-{model.__name__}'
+    )
+    post_delete.connect(
+        invalidate_reference_data, sender=model,
+        dispatch_uid=f'reference-delete-{model.__name__}'
+    )
+
+for through in (Ingredient.common_regions.through, Ingredient.substitutes.through):
+    m2m_changed.connect(
+        invalidate_reference_data, sender=through,
+        dispatch_uid=f'reference-m2m-{through.__name__}'
+    )
@@ -0,0 +1,118 @@
+"""
+Vectorised recomputation of cached calorie targets.
+
+Mirrors ``UserProfile.calculate_bmr`` / ``calculate_daily_calories`` over
+whole batches of profiles with NumPy, for use when a ``FitnessGoal``
+definition changes and every profile using it goes stale at once. The
+cached BMR depends on age, so ``recompute_calorie_targets --birthdays``
+should run daily; without the flag the command backfills every profile.
+"""
+
+from datetime import date
+
+import numpy as np
+from django.db.models import Q, Sum
+from .models import UserProfile
+
+CHUNK_SIZE = 5000
+UPDATE_BATCH_SIZE = 1000
+
+GoalLink = UserProfile.fitness_goals.through
+
+
+def recompute_for_goals(goal_ids):
+    """Recompute targets for every profile using any of ``goal_ids``"""
+    profile_ids = (
+        GoalLink.objects.filter(fitnessgoal_id__in=goal_ids)
+        .values_list('userprofile_id', flat=True)
+        .distinct()
+    )
+    return recompute_calorie_targets(sorted(profile_ids))
+
+
+def birthday_profile_ids(today=None):
+    """Profiles whose user turned a year older ``today``"""
+    today = today or date.today()
+    born_today = Q(user__date_of_birth__month=today.month, user__date_of_birth__day=today.day)
+    if (today.month, today.day) == (3, 1) and not _is_leap(today.year):
+        # User.age counts 29 February birthdays from 1 March in common years
+        born_today |= Q(user__date_of_birth__month=2, user__date_of_birth__day=29)
+    return list(UserProfile.objects.filter(born_today).order_by('pk').values_list('pk', flat=True))
+
+
+def _is_leap(year):
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+def recompute_calorie_targets(profile_ids, chunk_size=CHUNK_SIZE):
+    """Recompute BMR, daily calories and targets for ``profile_ids``; returns rows updated"""
+    updated = 0
+    for start in range(0, len(profile_ids), chunk_size):
+        updated += _recompute_chunk(profile_ids[start:start + chunk_size])
+    return updated
+
+
+def _recompute_chunk(profile_ids):
+    rows = list(
+        UserProfile.objects.filter(pk__in=profile_ids).values_list(
+            'id', 'user__weight', 'user__height', 'user__date_of_birth',
+            'user__gender', 'activity_level', 'onboarding_completed',
+            'daily_calories', 'daily_calorie_target'
+        )
+    )
+    if not rows:
+        return 0
+
+    adjustments = dict(
+        GoalLink.objects.filter(userprofile_id__in=profile_ids)
+        .values('userprofile_id')
+        .annotate(total=Sum('fitnessgoal__target_calories_adjustment'))
+        .values_list('userprofile_id', 'total')
+    )
+
+    ids, weights, heights, births, genders, activities, onboarded, previous, targets = zip(*rows)
+    weight = np.array([w if w is not None else np.nan for w in weights], dtype=float)
+    height = np.array([h if h is not None else np.nan for h in heights], dtype=float)
+    gender = np.array([g or '' for g in genders])
+    adjustment = np.array([adjustments.get(pk) or 0 for pk in ids], dtype=float)
+    multiplier = np.array(
+        [UserProfile.ACTIVITY_MULTIPLIERS.get(a, 1.55) for a in activities], dtype=float
+    )
+
+    # Age in whole years, as User.age computes it
+    today = date.today()
+    birth_year = np.array([b.year if b else np.nan for b in births], dtype=float)
+    birth_month = np.array([b.month if b else 0 for b in births])
+    birth_day = np.array([b.day if b else 0 for b in births])
+    before_birthday = (birth_month > today.month) | (
+        (birth_month == today.month) & (birth_day > today.day)
+    )
+    age = today.year - birth_year - before_birthday
+
+    # calculate_bmr returns None when any input is missing or zero
+    valid = (
+        np.nan_to_num(weight) != 0
+    ) & (np.nan_to_num(height) != 0) & (np.nan_to_num(age) != 0) & (gender != '')
+
+    offset = np.where(gender == 'M', 5.0, -161.0)
+    bmr = np.round(10 * weight + 6.25 * height - 5 * age + offset)
+    valid &= np.nan_to_num(bmr) != 0
+    daily = np.round(bmr * multiplier + adjustment)
+
+    profiles = []
+    for i, pk in enumerate(ids):
+        profile_bmr = int(bmr[i]) if valid[i] else None
+        profile_daily = int(daily[i]) if valid[i] else None
+        target = targets[i]
+        # A target the user set by hand is kept
+        if onboarded[i] and profile_daily and target in (None, previous[i]):
+            target = profile_daily
+        profiles.append(UserProfile(
+            pk=pk, bmr=profile_bmr, daily_calories=profile_daily,
+            daily_calorie_target=target
+        ))
+
+    UserProfile.objects.bulk_update(
+        profiles, list(UserProfile.NUTRITION_TARGET_FIELDS), batch_size=UPDATE_BATCH_SIZE
+    )
+    return len(profiles)
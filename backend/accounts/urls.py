@@ -26,6 +26,7 @@ urlpatterns = [
     path('allergies/', views.AllergyListView.as_view(), name='allergies'),
     path('dietary-preferences/', views.DietaryPreferenceListView.as_view(), name='dietary_preferences'),
     path('fitness-goals/', views.FitnessGoalListView.as_view(), name='fitness_goals'),
+    path('bootstrap/', views.bootstrap, name='bootstrap'),
     
     # Achievements
     path('achievements/', views.AchievementListView.as_view(), name='achievements'),
@@ -3,7 +3,11 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import login, logout
-from django.utils import timezone
+from django.http import HttpResponse
+from .activity import record_activity
+from .authentication import invalidate_user_tokens
+from .bootstrap import reference_data
+from .profiles import load_profile, profile_queryset
 from .models import (
     User, UserProfile, HealthCondition, Allergy, 
     DietaryPreference, FitnessGoal, Achievement, UserAchievement
@@ -27,7 +31,7 @@ def register(request):
         token, created = Token.objects.get_or_create(user=user)
         
         return Response({
-            'user': UserSerializer(user).data,
+            'user': UserSerializer(load_profile(user)).data,
             'token': token.key,
             'message': 'Registration successful'
         }, status=status.HTTP_201_CREATED)
@@ -44,14 +48,13 @@ def login_view(request):
         user = serializer.validated_data['user']
         token, created = Token.objects.get_or_create(user=user)
         
-        # Update last active timestamp
-        user.last_active = timezone.now()
-        user.save(update_fields=['last_active'])
+        # Buffer last active timestamp
+        record_activity(user.pk)
         
         login(request, user)
         
         return Response({
-            'user': UserSerializer(user).data,
+            'user': UserSerializer(load_profile(user)).data,
             'token': token.key,
             'message': 'Login successful'
         }, status=status.HTTP_200_OK)
@@ -63,11 +66,9 @@ def login_view(request):
 @permission_classes([permissions.IsAuthenticated])
 def logout_view(request):
     """User logout endpoint"""
-    try:
-        # Delete the user's token
-        request.user.auth_token.delete()
-    except:
-        pass
+    # Drop the user's token from the auth cache and delete it
+    invalidate_user_tokens(request.user)
+    Token.objects.filter(user=request.user).delete()
     
     logout(request)
     return Response({'message': 'Logout successful'}, status=status.HTTP_200_OK)
@@ -77,7 +78,7 @@ def logout_view(request):
 @permission_classes([permissions.IsAuthenticated])
 def profile(request):
     """Get current user profile"""
-    serializer = UserSerializer(request.user)
+    serializer = UserSerializer(load_profile(request.user))
     return Response(serializer.data)
 
 
@@ -85,6 +86,8 @@ def profile(request):
 @permission_classes([permissions.IsAuthenticated])
 def update_profile(request):
     """Update user profile"""
+    # request.user may be a cached copy; start from the stored row
+    request.user.refresh_from_db()
     serializer = UserUpdateSerializer(
         request.user, 
         data=request.data, 
@@ -92,7 +95,7 @@ def update_profile(request):
     )
     if serializer.is_valid():
         serializer.save()
-        return Response(UserSerializer(request.user).data)
+        return Response(UserSerializer(load_profile(request.user)).data)
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -103,9 +106,10 @@ def complete_onboarding(request):
     """Complete user onboarding"""
     serializer = OnboardingSerializer(data=request.data)
     if serializer.is_valid():
+        request.user.refresh_from_db()
         user = serializer.save(request.user)
         return Response({
-            'user': UserSerializer(user).data,
+            'user': UserSerializer(load_profile(user)).data,
             'message': 'Onboarding completed successfully'
         })
     
@@ -120,9 +124,10 @@ def change_password(request):
     if serializer.is_valid():
         user = request.user
         user.set_password(serializer.validated_data['new_password'])
-        user.save()
+        user.save(update_fields=['password'])
         
         # Create new token
+        invalidate_user_tokens(user)
         Token.objects.filter(user=user).delete()
         token = Token.objects.create(user=user)
         
@@ -140,7 +145,7 @@ class UserProfileDetailView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_object(self):
-        profile, created = UserProfile.objects.get_or_create(user=self.request.user)
+        profile, created = profile_queryset().get_or_create(user=self.request.user)
         return profile
 
 
@@ -172,6 +177,25 @@ class FitnessGoalListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def bootstrap(request):
+    """All reference vocabularies in one versioned payload, with ETag support"""
+    snapshot = reference_data.get()
+    etag = f'"{snapshot.version}"'
+    
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+    client_tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    if etag in client_tags or '*' in client_tags:
+        response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = HttpResponse(snapshot.body, content_type='application/json')
+    
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 class AchievementListView(generics.ListAPIView):
     """List all achievements"""
     queryset = Achievement.objects.filter(is_active=True)
@@ -251,6 +275,7 @@ def delete_account(request):
     
     # Perform any cleanup operations here
     # (e.g., anonymize data, delete files, etc.)
+    invalidate_user_tokens(user)
     
     user.delete()
     
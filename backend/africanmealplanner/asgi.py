@@ -1,5 +1,9 @@
 """
 ASGI config for African Meal Planner project.
+
+Serve through ASGI so the AI engine's async views stream answers without
+holding a worker per request, e.g.
+``gunicorn africanmealplanner.asgi:application -k uvicorn.workers.UvicornWorker``.
 """
 
 import os
@@ -8,4 +12,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'africanmealplanner.settings')
 
-application = get_asgi_application()
\ No newline at end of file
+application = get_asgi_application()
+
+# Map the retrieval index into memory before the first question
+from ai_engine.retrieval import main_segment  # noqa: E402
+
+main_segment.get()
\ No newline at end of file
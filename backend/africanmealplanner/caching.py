@@ -0,0 +1,122 @@
+"""
+Process-local caching helpers shared by the apps.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+
+
+class LocalTTLCache:
+    """Small thread-safe LRU cache whose entries expire after ``ttl`` seconds"""
+
+    def __init__(self, ttl=5, maxsize=10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_redis_client = None
+
+
+def get_redis():
+    """Return the process-wide Redis client for ``settings.REDIS_URL``"""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(settings.REDIS_URL)
+    return _redis_client
+
+
+def _generation_key(name):
+    return f"generation:{name}"
+
+
+def get_generation(name):
+    """Current value of the shared generation counter ``name``"""
+    return cache.get_or_set(_generation_key(name), 1, None)
+
+
+def bump_generation(name):
+    """Advance the shared generation counter ``name``"""
+    key = _generation_key(name)
+    cache.add(key, 1, None)
+    return cache.incr(key)
+
+
+class GenerationalSnapshot:
+    """
+    Process-local value rebuilt whenever its shared generation counter moves.
+
+    Readers compare the counter (one cache round trip) at most once every
+    ``check_interval`` seconds; writers call ``invalidate`` so every process
+    rebuilds on its next check.
+    """
+
+    def __init__(self, name, builder, check_interval=1.0):
+        self.name = name
+        self.builder = builder
+        self.check_interval = check_interval
+        self._value = None
+        self._generation = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        now = time.monotonic()
+        if self._value is not None and now < self._next_check:
+            return self._value
+
+        with self._lock:
+            if self._value is not None and now < self._next_check:
+                return self._value
+            generation = get_generation(self.name)
+            if self._value is None or generation != self._generation:
+                # Read the generation before building so a write racing
+                # with the build triggers another rebuild.
+                self._value = self.builder()
+                self._generation = generation
+            self._next_check = now + self.check_interval
+            return self._value
+
+    @property
+    def generation(self):
+        """Generation of the value last returned by ``get``"""
+        return self._generation
+
+    def invalidate(self):
+        bump_generation(self.name)
+        with self._lock:
+            self._value = None
@@ -29,6 +29,7 @@ DJANGO_APPS = [
 
 THIRD_PARTY_APPS = [
     'rest_framework',
+    'rest_framework.authtoken',
     'corsheaders',
 ]
 
@@ -46,11 +47,12 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'africanmealplanner.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.LastActiveMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -128,7 +130,7 @@ AUTH_USER_MODEL = 'accounts.User'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -140,6 +142,25 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Token authentication cache (seconds)
+TOKEN_CACHE_TTL = config('TOKEN_CACHE_TTL', default=60, cast=int)
+# Per-process entries are not invalidated across workers: a revoked token
+# keeps working elsewhere for up to TOKEN_CACHE_LOCAL_TTL
+TOKEN_CACHE_LOCAL_TTL = config('TOKEN_CACHE_LOCAL_TTL', default=5, cast=int)
+TOKEN_CACHE_LOCAL_SIZE = 10000
+
+# last_active tracking (seconds)
+ACTIVITY_RECORD_INTERVAL = config('ACTIVITY_RECORD_INTERVAL', default=60, cast=int)
+# How often `manage.py flush_last_active --loop` writes buffered timestamps
+ACTIVITY_FLUSH_INTERVAL = config('ACTIVITY_FLUSH_INTERVAL', default=60, cast=int)
+
+# How often `manage.py recompute_recipe_compatibility --stale --loop` looks for
+# edited conditions (seconds)
+COMPATIBILITY_REFRESH_INTERVAL = config('COMPATIBILITY_REFRESH_INTERVAL', default=60, cast=int)
+
+# Currency of ingredient prices, recipe costs and budgets
+PRICE_CURRENCY = config('PRICE_CURRENCY', default='USD')
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -150,9 +171,21 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Redis
+REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
+
+# Cache
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'amp',
+    }
+}
+
 # Celery Configuration
-CELERY_BROKER_URL = config('REDIS_URL', default='redis://localhost:6379/0')
-CELERY_RESULT_BACKEND = config('REDIS_URL', default='redis://localhost:6379/0')
+CELERY_BROKER_URL = REDIS_URL
+CELERY_RESULT_BACKEND = REDIS_URL
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
@@ -161,6 +194,19 @@ CELERY_TIMEZONE = TIME_ZONE
 # OpenAI Configuration
 OPENAI_API_KEY = config('OPENAI_API_KEY', default='')
 
+# AI engine: "openai", "fake" (offline, deterministic) or a backend class path
+AI_BACKEND = config('AI_BACKEND', default='openai' if OPENAI_API_KEY else 'fake')
+AI_MODEL = config('AI_MODEL', default='gpt-3.5-turbo')
+AI_MAX_CONCURRENCY = config('AI_MAX_CONCURRENCY', default=8, cast=int)  # backend calls per worker
+AI_QUEUE_TIMEOUT = config('AI_QUEUE_TIMEOUT', default=10, cast=float)
+AI_REQUEST_TIMEOUT = config('AI_REQUEST_TIMEOUT', default=60, cast=float)
+AI_CACHE_TTL = config('AI_CACHE_TTL', default=60 * 60 * 24, cast=int)
+AI_MAX_PROMPT_LENGTH = 2000
+AI_MAX_TOKENS = 1024
+AI_FAKE_TOKEN_DELAY = config('AI_FAKE_TOKEN_DELAY', default=0.0, cast=float)
+AI_INDEX_DIR = config('AI_INDEX_DIR', default=str(BASE_DIR / 'var' / 'retrieval'))
+AI_CONTEXT_PASSAGES = 4  # catalog passages grounding each answer
+
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
@@ -0,0 +1,53 @@
+"""
+Change tracking for model instances.
+"""
+
+import copy
+
+
+class FieldTrackerMixin:
+    """
+    Remember the values of ``tracked_fields`` as loaded from (or last saved
+    to) the database so ``save`` hooks and signals can tell what changed.
+    """
+
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        instance._loaded_values = {
+            field: copy.deepcopy(loaded[field])
+            for field in cls.tracked_fields if field in loaded
+        }
+        return instance
+
+    def has_changed(self, *fields):
+        """True if any of ``fields`` differs from the stored value (always for new rows)"""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return True
+        return any(
+            field in loaded and loaded[field] != getattr(self, field)
+            for field in fields
+        )
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        refreshed = self.tracked_fields if fields is None else [
+            field for field in self.tracked_fields if field in fields
+        ]
+        loaded = getattr(self, '_loaded_values', None) or {}
+        loaded.update({field: copy.deepcopy(getattr(self, field)) for field in refreshed})
+        self._loaded_values = loaded
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        saved = self.tracked_fields if update_fields is None else [
+            field for field in self.tracked_fields if field in update_fields
+        ]
+        loaded = getattr(self, '_loaded_values', None) or {}
+        loaded.update({field: copy.deepcopy(getattr(self, field)) for field in saved})
+        self._loaded_values = loaded
@@ -0,0 +1 @@
+# AI engine app for the streaming cooking assistant
\ No newline at end of file
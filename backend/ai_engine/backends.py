@@ -0,0 +1,121 @@
+"""
+Pluggable completion backends.
+
+A backend turns a list of chat messages into an async stream of text
+chunks. ``settings.AI_BACKEND`` selects one: "openai", "fake" or the
+dotted path of a ``Backend`` subclass. ``FakeBackend`` needs no network
+and answers deterministically, so the engine runs and can be load-tested
+offline.
+"""
+
+import asyncio
+import hashlib
+import random
+import re
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class BackendError(Exception):
+    """The backend failed to produce a completion"""
+
+
+class Backend:
+    """Interface of a completion backend"""
+    name = 'base'
+
+    def __init__(self, model=None):
+        self.model = model or settings.AI_MODEL
+
+    def stream(self, messages, max_tokens=None, temperature=None):
+        """Async iterator over the completion of ``messages`` as text chunks"""
+        raise NotImplementedError
+
+
+class FakeBackend(Backend):
+    """
+    Deterministic offline backend: the same messages always stream the same
+    answer, built from the question's own words, with an optional delay per
+    token (``settings.AI_FAKE_TOKEN_DELAY``) to mimic a remote model.
+    """
+    name = 'fake'
+    VOCABULARY = (
+        'stir', 'simmer', 'season', 'the', 'pot', 'with', 'pepper', 'onions',
+        'until', 'tender', 'and', 'serve', 'warm', 'low', 'heat', 'a', 'little',
+        'stock', 'taste', 'then', 'add', 'for', 'minutes', 'gently',
+    )
+
+    def __init__(self, model=None, token_delay=None):
+        super().__init__(model or 'fake')
+        self.token_delay = settings.AI_FAKE_TOKEN_DELAY if token_delay is None else token_delay
+
+    async def stream(self, messages, max_tokens=None, temperature=None):
+        text = '\n'.join(message['content'] for message in messages)
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], 'big')
+        rng = random.Random(seed)
+        words = re.findall(r'[a-z]+', messages[-1]['content'].lower())[:20]
+        vocabulary = self.VOCABULARY + tuple(words)
+        count = min(max_tokens or 64, 24 + seed % 40)
+        for i in range(count):
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            word = rng.choice(vocabulary)
+            yield (word.capitalize() if i == 0 else ' ' + word) + ('.' if i == count - 1 else '')
+
+
+class OpenAIBackend(Backend):
+    """Chat completions from the OpenAI API, streamed"""
+    name = 'openai'
+
+    def __init__(self, model=None):
+        super().__init__(model)
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            # Imported lazily so the fake backend works without the package
+            from openai import AsyncOpenAI
+            self._client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, timeout=settings.AI_REQUEST_TIMEOUT)
+        return self._client
+
+    async def stream(self, messages, max_tokens=None, temperature=None):
+        from openai import OpenAIError
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=0.7 if temperature is None else temperature,
+                stream=True,
+            )
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except OpenAIError as e:
+            raise BackendError(str(e)) from e
+
+
+BACKENDS = {
+    'fake': FakeBackend,
+    'openai': OpenAIBackend,
+}
+
+_backend = None
+
+
+def get_backend():
+    """The process-wide backend configured by ``settings.AI_BACKEND``"""
+    global _backend
+    if _backend is None:
+        name = settings.AI_BACKEND
+        backend_class = BACKENDS.get(name) or import_string(name)
+        _backend = backend_class()
+    return _backend
+
+
+def set_backend(backend):
+    """Replace the process-wide backend (None re-reads the settings)"""
+    global _backend
+    _backend = backend
@@ -0,0 +1,70 @@
+import asyncio
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from ai_engine import service
+from ai_engine.backends import BackendError, FakeBackend, set_backend
+
+
+class Command(BaseCommand):
+    help = 'Load-test the AI engine in process against the offline fake backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=100, help='Simultaneous clients')
+        parser.add_argument('--prompts', type=int, default=50, help='Distinct prompts among the requests')
+        parser.add_argument('--token-delay', type=float, default=0.005,
+                            help='Seconds per token of the fake backend')
+
+    def handle(self, *args, **options):
+        set_backend(FakeBackend(token_delay=options['token_delay']))
+        try:
+            first_chunk, total, failed, elapsed = asyncio.run(self.run(options))
+        finally:
+            set_backend(None)
+
+        def percentile(values, share):
+            return values[min(int(len(values) * share), len(values) - 1)] * 1000 if values else 0.0
+
+        first_chunk.sort()
+        total.sort()
+        self.stdout.write(
+            f'First chunk p50 {percentile(first_chunk, 0.5):.1f}ms p95 {percentile(first_chunk, 0.95):.1f}ms; '
+            f'complete p50 {percentile(total, 0.5):.1f}ms p95 {percentile(total, 0.95):.1f}ms'
+        )
+        self.stdout.write(f'Counters: {dict(service.stats)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(total)} answers, {failed} failed in {elapsed:.1f}s '
+            f'({len(total) / max(elapsed, 1e-6):.0f} requests/s)'
+        ))
+
+    async def run(self, options):
+        # A fresh nonce so every run starts with cold caches
+        nonce = uuid.uuid4().hex[:8]
+        queue = asyncio.Queue()
+        for i in range(options['requests']):
+            queue.put_nowait(f'Load test {nonce}: question {i % options["prompts"]}')
+        first_chunk, total = [], []
+        failed = 0
+
+        async def client():
+            nonlocal failed
+            while not queue.empty():
+                prompt = queue.get_nowait()
+                started = time.monotonic()
+                first = None
+                try:
+                    _, chunks = await service.open_completion(service.build_messages(prompt))
+                    async for _ in chunks:
+                        if first is None:
+                            first = time.monotonic() - started
+                except (service.EngineBusy, BackendError):
+                    failed += 1
+                    continue
+                first_chunk.append(first or 0.0)
+                total.append(time.monotonic() - started)
+
+        started = time.monotonic()
+        await asyncio.gather(*[client() for _ in range(options['concurrency'])])
+        return first_chunk, total, failed, time.monotonic() - started
@@ -0,0 +1,388 @@
+"""
+Local passage retrieval over the recipe catalog, for grounding answers.
+
+Recipe instructions, chef notes and cultural notes and cooking tip
+contents are split into passages of about ``PASSAGE_WORDS`` words along
+step and sentence boundaries. Each passage is tokenized (accents and
+plurals folded, stopwords dropped) with its recipe or tip title, and the
+tokens are hashed into ``N_FEATURES`` buckets, so no vocabulary has to
+be kept. Passages are scored with BM25 over a term-major posting layout:
+per-term offsets into passage ids and term frequencies.
+
+The main segment is written to ``settings.AI_INDEX_DIR`` by
+``build_retrieval_index`` as ``.npy`` files that every worker maps into
+memory instead of loading; ``CURRENT`` names the live build. Recipes and
+tips saved since that build are re-chunked into a small in-memory delta
+segment in each worker and mask their passages in the main one, so edits
+are searchable within a second. Deleted or unpublished content is dropped
+when hits are resolved against the database. Rebuilding the main
+segment periodically keeps the delta small; past ``MAX_DELTA_OBJECTS``
+recipes or tips (say, before the first build) only the most recently
+saved are re-chunked, and a warning asks for a build.
+"""
+
+import datetime
+import json
+import logging
+import os
+import re
+import shutil
+import unicodedata
+import zlib
+from collections import namedtuple
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from africanmealplanner.caching import GenerationalSnapshot
+from recipes.models import CookingTip, Recipe
+
+logger = logging.getLogger(__name__)
+
+N_FEATURES = 1 << 18
+PASSAGE_WORDS = 80
+BUILD_CHUNK_SIZE = 2000
+KEEP_BUILDS = 2
+# Most recipes and most tips re-chunked into the delta by each worker
+MAX_DELTA_OBJECTS = 2000
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Indexed fields; the position is the stored field code
+FIELDS = ('instructions', 'chef_notes', 'cultural_significance', 'tip')
+TIP = FIELDS.index('tip')
+RECIPE_TEXT_FIELDS = FIELDS[:TIP]
+
+STOPWORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'can', 'do',
+    'for', 'from', 'has', 'have', 'how', 'i', 'if', 'in', 'into', 'is', 'it',
+    'its', 'me', 'my', 'of', 'on', 'or', 'so', 'that', 'the', 'then', 'there',
+    'this', 'to', 'was', 'what', 'when', 'which', 'will', 'with', 'you', 'your',
+])
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+|\n+')
+
+ARRAYS = (
+    'offsets', 'postings', 'frequencies', 'lengths',
+    'object_ids', 'fields', 'text_offsets', 'text',
+)
+
+Passage = namedtuple('Passage', ['object_id', 'field', 'title', 'text'])
+Hit = namedtuple('Hit', ['score', 'object_id', 'field', 'text'])
+
+
+def _stem(word):
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith('oes'):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Folded, stemmed tokens of ``text`` without stopwords"""
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode().lower()
+    return [_stem(word) for word in TOKEN_RE.findall(text) if word not in STOPWORDS]
+
+
+def hash_tokens(tokens):
+    """Feature bucket of each token"""
+    return np.fromiter(
+        (zlib.crc32(token.encode()) & (N_FEATURES - 1) for token in tokens),
+        dtype=np.int64, count=len(tokens)
+    )
+
+
+def _pack(units, size=PASSAGE_WORDS):
+    """Greedily join text units (steps, sentences) into passages of about ``size`` words"""
+    passages, current, count = [], [], 0
+    for unit in units:
+        words = unit.split()
+        if not words:
+            continue
+        if count and count + len(words) > size:
+            passages.append(' '.join(current))
+            current, count = [], 0
+        # Units longer than a passage are cut into windows
+        while len(words) > size:
+            passages.append(' '.join(words[:size]))
+            words = words[size:]
+        current.extend(words)
+        count += len(words)
+    if current:
+        passages.append(' '.join(current))
+    return passages
+
+
+def _steps(instructions):
+    steps = []
+    for step in instructions if isinstance(instructions, list) else []:
+        if isinstance(step, dict):
+            step = step.get('description') or step.get('instruction') or ''
+        steps.append(str(step).strip())
+    return steps
+
+
+def recipe_passages(recipe_id, name, instructions, chef_notes, cultural_significance):
+    passages = [
+        Passage(recipe_id, FIELDS.index('instructions'), name, text)
+        for text in _pack(_steps(instructions))
+    ]
+    for field, text in (('chef_notes', chef_notes), ('cultural_significance', cultural_significance)):
+        passages.extend(
+            Passage(recipe_id, FIELDS.index(field), name, chunk)
+            for chunk in _pack(SENTENCE_RE.split(text or ''))
+        )
+    return passages
+
+
+def tip_passages(tip_id, title, content):
+    return [Passage(tip_id, TIP, title, chunk) for chunk in _pack(SENTENCE_RE.split(content or ''))]
+
+
+def catalog_passages(recipes, tips):
+    """Passages of recipe and tip querysets, read in chunks"""
+    for row in recipes.values_list('id', 'name', *RECIPE_TEXT_FIELDS).iterator(chunk_size=BUILD_CHUNK_SIZE):
+        yield from recipe_passages(*row)
+    for row in tips.values_list('id', 'title', 'content').iterator(chunk_size=BUILD_CHUNK_SIZE):
+        yield from tip_passages(*row)
+
+
+def build_arrays(passages):
+    """The index arrays (see ``ARRAYS``) for ``passages``"""
+    terms, postings, frequencies = [], [], []
+    lengths, object_ids, fields, texts = [], [], [], []
+    for position, passage in enumerate(passages):
+        tokens = tokenize(f"{passage.title} {passage.text}")
+        buckets, counts = np.unique(hash_tokens(tokens), return_counts=True)
+        terms.append(buckets)
+        postings.append(np.full(len(buckets), position, dtype=np.int32))
+        frequencies.append(counts.astype(np.uint16))
+        lengths.append(len(tokens))
+        object_ids.append(passage.object_id)
+        fields.append(passage.field)
+        texts.append(passage.text.encode())
+
+    terms = np.concatenate(terms) if terms else np.zeros(0, dtype=np.int64)
+    order = np.argsort(terms, kind='stable')
+    offsets = np.zeros(N_FEATURES + 1, dtype=np.int64)
+    np.cumsum(np.bincount(terms, minlength=N_FEATURES), out=offsets[1:])
+    text_offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum([len(text) for text in texts], out=text_offsets[1:])
+    return {
+        'offsets': offsets,
+        'postings': np.concatenate(postings)[order] if postings else np.zeros(0, dtype=np.int32),
+        'frequencies': np.concatenate(frequencies)[order] if frequencies else np.zeros(0, dtype=np.uint16),
+        'lengths': np.asarray(lengths, dtype=np.float32),
+        'object_ids': np.asarray(object_ids, dtype=np.int64),
+        'fields': np.asarray(fields, dtype=np.int8),
+        'text_offsets': text_offsets,
+        'text': np.frombuffer(b''.join(texts), dtype=np.uint8),
+    }
+
+
+class Segment:
+    """Passages and postings held in arrays (memory-mapped for the main segment)"""
+
+    def __init__(self, arrays, built_at=None):
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        self.built_at = built_at
+        self.avg_length = float(self.lengths.mean()) if len(self.lengths) else 0.0
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def term(self, bucket):
+        start, end = self.offsets[bucket], self.offsets[bucket + 1]
+        return self.postings[start:end], self.frequencies[start:end]
+
+    def passage_text(self, position):
+        return self.text[self.text_offsets[position]:self.text_offsets[position + 1]].tobytes().decode()
+
+    def keys(self):
+        """``(tip?, object id)`` of each passage packed into one integer"""
+        return (self.fields == TIP).astype(np.int64) << 48 | self.object_ids
+
+
+def write_index(arrays, built_at):
+    """Write a build next to the live one, switch ``CURRENT`` to it and prune old builds"""
+    directory = settings.AI_INDEX_DIR
+    os.makedirs(directory, exist_ok=True)
+    name = f"build-{built_at:%Y%m%d%H%M%S}-{os.getpid()}"
+    path = os.path.join(directory, name)
+    os.makedirs(path)
+    for array_name, array in arrays.items():
+        np.save(os.path.join(path, f"{array_name}.npy"), array)
+    with open(os.path.join(path, 'manifest.json'), 'w') as f:
+        json.dump({'built_at': built_at.isoformat(), 'passages': len(arrays['lengths']),
+                   'features': N_FEATURES}, f)
+
+    # Readers only ever see a complete build
+    pointer = os.path.join(directory, 'CURRENT')
+    with open(f"{pointer}.tmp", 'w') as f:
+        f.write(name)
+    os.replace(f"{pointer}.tmp", pointer)
+
+    builds = sorted(entry for entry in os.listdir(directory) if entry.startswith('build-'))
+    for stale in builds[:-KEEP_BUILDS]:
+        shutil.rmtree(os.path.join(directory, stale), ignore_errors=True)
+    return path
+
+
+def load_main_segment():
+    """The live build, memory-mapped; an empty segment when none was built"""
+    directory = settings.AI_INDEX_DIR
+    try:
+        with open(os.path.join(directory, 'CURRENT')) as f:
+            path = os.path.join(directory, f.read().strip())
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return Segment(build_arrays([]))
+    if manifest['features'] != N_FEATURES:
+        return Segment(build_arrays([]))
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in ARRAYS}
+    return Segment(arrays, datetime.datetime.fromisoformat(manifest['built_at']))
+
+
+main_segment = GenerationalSnapshot('retrieval-main', load_main_segment, check_interval=5.0)
+
+
+def changed_since(built_at):
+    """Recipes and tips saved since ``built_at`` (everything if None), newest first"""
+    recipes, tips = Recipe.objects.all(), CookingTip.objects.all()
+    if built_at is not None:
+        recipes = recipes.filter(updated_at__gt=built_at)
+        tips = tips.filter(updated_at__gt=built_at)
+    return recipes.order_by('-updated_at'), tips.order_by('-updated_at')
+
+
+def build_delta():
+    """``(segment, tombstones)``: content changed since the main build and the main passages it replaces"""
+    main = main_segment.get()
+    recipes, tips = changed_since(main.built_at)
+    recipe_ids = list(recipes.values_list('id', flat=True)[:MAX_DELTA_OBJECTS + 1])
+    tip_ids = list(tips.values_list('id', flat=True)[:MAX_DELTA_OBJECTS + 1])
+    if len(recipe_ids) > MAX_DELTA_OBJECTS or len(tip_ids) > MAX_DELTA_OBJECTS:
+        # Older changes stay unsearchable (or stale) until the next build
+        logger.warning(
+            "Retrieval delta capped at %d recipes and tips; run build_retrieval_index",
+            MAX_DELTA_OBJECTS
+        )
+        recipe_ids, tip_ids = recipe_ids[:MAX_DELTA_OBJECTS], tip_ids[:MAX_DELTA_OBJECTS]
+    segment = Segment(build_arrays(list(catalog_passages(
+        Recipe.objects.filter(pk__in=recipe_ids, is_published=True),
+        CookingTip.objects.filter(pk__in=tip_ids),
+    ))))
+    replaced = np.asarray(recipe_ids + [1 << 48 | tip_id for tip_id in tip_ids], dtype=np.int64)
+    tombstones = np.isin(main.keys(), replaced) if len(replaced) and len(main) else None
+    return segment, tombstones
+
+
+delta_segment = GenerationalSnapshot('retrieval-delta', build_delta)
+
+
+def build_index():
+    """Index every published recipe and every tip into a new main segment. Returns its size."""
+    built_at = timezone.now()
+    arrays = build_arrays(list(catalog_passages(
+        Recipe.objects.filter(is_published=True).order_by('pk'), CookingTip.objects.order_by('pk')
+    )))
+    write_index(arrays, built_at)
+    main_segment.invalidate()
+    delta_segment.invalidate()
+    return len(arrays['lengths'])
+
+
+def _score(segment, buckets, idf, average, exclude=None, limit=10):
+    """Top ``limit`` ``(score, position)`` of a segment for the query buckets"""
+    positions, weights = [], []
+    for bucket, weight in zip(buckets, idf):
+        passages, frequencies = segment.term(bucket)
+        if not len(passages):
+            continue
+        frequencies = frequencies.astype(np.float32)
+        norm = K1 * (1 - B + B * segment.lengths[passages] / average)
+        positions.append(passages)
+        weights.append(weight * frequencies * (K1 + 1) / (frequencies + norm))
+    if not positions:
+        return []
+    # Only passages sharing a term with the query are touched
+    candidates, inverse = np.unique(np.concatenate(positions), return_inverse=True)
+    scores = np.bincount(inverse, weights=np.concatenate(weights))
+    if exclude is not None:
+        scores[exclude[candidates]] = 0.0
+    limit = min(limit, len(candidates))
+    best = np.argpartition(-scores, limit - 1)[:limit]
+    return [(float(scores[i]), int(candidates[i])) for i in best if scores[i] > 0]
+
+
+def search(query, limit=10):
+    """Best ``Hit``s for ``query`` over the main and delta segments, unresolved"""
+    buckets = np.unique(hash_tokens(tokenize(query)))
+    if not len(buckets):
+        return []
+    main = main_segment.get()
+    delta, tombstones = delta_segment.get()
+
+    replaced = int(tombstones.sum()) if tombstones is not None else 0
+    total = max(len(main) - replaced + len(delta), 1)
+    average = max(
+        (main.avg_length * len(main) + delta.avg_length * len(delta)) / max(len(main) + len(delta), 1), 1.0
+    )
+    frequency = np.array([
+        (main.offsets[b + 1] - main.offsets[b]) + (delta.offsets[b + 1] - delta.offsets[b]) for b in buckets
+    ], dtype=np.float64)
+    idf = np.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+
+    hits = [
+        (score, main, position) for score, position in _score(main, buckets, idf, average, tombstones, limit)
+    ] + [
+        (score, delta, position) for score, position in _score(delta, buckets, idf, average, None, limit)
+    ]
+    hits.sort(key=lambda hit: -hit[0])
+    return [
+        Hit(round(score, 4), int(segment.object_ids[position]), FIELDS[segment.fields[position]],
+            segment.passage_text(position))
+        for score, segment, position in hits[:limit]
+    ]
+
+
+def retrieve(query, limit=5):
+    """
+    Passages for ``query`` resolved against the catalog: dicts with the
+    source (recipe or tip), its id, title and slug, the field and text.
+    """
+    # Over-fetch: deleted or unpublished content is dropped here
+    hits = search(query, limit * 2)
+    recipe_ids = {hit.object_id for hit in hits if hit.field != 'tip'}
+    tip_ids = {hit.object_id for hit in hits if hit.field == 'tip'}
+    recipes = {
+        pk: (name, slug) for pk, name, slug in Recipe.objects.filter(
+            pk__in=recipe_ids, is_published=True
+        ).values_list('id', 'name', 'slug')
+    } if recipe_ids else {}
+    tips = dict(CookingTip.objects.filter(pk__in=tip_ids).values_list('id', 'title')) if tip_ids else {}
+
+    passages = []
+    for hit in hits:
+        if hit.field == 'tip':
+            if hit.object_id not in tips:
+                continue
+            source, title, slug = 'tip', tips[hit.object_id], None
+        else:
+            if hit.object_id not in recipes:
+                continue
+            source, (title, slug) = 'recipe', recipes[hit.object_id]
+        passages.append({
+            'source': source, 'id': hit.object_id, 'title': title, 'slug': slug,
+            'field': hit.field, 'text': hit.text, 'score': hit.score,
+        })
+        if len(passages) == limit:
+            break
+    return passages
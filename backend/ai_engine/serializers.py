@@ -0,0 +1,18 @@
+from django.conf import settings
+from rest_framework import serializers
+
+
+class ChatRequestSerializer(serializers.Serializer):
+    """Serializer for assistant questions"""
+    prompt = serializers.CharField(max_length=settings.AI_MAX_PROMPT_LENGTH)
+    stream = serializers.BooleanField(default=True)
+    grounded = serializers.BooleanField(default=True)
+    max_tokens = serializers.IntegerField(
+        required=False, min_value=1, max_value=settings.AI_MAX_TOKENS
+    )
+
+
+class RetrieveRequestSerializer(serializers.Serializer):
+    """Serializer for retrieval query parameters"""
+    q = serializers.CharField(max_length=settings.AI_MAX_PROMPT_LENGTH)
+    limit = serializers.IntegerField(default=5, min_value=1, max_value=20)
@@ -0,0 +1,225 @@
+"""
+Completion service behind the AI views.
+
+Messages are normalized (whitespace collapsed, case folded) and hashed
+with the backend, model and options into a prompt key. For each key:
+
+* a completed answer is served from a per-process cache, then from the
+  shared cache, without calling the backend;
+* a request arriving while the same prompt is being generated in this
+  worker follows that generation instead of starting another one: it
+  replays the chunks produced so far, then the rest as they arrive;
+* otherwise a generation starts once one of the worker's
+  ``AI_MAX_CONCURRENCY`` backend slots is free, waiting at most
+  ``AI_QUEUE_TIMEOUT`` seconds.
+
+Generations run as tasks of their own, so a client that disconnects does
+not cancel the answer others are following, and it is cached either way.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import weakref
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from africanmealplanner.caching import LocalTTLCache
+from .backends import get_backend
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'ai-answer:'
+LOCAL_CACHE_SIZE = 2000
+
+SYSTEM_PROMPT = (
+    "You are the cooking assistant of an African meal planning app. Answer "
+    "questions about African dishes, ingredients, substitutions, nutrition "
+    "and meal planning briefly and practically."
+)
+
+# Sources of an answer
+CACHED, COALESCED, GENERATED = 'cache', 'coalesced', 'backend'
+
+_answers = LocalTTLCache(ttl=settings.AI_CACHE_TTL, maxsize=LOCAL_CACHE_SIZE)
+# Per-process counters for load tests and the status view
+stats = Counter()
+
+
+class EngineBusy(Exception):
+    """No backend slot freed up within ``AI_QUEUE_TIMEOUT``"""
+
+
+class _Flight:
+    """A generation in progress and the chunks it produced so far"""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.task = None
+        self._event = asyncio.Event()
+
+    def _wake(self):
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    def push(self, chunk):
+        self.chunks.append(chunk)
+        self._wake()
+
+    def finish(self, error=None):
+        self.error = error
+        self.done = True
+        self._wake()
+
+    async def follow(self):
+        position = 0
+        while True:
+            # Taken before reading so a chunk pushed meanwhile wakes us
+            event = self._event
+            while position < len(self.chunks):
+                yield self.chunks[position]
+                position += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await event.wait()
+
+
+class _WorkerState:
+    def __init__(self):
+        self.slots = asyncio.Semaphore(settings.AI_MAX_CONCURRENCY)
+        self.flights = {}
+
+
+# Asyncio primitives belong to one event loop, so state is kept per loop
+_states = weakref.WeakKeyDictionary()
+
+
+def _state():
+    loop = asyncio.get_running_loop()
+    state = _states.get(loop)
+    if state is None:
+        state = _states[loop] = _WorkerState()
+    return state
+
+
+def normalize_prompt(text):
+    return re.sub(r'\s+', ' ', str(text)).strip().casefold()
+
+
+def build_messages(prompt, passages=(), system=SYSTEM_PROMPT):
+    """Chat messages for ``prompt``, grounded in retrieved catalog ``passages``"""
+    if passages:
+        context = '\n\n'.join(
+            f"[{i}] {passage['title']} ({passage['field'].replace('_', ' ')}): {passage['text']}"
+            for i, passage in enumerate(passages, 1)
+        )
+        system = (
+            f"{system}\n\nPrefer these passages from our recipe catalog and cite them "
+            f"by number when you use them:\n\n{context}"
+        )
+    messages = [{'role': 'system', 'content': system}] if system else []
+    messages.append({'role': 'user', 'content': prompt})
+    return messages
+
+
+def prompt_key(messages, backend, **options):
+    """Hash of the normalized ``messages`` for ``backend`` and ``options``"""
+    payload = json.dumps([
+        backend.name,
+        backend.model,
+        [[message['role'], normalize_prompt(message['content'])] for message in messages],
+        sorted((name, value) for name, value in options.items() if value is not None),
+    ])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def _generate(flight, key, messages, options, state, backend):
+    try:
+        try:
+            await asyncio.wait_for(state.slots.acquire(), settings.AI_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise EngineBusy("The assistant is busy, please try again shortly")
+        try:
+            stats['backend_calls'] += 1
+            async for chunk in backend.stream(messages, **options):
+                flight.push(chunk)
+        finally:
+            state.slots.release()
+    except Exception as e:
+        stats['errors'] += 1
+        state.flights.pop(key, None)
+        flight.finish(e)
+        return
+
+    answer = ''.join(flight.chunks)
+    _answers.set(key, answer)
+    state.flights.pop(key, None)
+    flight.finish()
+    try:
+        await cache.aset(CACHE_KEY_PREFIX + key, answer, settings.AI_CACHE_TTL)
+    except Exception:
+        logger.exception("Could not cache AI answer %s", key)
+
+
+async def _replay(answer):
+    yield answer
+
+
+async def open_completion(messages, max_tokens=None, temperature=None):
+    """
+    ``(source, chunks)``: where the answer comes from (``CACHED``,
+    ``COALESCED`` or ``GENERATED``) and an async iterator over its text.
+    Iterating raises ``EngineBusy`` or ``BackendError`` on failure.
+    """
+    backend = get_backend()
+    options = {'max_tokens': max_tokens, 'temperature': temperature}
+    key = prompt_key(messages, backend, **options)
+
+    answer = _answers.get(key)
+    if answer is None:
+        answer = await cache.aget(CACHE_KEY_PREFIX + key)
+        if answer is not None:
+            _answers.set(key, answer)
+    if answer is not None:
+        stats['cache_hits'] += 1
+        return CACHED, _replay(answer)
+
+    state = _state()
+    flight = state.flights.get(key)
+    if flight is not None:
+        stats['coalesced'] += 1
+        return COALESCED, flight.follow()
+
+    flight = state.flights[key] = _Flight()
+    # The flight keeps the only strong reference to its task
+    flight.task = asyncio.create_task(_generate(flight, key, messages, options, state, backend))
+    return GENERATED, flight.follow()
+
+
+async def complete(messages, **options):
+    """``(source, answer)`` for ``messages`` as a whole"""
+    source, chunks = await open_completion(messages, **options)
+    return source, ''.join([chunk async for chunk in chunks])
+
+
+def engine_status():
+    """Backend and per-process counters of the engine"""
+    backend = get_backend()
+    try:
+        state = _states.get(asyncio.get_running_loop())
+    except RuntimeError:
+        state = None
+    return {
+        'backend': backend.name,
+        'model': backend.model,
+        'max_concurrency': settings.AI_MAX_CONCURRENCY,
+        'in_flight': len(state.flights) if state else 0,
+        'counters': dict(stats),
+    }
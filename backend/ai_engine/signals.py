@@ -0,0 +1,18 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from recipes.duplicates import recipes_bulk_created
+from recipes.models import CookingTip, Recipe
+from .retrieval import RECIPE_TEXT_FIELDS, delta_segment
+
+RECIPE_INDEXED_FIELDS = frozenset(['name', 'is_published', *RECIPE_TEXT_FIELDS])
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=CookingTip)
+@receiver(recipes_bulk_created)
+def refresh_retrieval_delta(sender, update_fields=None, **kwargs):
+    """Re-chunk content saved since the last index build into the delta segment"""
+    if sender is Recipe and update_fields is not None and not RECIPE_INDEXED_FIELDS & set(update_fields):
+        return
+    transaction.on_commit(delta_segment.invalidate)
@@ -0,0 +1,10 @@
+from django.urls import path
+from . import views
+
+app_name = 'ai_engine'
+
+urlpatterns = [
+    path('chat/', views.chat, name='chat'),
+    path('retrieve/', views.retrieve_passages, name='retrieve'),
+    path('status/', views.status, name='status'),
+]
@@ -0,0 +1,132 @@
+"""
+Async views of the AI engine.
+
+They run on the event loop under ASGI (``africanmealplanner.asgi``), so a
+worker holds many slow completions at once; answers stream as server-sent
+events. DRF views are synchronous, so these are plain Django views that
+reuse the API's token authentication. Retrieval only reads memory-mapped
+arrays and is an ordinary DRF view.
+"""
+
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from rest_framework import exceptions, permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from accounts.authentication import CachedTokenAuthentication
+from .backends import BackendError
+from .retrieval import retrieve
+from .serializers import ChatRequestSerializer, RetrieveRequestSerializer
+from .service import EngineBusy, build_messages, engine_status, open_completion
+
+_authentication = CachedTokenAuthentication()
+
+
+def async_api_view(methods):
+    """
+    Restrict an async view to ``methods`` and authenticate its API token,
+    answering 401 like DRF. (Django's own view decorators only wrap sync
+    views before 5.0.)
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            try:
+                result = await sync_to_async(_authentication.authenticate)(request)
+            except exceptions.AuthenticationFailed as e:
+                return JsonResponse({'detail': str(e.detail)}, status=401)
+            if result is None:
+                return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+            request.user = result[0]
+            return await view(request, *args, **kwargs)
+        # Token-authenticated, so not exposed to CSRF
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+def _event(data):
+    return f"data: {json.dumps(data)}\n\n"
+
+
+def _sources(passages):
+    return [
+        {key: passage[key] for key in ('source', 'id', 'title', 'slug')}
+        for passage in passages
+    ]
+
+
+async def _events(first, chunks, source, sources):
+    yield _event({'token': first})
+    try:
+        async for chunk in chunks:
+            yield _event({'token': chunk})
+    except (EngineBusy, BackendError) as e:
+        yield _event({'error': str(e)})
+        return
+    yield _event({'done': True, 'source': source, 'sources': sources})
+
+
+@async_api_view(['POST'])
+async def chat(request):
+    """Answer a cooking question, streamed as server-sent events unless ``stream`` is false"""
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'detail': 'Invalid JSON'}, status=400)
+    serializer = ChatRequestSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+
+    prompt = serializer.validated_data['prompt']
+    passages = []
+    if serializer.validated_data['grounded']:
+        passages = await sync_to_async(retrieve)(prompt, settings.AI_CONTEXT_PASSAGES)
+    source, chunks = await open_completion(
+        build_messages(prompt, passages),
+        max_tokens=serializer.validated_data.get('max_tokens'),
+    )
+    # Waiting for the first chunk surfaces a busy or failing backend as a status code
+    try:
+        first = await anext(chunks, '')
+        if not serializer.validated_data['stream']:
+            answer = first + ''.join([chunk async for chunk in chunks])
+            return JsonResponse({'answer': answer, 'source': source, 'sources': _sources(passages)})
+    except EngineBusy as e:
+        return JsonResponse({'detail': str(e)}, status=503)
+    except BackendError as e:
+        return JsonResponse({'detail': str(e)}, status=502)
+
+    response = StreamingHttpResponse(_events(first, chunks, source, _sources(passages)), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep proxies such as nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def retrieve_passages(request):
+    """Catalog passages best matching ``q``: recipe steps and notes, and cooking tips"""
+    serializer = RetrieveRequestSerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=400)
+    query = serializer.validated_data['q']
+    return Response({
+        'query': query,
+        'passages': retrieve(query, serializer.validated_data['limit']),
+    })
+
+
+@async_api_view(['GET'])
+async def status(request):
+    """Backend and counters of this worker's engine (staff only)"""
+    if not request.user.is_staff:
+        return JsonResponse({'detail': 'You do not have permission to perform this action.'}, status=403)
+    return JsonResponse(engine_status())
@@ -0,0 +1 @@
+# Meal planning app for weekly meal plans
\ No newline at end of file
@@ -0,0 +1,26 @@
+from django.contrib import admin
+from .models import MealPlan, PlannedMeal
+
+
+class PlannedMealInline(admin.TabularInline):
+    model = PlannedMeal
+    extra = 0
+    raw_id_fields = ['recipe']
+
+
+@admin.register(MealPlan)
+class MealPlanAdmin(admin.ModelAdmin):
+    list_display = ['user', 'name', 'start_date', 'end_date', 'status', 'is_generated', 'score']
+    list_filter = ['status', 'is_generated', 'start_date']
+    search_fields = ['user__username', 'user__email', 'name']
+    raw_id_fields = ['user']
+    readonly_fields = ['nutrition_summary', 'score', 'created_at', 'updated_at']
+    inlines = [PlannedMealInline]
+
+
+@admin.register(PlannedMeal)
+class PlannedMealAdmin(admin.ModelAdmin):
+    list_display = ['meal_plan', 'date', 'meal_type', 'recipe', 'servings']
+    list_filter = ['meal_type', 'date']
+    search_fields = ['recipe__name', 'meal_plan__user__username']
+    raw_id_fields = ['meal_plan', 'recipe']
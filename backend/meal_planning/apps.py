@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class MealPlanningConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'meal_planning'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,104 @@
+"""
+Bulk weekly plan generation across a process pool.
+
+The parent loads the recipe feature matrix (and every allergy mask) once
+and forks the workers, so each worker reads the same pages copy-on-write
+instead of rebuilding the matrix. Users are sharded into chunks of
+consecutive ids; a worker plans a whole chunk from batched profile queries
+and writes it back with chunked ``bulk_create``.
+
+The stored plans double as the checkpoint: a chunk commits its plans in
+one transaction, so a rerun after a crash skips every user who already has
+a plan for the week and carries on with the rest. Users who built that
+week's plan by hand are always skipped.
+"""
+
+import multiprocessing
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from accounts.models import Allergy
+from recipes.models import Region
+from .generator import PlanningError, build_contexts, recipe_features, save_plans, solve
+from .models import MealPlan
+
+User = get_user_model()
+
+CHUNK_SIZE = 500
+
+# Set in the parent before forking; inherited by the workers
+_features = None
+_options = {}
+
+
+def planned_user_ids(start_date, replace=False):
+    """
+    Users to skip for ``start_date``: everyone with a plan for that week, or
+    with ``replace`` only those whose plan was built by hand
+    """
+    plans = MealPlan.objects.filter(start_date=start_date)
+    if replace:
+        plans = plans.filter(is_generated=False)
+    return set(plans.values_list('user_id', flat=True))
+
+
+def shard_users(queryset, chunk_size=CHUNK_SIZE, exclude=()):
+    """Lists of consecutive user ids not in ``exclude``, ``chunk_size`` at a time"""
+    user_ids = [
+        pk for pk in queryset.order_by('pk').values_list('pk', flat=True).iterator()
+        if pk not in exclude
+    ]
+    return [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+
+
+def generate_chunk(user_ids):
+    """Plan and store a chunk of users; returns ``(plans, failed user ids)``"""
+    features = _features or recipe_features.get()
+    users = User.objects.filter(pk__in=user_ids).only('id', 'family_size', 'country')
+    generated, failed = [], []
+    for context in build_contexts(users, **_options):
+        try:
+            generated.append((context, solve(context, features)))
+        except PlanningError:
+            failed.append(context.user_id)
+    return len(save_plans(generated)), failed
+
+
+def run(chunks, start_date, workers=1, progress=None, **options):
+    """
+    Generate plans for every chunk (see ``shard_users`` and
+    ``planned_user_ids`` for resuming). Returns ``(plans written, failed
+    user ids, seconds)``.
+    """
+    global _features, _options
+    _options = dict(options, start_date=start_date)
+    _features = recipe_features.get()
+    for name in Allergy.objects.values_list('name', flat=True):
+        _features.allergen_mask(name)
+    if options.get('daily_budget'):
+        for region_id in [None, *Region.objects.values_list('pk', flat=True)]:
+            _features.cost_vector(region_id)
+
+    written, failed = 0, []
+    started = time.monotonic()
+
+    def record(result):
+        nonlocal written
+        count, chunk_failed = result
+        written += count
+        failed.extend(chunk_failed)
+        if progress:
+            progress(written, time.monotonic() - started)
+
+    if workers <= 1:
+        for chunk in chunks:
+            record(generate_chunk(chunk))
+    else:
+        # Forked workers must open their own database connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with context.Pool(workers) as pool:
+            for result in pool.imap_unordered(generate_chunk, chunks):
+                record(result)
+    return written, failed, time.monotonic() - started
@@ -0,0 +1,519 @@
+"""
+Weekly meal plan generation.
+
+Every published recipe with known calories is preloaded into a feature
+matrix (calories, protein, carbs and fat per serving, meal type, prep time,
+rating). A plan is a 7 x 3 grid of matrix positions found by a vectorized
+greedy fill followed by local search: each pass scores every candidate of a
+slot at once with NumPy and keeps the best improving swap, until no slot
+improves.
+
+The objective penalizes daily calorie and macro deviations beyond the
+tolerance, repeated recipes and low ratings. Allergies, dietary preferences
+and health conditions are hard filters applied to the candidate mask. With
+a daily budget, recipes without a cost estimate (or costing more than the
+whole day's budget) are filtered out too, and days over budget are
+penalized like a missed calorie target.
+"""
+
+import datetime
+import zlib
+from collections import namedtuple
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+from africanmealplanner.caching import GenerationalSnapshot
+from accounts.models import UserProfile
+from recipes.models import Recipe, RecipeCompatibility, RecipeCost
+from recipes.pricing import price_region
+from .models import MealPlan, PlannedMeal
+
+SLOTS = ('breakfast', 'lunch', 'dinner')
+DAYS = 7
+
+# Recipe meal types eligible for each slot, in order of preference
+SLOT_MEAL_TYPES = {
+    'breakfast': ('breakfast',),
+    'lunch': ('lunch', 'dinner'),
+    'dinner': ('dinner', 'lunch'),
+}
+MAIN_MEAL_TYPES = ('breakfast', 'lunch', 'dinner', 'snack')
+# Share of the daily calorie target per slot
+SLOT_SHARES = np.array([0.25, 0.35, 0.40])
+
+# Columns of the nutrient matrix and target vectors
+CALORIES, PROTEIN, CARBS, FAT = range(4)
+NUTRIENT_NAMES = ('calories', 'protein', 'carbs', 'fat')
+KCAL_PER_GRAM = {'protein': 4.0, 'carbs': 4.0, 'fat': 9.0}
+DEFAULT_MACROS = {'protein': 20.0, 'carbs': 50.0, 'fat': 30.0}
+MACRO_ALIASES = {'carbohydrates': 'carbs', 'carb': 'carbs', 'proteins': 'protein', 'fats': 'fat'}
+DEFAULT_CALORIE_TARGET = 2000
+
+CALORIE_TOLERANCE = 0.10
+MACRO_TOLERANCE = 0.20
+TOLERANCES = np.array([CALORIE_TOLERANCE, MACRO_TOLERANCE, MACRO_TOLERANCE, MACRO_TOLERANCE])
+NUTRIENT_WEIGHTS = np.array([4.0, 1.0, 1.0, 1.0])
+BUDGET_WEIGHT = 4.0
+
+MAX_REPEATS = 2
+REPEAT_WEIGHT = 0.5
+RATING_WEIGHT = 0.05
+POOL_SIZE = 300
+MAX_PASSES = 4
+CREATE_BATCH_SIZE = 1000
+
+PlanningContext = namedtuple('PlanningContext', [
+    'user_id', 'start_date', 'servings', 'targets', 'allergies',
+    'compatible_recipes', 'max_prep_time', 'max_repeats', 'seed',
+    'daily_budget', 'price_region',
+], defaults=(None, None))
+PlanResult = namedtuple(
+    'PlanResult', ['recipe_ids', 'day_totals', 'score', 'within_tolerance', 'day_costs'],
+    defaults=(None,)
+)
+
+
+class PlanningError(Exception):
+    """Raised when no plan can be built for a context"""
+
+
+class RecipeFeatures:
+    """Per-serving features of every plannable recipe, ordered by id"""
+
+    def __init__(self, ids, meal_types, prep_time, nutrients, ratings, allergen_text):
+        self.ids = ids
+        self.meal_types = meal_types
+        self.prep_time = prep_time
+        self.nutrients = nutrients
+        self.ratings = ratings
+        self.allergen_text = allergen_text
+        self.slot_masks = {
+            slot: np.isin(meal_types, types) for slot, types in SLOT_MEAL_TYPES.items()
+        }
+        self.main_mask = np.isin(meal_types, MAIN_MEAL_TYPES)
+        self._allergen_masks = {}
+        self._cost_vectors = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def positions(self, recipe_ids):
+        """Matrix positions of ``recipe_ids``; ids not in the matrix are dropped"""
+        recipe_ids = np.fromiter(recipe_ids, dtype=np.int64)
+        if not len(self.ids) or not len(recipe_ids):
+            return np.zeros(0, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.ids, recipe_ids), len(self.ids) - 1)
+        return positions[self.ids[positions] == recipe_ids]
+
+    def allergen_mask(self, allergy):
+        """Recipes whose allergen warnings mention ``allergy`` (memoized per allergy)"""
+        key = str(allergy).strip().lower()
+        mask = self._allergen_masks.get(key)
+        if mask is None:
+            mask = np.fromiter(
+                (key in text for text in self.allergen_text), dtype=bool, count=len(self.ids)
+            )
+            self._allergen_masks[key] = mask
+        return mask
+
+    def cost_vector(self, region_id=None):
+        """Cost per serving at a region's prices, NaN when unknown (memoized per region)"""
+        costs = self._cost_vectors.get(region_id)
+        if costs is None:
+            costs = np.full(len(self.ids), np.nan)
+            rows = list(
+                RecipeCost.objects.filter(region_id=region_id).values_list('recipe_id', 'cost_per_serving')
+            )
+            if rows and len(self.ids):
+                recipe_ids, values = (np.array(column) for column in zip(*rows))
+                positions = np.minimum(np.searchsorted(self.ids, recipe_ids), len(self.ids) - 1)
+                found = self.ids[positions] == recipe_ids
+                costs[positions[found]] = values[found]
+            self._cost_vectors[region_id] = costs
+        return costs
+
+
+def _macro_grams(calories, ratios):
+    return [calories * ratios[name] / 100.0 / KCAL_PER_GRAM[name] for name in ('protein', 'carbs', 'fat')]
+
+
+def build_recipe_features():
+    rows = list(
+        Recipe.objects.filter(is_published=True, calories_per_serving__gt=0)
+        .order_by('pk')
+        .values_list(
+            'id', 'meal_type', 'prep_time', 'calories_per_serving',
+            'protein_g', 'carbs_g', 'fat_g', 'average_rating', 'allergen_warnings'
+        )
+    )
+    nutrients = np.zeros((len(rows), 4))
+    for position, row in enumerate(rows):
+        calories = float(row[3])
+        # Missing macros are estimated from calories with the default split
+        estimate = _macro_grams(calories, DEFAULT_MACROS)
+        nutrients[position] = [calories] + [
+            value if value is not None else estimate[i] for i, value in enumerate(row[4:7])
+        ]
+    return RecipeFeatures(
+        ids=np.array([row[0] for row in rows], dtype=np.int64),
+        meal_types=np.array([row[1] for row in rows], dtype=object),
+        prep_time=np.array([row[2] or 0 for row in rows], dtype=np.int32),
+        nutrients=nutrients,
+        ratings=np.array([row[7] or 0.0 for row in rows]),
+        allergen_text=[
+            ' '.join(str(warning) for warning in row[8] or []).lower() for row in rows
+        ],
+    )
+
+
+recipe_features = GenerationalSnapshot('meal-plan-features', build_recipe_features, check_interval=5.0)
+
+
+def nutrient_targets(calorie_target, macro_ratios=()):
+    """
+    Daily ``[calories, protein g, carbs g, fat g]`` for a calorie target and
+    the ``recommended_macros`` percentages of the user's fitness goals
+    (averaged; defaults when none are set).
+    """
+    totals = {name: [] for name in DEFAULT_MACROS}
+    for ratios in macro_ratios:
+        for key, value in (ratios or {}).items():
+            name = MACRO_ALIASES.get(str(key).lower(), str(key).lower())
+            if name in totals and isinstance(value, (int, float)) and value > 0:
+                totals[name].append(float(value))
+    ratios = {
+        name: sum(values) / len(values) if values else DEFAULT_MACROS[name]
+        for name, values in totals.items()
+    }
+    scale = 100.0 / sum(ratios.values())
+    ratios = {name: value * scale for name, value in ratios.items()}
+    return np.array([float(calorie_target)] + _macro_grams(calorie_target, ratios))
+
+
+def _seed(user_id, start_date):
+    return zlib.crc32(f"{user_id}:{start_date.isoformat()}".encode())
+
+
+def build_contexts(users, start_date, calorie_target=None, max_prep_time=None,
+                   max_repeats=MAX_REPEATS, seed=None, daily_budget=None):
+    """
+    Planning contexts for many users with a fixed number of queries: one for
+    profiles (plus prefetches) and one for compatible recipes.
+    ``daily_budget`` is per person, priced in the region of the user's country.
+    """
+    users = list(users)
+    profiles = {
+        profile.user_id: profile for profile in UserProfile.objects.filter(
+            user_id__in=[user.pk for user in users]
+        ).prefetch_related('allergies', 'health_conditions', 'dietary_preferences', 'fitness_goals')
+    }
+
+    # Recipes evaluated as compatible with each condition any of these users has
+    scope = Q()
+    condition_keys = {}
+    for user_id, profile in profiles.items():
+        keys = [
+            (RecipeCompatibility.HEALTH_CONDITION, condition.pk)
+            for condition in profile.health_conditions.all()
+        ] + [
+            (RecipeCompatibility.DIETARY_PREFERENCE, preference.pk)
+            for preference in profile.dietary_preferences.all()
+        ]
+        condition_keys[user_id] = keys
+        for condition_type, condition_id in keys:
+            scope |= Q(condition_type=condition_type, condition_id=condition_id)
+    compatible = {}
+    if scope:
+        for condition_type, condition_id, recipe_id in RecipeCompatibility.objects.filter(
+            scope, is_compatible=True
+        ).values_list('condition_type', 'condition_id', 'recipe_id'):
+            compatible.setdefault((condition_type, condition_id), []).append(recipe_id)
+    compatible = {key: frozenset(recipe_ids) for key, recipe_ids in compatible.items()}
+
+    contexts = []
+    for user in users:
+        profile = profiles.get(user.pk)
+        target = calorie_target or (
+            profile and (profile.daily_calorie_target or profile.daily_calories)
+        ) or DEFAULT_CALORIE_TARGET
+        macros = [goal.recommended_macros for goal in profile.fitness_goals.all()] if profile else []
+        contexts.append(PlanningContext(
+            user_id=user.pk,
+            start_date=start_date,
+            servings=user.family_size or 1,
+            targets=nutrient_targets(target, macros),
+            allergies=tuple(allergy.name for allergy in profile.allergies.all()) if profile else (),
+            # One set per condition, shared between users
+            compatible_recipes=tuple(
+                compatible.get(key, frozenset()) for key in condition_keys.get(user.pk, ())
+            ),
+            max_prep_time=max_prep_time,
+            max_repeats=max_repeats,
+            seed=_seed(user.pk, start_date) if seed is None else seed,
+            daily_budget=float(daily_budget) if daily_budget else None,
+            price_region=price_region(user.country),
+        ))
+    return contexts
+
+
+def build_context(user, start_date, **options):
+    """Planning context for a single user (see ``build_contexts``)"""
+    return build_contexts([user], start_date, **options)[0]
+
+
+def candidate_mask(context, features):
+    """Recipes the user may be served: allergy-, preference- and time-safe"""
+    mask = np.ones(len(features), dtype=bool)
+    for allergy in context.allergies:
+        mask &= ~features.allergen_mask(allergy)
+    for recipe_ids in context.compatible_recipes:
+        # Recipes without a compatible row (incompatible or not evaluated) are out
+        compatible = np.zeros(len(features), dtype=bool)
+        compatible[features.positions(recipe_ids)] = True
+        mask &= compatible
+    if context.max_prep_time:
+        mask &= features.prep_time <= context.max_prep_time
+    if context.daily_budget:
+        # NaN (no estimate) compares false
+        mask &= features.cost_vector(context.price_region) <= context.daily_budget
+    return mask
+
+
+def day_penalty(totals, targets):
+    """Penalty for daily totals ``(..., 4)`` against the targets"""
+    deviation = np.abs(totals - targets) / targets
+    excess = np.maximum(deviation - TOLERANCES, 0.0)
+    return (NUTRIENT_WEIGHTS * (10.0 * excess ** 2 + 0.1 * deviation ** 2)).sum(axis=-1)
+
+
+def budget_penalty(day_costs, budget):
+    """Penalty for daily costs over ``budget`` (spending less is free)"""
+    excess = np.maximum(np.asarray(day_costs) / budget - 1.0, 0.0)
+    return BUDGET_WEIGHT * 10.0 * excess ** 2
+
+
+def slot_pools(features, mask, targets, rng):
+    """Candidate positions per slot, trimmed to the ``POOL_SIZE`` best suited"""
+    pools = []
+    for index, slot in enumerate(SLOTS):
+        candidates = np.flatnonzero(mask & features.slot_masks[slot])
+        if len(candidates) < DAYS:
+            candidates = np.flatnonzero(mask & features.main_mask)
+        if not len(candidates):
+            raise PlanningError("No recipes match the dietary constraints")
+        if len(candidates) > POOL_SIZE:
+            # Favor recipes sized for the slot, with jitter for variety
+            slot_calories = targets[CALORIES] * SLOT_SHARES[index]
+            fit = np.abs(features.nutrients[candidates, CALORIES] - slot_calories) / slot_calories
+            fit += rng.random(len(candidates)) * 0.3 - RATING_WEIGHT * features.ratings[candidates]
+            candidates = candidates[np.argpartition(fit, POOL_SIZE)[:POOL_SIZE]]
+        pools.append(candidates)
+    return pools
+
+
+def _slot_costs(features, pool, counts, excluded, max_repeats):
+    """Repetition and rating cost of placing each pool recipe (inf when not allowed)"""
+    cost = REPEAT_WEIGHT * counts[pool] - RATING_WEIGHT * features.ratings[pool] / 5.0
+    blocked = counts[pool] >= max_repeats
+    for position in excluded:
+        # Never the same recipe twice in a day
+        blocked |= pool == position
+    return np.where(blocked, np.inf, cost)
+
+
+def solve(context, features, mask=None, fixed=None):
+    """
+    Search a 7 x 3 grid of matrix positions for ``context``.
+
+    ``fixed`` optionally maps ``(day, slot)`` to positions that must be
+    kept; only the other slots are searched.
+    """
+    mask = candidate_mask(context, features) if mask is None else mask
+    targets = context.targets
+    rng = np.random.default_rng(context.seed)
+    pools = slot_pools(features, mask, targets, rng)
+    fixed = fixed or {}
+    budget = context.daily_budget
+    costs = np.nan_to_num(features.cost_vector(context.price_region)) if budget else None
+
+    def penalty(totals, spent):
+        value = day_penalty(totals, targets)
+        if budget:
+            value = value + budget_penalty(spent, budget)
+        return value
+
+    nutrients = features.nutrients
+    counts = np.zeros(len(features), dtype=np.int32)
+    plan = np.full((DAYS, len(SLOTS)), -1, dtype=np.int64)
+    for (day, slot), position in fixed.items():
+        plan[day, slot] = position
+        counts[position] += 1
+
+    # Greedy fill: closest slot-sized recipe not yet overused
+    for day in range(DAYS):
+        for slot in range(len(SLOTS)):
+            if plan[day, slot] >= 0:
+                continue
+            pool = pools[slot]
+            slot_calories = targets[CALORIES] * SLOT_SHARES[slot]
+            cost = np.abs(nutrients[pool, CALORIES] - slot_calories) / slot_calories
+            cost = cost + rng.random(len(pool)) * 0.05
+            cost += _slot_costs(features, pool, counts, plan[day], context.max_repeats)
+            if budget:
+                cost += budget_penalty(costs[pool], budget * SLOT_SHARES[slot])
+            choice = pool[np.argmin(cost)]
+            if not np.isfinite(cost.min()):
+                # Everything is overused: allow repeats rather than fail
+                choice = pool[rng.integers(len(pool))]
+            plan[day, slot] = choice
+            counts[choice] += 1
+
+    day_totals = nutrients[plan].sum(axis=1)
+    day_costs = costs[plan].sum(axis=1) if budget else np.zeros(DAYS)
+    penalties = penalty(day_totals, day_costs)
+
+    # Local search: best single-slot swap per slot until nothing improves
+    free = [(day, slot) for day in range(DAYS) for slot in range(len(SLOTS)) if (day, slot) not in fixed]
+    for _ in range(MAX_PASSES):
+        improved = False
+        for order in rng.permutation(len(free)):
+            day, slot = free[order]
+            current = plan[day, slot]
+            pool = pools[slot]
+            counts[current] -= 1
+            others = np.delete(plan[day], slot)
+            totals = day_totals[day] - nutrients[current] + nutrients[pool]
+            spent = day_costs[day] - costs[current] + costs[pool] if budget else 0.0
+            delta = penalty(totals, spent) - penalties[day]
+            delta += _slot_costs(features, pool, counts, others, context.max_repeats)
+            delta -= REPEAT_WEIGHT * counts[current] - RATING_WEIGHT * features.ratings[current] / 5.0
+            best = np.argmin(delta)
+            if delta[best] < -1e-9 and pool[best] != current:
+                current = plan[day, slot] = pool[best]
+                day_totals[day] = totals[best]
+                if budget:
+                    day_costs[day] = spent[best]
+                penalties[day] = penalty(totals[best], day_costs[day])
+                improved = True
+            counts[current] += 1
+        if not improved:
+            break
+
+    penalties = penalty(day_totals, day_costs)
+    deviation = np.abs(day_totals - targets) / targets
+    within_budget = not budget or bool((day_costs <= budget + 1e-9).all())
+    return PlanResult(
+        recipe_ids=features.ids[plan],
+        day_totals=day_totals,
+        score=round(float(penalties.sum()), 4),
+        within_tolerance=bool((deviation <= TOLERANCES).all()) and within_budget,
+        day_costs=day_costs if budget else None,
+    )
+
+
+def generate_plan(context, features=None):
+    """Generate a week plan for ``context`` from the preloaded recipe features"""
+    return solve(context, features or recipe_features.get())
+
+
+def nutrition_summary(context, result):
+    """JSON summary of a generated plan's daily totals against the targets"""
+    daily = []
+    for day, totals in enumerate(result.day_totals):
+        date = context.start_date + datetime.timedelta(days=day)
+        daily.append(dict(
+            {'date': date.isoformat()},
+            **{name: round(float(value), 1) for name, value in zip(NUTRIENT_NAMES, totals)}
+        ))
+    average = result.day_totals.mean(axis=0)
+    summary = {
+        'daily': daily,
+        'average': {name: round(float(value), 1) for name, value in zip(NUTRIENT_NAMES, average)},
+        'targets': {name: round(float(value), 1) for name, value in zip(NUTRIENT_NAMES, context.targets)},
+        'within_tolerance': result.within_tolerance,
+    }
+    if result.day_costs is not None:
+        # Estimated cost per person
+        for day, cost in zip(daily, result.day_costs):
+            day['cost'] = round(float(cost), 2)
+        summary['average']['cost'] = round(float(result.day_costs.mean()), 2)
+        summary['targets']['cost'] = round(context.daily_budget, 2)
+    return summary
+
+
+def build_plan(context, result, name=''):
+    """Unsaved ``MealPlan`` and its ``PlannedMeal`` rows for a generated plan"""
+    plan = MealPlan(
+        user_id=context.user_id,
+        name=name or f"Week of {context.start_date:%b %d}",
+        start_date=context.start_date,
+        end_date=context.start_date + datetime.timedelta(days=DAYS - 1),
+        is_generated=True,
+        target_calories=int(round(context.targets[CALORIES])),
+        daily_budget=context.daily_budget,
+        nutrition_summary=nutrition_summary(context, result),
+        score=result.score,
+    )
+    meals = [
+        PlannedMeal(
+            meal_plan=plan,
+            recipe_id=int(result.recipe_ids[day, slot]),
+            date=context.start_date + datetime.timedelta(days=day),
+            meal_type=meal_type,
+            servings=context.servings,
+        )
+        for day in range(DAYS)
+        for slot, meal_type in enumerate(SLOTS)
+    ]
+    return plan, meals
+
+
+def save_plans(generated, batch_size=CREATE_BATCH_SIZE):
+    """
+    Store ``(context, result)`` pairs, replacing each user's generated plan
+    for that week, with one delete and two chunked bulk inserts. Users who
+    built that week's plan by hand are skipped. Returns the plans.
+    """
+    if not generated:
+        return []
+    weeks = {}
+    for context, _ in generated:
+        weeks.setdefault(context.start_date, []).append(context.user_id)
+    scope = Q()
+    for start_date, user_ids in weeks.items():
+        scope |= Q(start_date=start_date, user_id__in=user_ids)
+    with transaction.atomic():
+        existing = MealPlan.objects.filter(scope)
+        manual = set(existing.filter(is_generated=False).values_list('user_id', 'start_date'))
+        built = [
+            build_plan(context, result) for context, result in generated
+            if (context.user_id, context.start_date) not in manual
+        ]
+        existing.filter(is_generated=True).delete()
+        plans = MealPlan.objects.bulk_create([plan for plan, _ in built], batch_size=batch_size)
+        meals = []
+        for plan, plan_meals in zip(plans, (meals for _, meals in built)):
+            for meal in plan_meals:
+                meal.meal_plan = plan
+            meals.extend(plan_meals)
+        PlannedMeal.objects.bulk_create(meals, batch_size=batch_size)
+    return plans
+
+
+def save_plan(context, result, name=''):
+    """
+    Store a generated plan, replacing the user's generated plan for that
+    week. Raises ``PlanningError`` if the user built that week's plan by hand.
+    """
+    plan, meals = build_plan(context, result, name)
+    with transaction.atomic():
+        existing = MealPlan.objects.filter(user_id=context.user_id, start_date=context.start_date)
+        if existing.filter(is_generated=False).exists():
+            raise PlanningError("You already have a meal plan for that week")
+        existing.delete()
+        plan.save()
+        for meal in meals:
+            meal.meal_plan = plan
+        PlannedMeal.objects.bulk_create(meals)
+    return plan
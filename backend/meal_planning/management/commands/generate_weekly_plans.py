@@ -0,0 +1,55 @@
+import datetime
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from meal_planning.batch import CHUNK_SIZE, planned_user_ids, run, shard_users
+from meal_planning.generator import DAYS, MAX_REPEATS
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Generate next week's meal plan for every active user (run Sunday night)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', type=datetime.date.fromisoformat, default=None,
+                            help='First day of the plans (default: next Monday)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--max-repeats', type=int, default=MAX_REPEATS)
+        parser.add_argument('--daily-budget', type=float, default=None,
+                            help='Food budget per person per day (default: none)')
+        parser.add_argument('--replace', action='store_true',
+                            help='Regenerate plans already generated for that week '
+                                 '(default: resume, skipping users who have one)')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        start_date = options['start_date'] or today + datetime.timedelta(days=DAYS - today.weekday())
+        skipped = planned_user_ids(start_date, replace=options['replace'])
+        chunks = shard_users(User.objects.filter(is_active=True), options['chunk_size'], exclude=skipped)
+        self.stdout.write(
+            f'Planning week of {start_date} for {sum(map(len, chunks))} users '
+            f'with {options["workers"]} workers, skipping {len(skipped)} with a plan'
+        )
+
+        def progress(written, elapsed):
+            self.stdout.write(f'  {written} plans, {written / max(elapsed, 1e-6):.0f} plans/s')
+
+        written, failed, elapsed = run(
+            chunks,
+            start_date,
+            workers=options['workers'],
+            progress=progress,
+            max_repeats=options['max_repeats'],
+            daily_budget=options['daily_budget'],
+        )
+        if failed:
+            self.stdout.write(self.style.WARNING(
+                f'No plan possible for {len(failed)} users: {", ".join(map(str, failed[:20]))}'
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} plans in {elapsed:.1f}s ({written / max(elapsed, 1e-6):.0f} plans/s)'
+        ))
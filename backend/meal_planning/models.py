@@ -0,0 +1,84 @@
+from django.db import models
+from django.contrib.auth import get_user_model
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class MealPlan(models.Model):
+    """A user's meal plan for a week"""
+    STATUS_CHOICES = [
+        ('draft', 'Draft'),
+        ('active', 'Active'),
+        ('archived', 'Archived'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='meal_plans')
+    name = models.CharField(max_length=200, blank=True)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    
+    # Generation
+    is_generated = models.BooleanField(default=False)
+    target_calories = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Daily calorie target the plan was generated for"
+    )
+    daily_budget = models.DecimalField(
+        max_digits=8,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Daily food budget per person the plan was generated for (settings.PRICE_CURRENCY)"
+    )
+    nutrition_summary = models.JSONField(
+        default=dict,
+        help_text="Daily totals and averages per serving (calories, protein, carbs, fat, cost)"
+    )
+    score = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Generator objective, lower is closer to the targets"
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'meal_plans'
+        ordering = ['-start_date']
+        unique_together = ['user', 'start_date']
+        indexes = [
+            models.Index(fields=['user', 'status']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.start_date}"
+
+
+class PlannedMeal(models.Model):
+    """A recipe scheduled for one meal of a plan"""
+    MEAL_TYPE_CHOICES = [
+        ('breakfast', 'Breakfast'),
+        ('lunch', 'Lunch'),
+        ('dinner', 'Dinner'),
+        ('snack', 'Snack'),
+    ]
+    
+    meal_plan = models.ForeignKey(MealPlan, on_delete=models.CASCADE, related_name='meals')
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='planned_meals')
+    date = models.DateField()
+    meal_type = models.CharField(max_length=20, choices=MEAL_TYPE_CHOICES)
+    servings = models.PositiveIntegerField(default=1)
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'planned_meals'
+        ordering = ['date', 'id']
+        unique_together = ['meal_plan', 'date', 'meal_type']
+    
+    def __str__(self):
+        return f"{self.meal_plan} - {self.date} {self.meal_type}: {self.recipe.name}"
@@ -0,0 +1,101 @@
+import datetime
+from decimal import Decimal
+
+from rest_framework import serializers
+from recipes.models import Recipe
+from recipes.serializers import RecipeListSerializer
+from .generator import DAYS, MAX_REPEATS
+from .swap import DEFAULT_LIMIT, MAX_LIMIT
+from .models import MealPlan, PlannedMeal
+
+
+class PlannedMealSerializer(serializers.ModelSerializer):
+    recipe = RecipeListSerializer(read_only=True)
+    recipe_id = serializers.PrimaryKeyRelatedField(
+        queryset=Recipe.objects.filter(is_published=True),
+        source='recipe',
+        write_only=True
+    )
+    
+    class Meta:
+        model = PlannedMeal
+        fields = ['id', 'recipe', 'recipe_id', 'date', 'meal_type', 'servings', 'notes']
+    
+    def validate(self, attrs):
+        meal_plan = self.context.get('meal_plan') or getattr(self.instance, 'meal_plan', None)
+        date = attrs.get('date', getattr(self.instance, 'date', None))
+        if meal_plan and date and not meal_plan.start_date <= date <= meal_plan.end_date:
+            raise serializers.ValidationError({'date': "Date is outside the meal plan"})
+        return attrs
+
+
+class MealPlanListSerializer(serializers.ModelSerializer):
+    """Serializer for meal plan list view"""
+    
+    class Meta:
+        model = MealPlan
+        fields = [
+            'id', 'name', 'start_date', 'end_date', 'status', 'is_generated',
+            'target_calories', 'daily_budget', 'score', 'created_at'
+        ]
+
+
+class MealPlanSerializer(serializers.ModelSerializer):
+    """Serializer for a meal plan with its meals"""
+    meals = PlannedMealSerializer(many=True, read_only=True)
+    
+    class Meta:
+        model = MealPlan
+        fields = [
+            'id', 'name', 'start_date', 'end_date', 'status', 'is_generated',
+            'target_calories', 'daily_budget', 'nutrition_summary', 'score', 'meals',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = [
+            'is_generated', 'target_calories', 'daily_budget', 'nutrition_summary', 'score',
+            'created_at', 'updated_at'
+        ]
+    
+    def validate(self, attrs):
+        start_date = attrs.get('start_date', getattr(self.instance, 'start_date', None))
+        end_date = attrs.get('end_date', getattr(self.instance, 'end_date', None))
+        if start_date and end_date and end_date < start_date:
+            raise serializers.ValidationError({'end_date': "End date must not be before the start date"})
+        
+        # One plan per user and start date
+        request = self.context.get('request')
+        if request and 'start_date' in attrs:
+            existing = MealPlan.objects.filter(user=request.user, start_date=start_date)
+            if self.instance is not None:
+                existing = existing.exclude(pk=self.instance.pk)
+            if existing.exists():
+                raise serializers.ValidationError({'start_date': "A meal plan already starts on this date"})
+        return attrs
+
+
+class GeneratePlanSerializer(serializers.Serializer):
+    """Serializer for meal plan generation parameters"""
+    start_date = serializers.DateField(required=False)
+    name = serializers.CharField(max_length=200, required=False, allow_blank=True)
+    calorie_target = serializers.IntegerField(required=False, min_value=800, max_value=6000)
+    max_prep_time = serializers.IntegerField(required=False, min_value=5)
+    max_repeats = serializers.IntegerField(default=MAX_REPEATS, min_value=1, max_value=DAYS)
+    daily_budget = serializers.DecimalField(
+        max_digits=8, decimal_places=2, required=False, min_value=Decimal('0.01'),
+        help_text="Food budget per person per day"
+    )
+    
+    def validate_start_date(self, value):
+        if value < datetime.date.today() - datetime.timedelta(days=DAYS):
+            raise serializers.ValidationError("Start date is too far in the past")
+        return value
+
+
+class SwapQuerySerializer(serializers.Serializer):
+    """Serializer for meal swap suggestion parameters"""
+    limit = serializers.IntegerField(default=DEFAULT_LIMIT, min_value=1, max_value=MAX_LIMIT)
+
+
+class SwapSerializer(serializers.Serializer):
+    """Serializer for swapping a planned meal's recipe"""
+    recipe_id = serializers.PrimaryKeyRelatedField(queryset=Recipe.objects.filter(is_published=True))
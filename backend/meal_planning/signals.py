@@ -0,0 +1,65 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from accounts.models import UserProfile
+from recipes.models import Ingredient, Recipe
+from recipes.duplicates import recipes_bulk_created
+from recipes.nutrition import recipe_nutrition_changed
+from recipes.pricing import recipe_costs_changed
+from .generator import recipe_features
+from .swap import forget_user
+
+# Recipe fields the plan generator's feature matrix is built from
+FEATURE_FIELDS = frozenset([
+    'is_published', 'meal_type', 'total_time', 'prep_time', 'cook_time',
+    'calories_per_serving', 'protein_g', 'carbs_g', 'fat_g',
+    'nutritional_info', 'allergen_warnings',
+])
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_plan_features(sender, update_fields=None, **kwargs):
+    """Rebuild the plan generator's recipe matrix after recipe edits"""
+    if update_fields is not None and not FEATURE_FIELDS & set(update_fields):
+        return
+    transaction.on_commit(recipe_features.invalidate)
+
+
+@receiver(post_save, sender=Ingredient)
+def invalidate_plan_features_for_ingredient(sender, instance, created, **kwargs):
+    """Ingredient nutrition edits change derived recipe macros"""
+    if not created and instance.has_changed(*Ingredient.NUTRITION_FIELDS):
+        transaction.on_commit(recipe_features.invalidate)
+
+
+@receiver(recipes_bulk_created)
+def invalidate_plan_features_for_import(sender, **kwargs):
+    """Bulk-created recipes skip post_save"""
+    transaction.on_commit(recipe_features.invalidate)
+
+
+@receiver(recipe_nutrition_changed)
+def invalidate_plan_nutrition(sender, **kwargs):
+    """Bulk nutrition recomputes rewrite calories and macros without post_save"""
+    transaction.on_commit(recipe_features.invalidate)
+
+
+@receiver(recipe_costs_changed)
+def invalidate_plan_costs(sender, **kwargs):
+    """Cost vectors are memoized on the feature matrix"""
+    transaction.on_commit(recipe_features.invalidate)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(m2m_changed, sender=UserProfile.allergies.through)
+@receiver(m2m_changed, sender=UserProfile.dietary_preferences.through)
+@receiver(m2m_changed, sender=UserProfile.health_conditions.through)
+@receiver(m2m_changed, sender=UserProfile.fitness_goals.through)
+def forget_swap_candidates(sender, instance, action=None, reverse=False, **kwargs):
+    """Drop a user's cached swap candidates after profile edits"""
+    if action is not None and (reverse or not action.startswith('post_')):
+        return
+    user_id = instance.user_id
+    # After commit, so no worker rebuilds from the old profile
+    transaction.on_commit(lambda: forget_user(user_id))
@@ -0,0 +1,208 @@
+"""
+Single-slot swaps on a stored meal plan.
+
+The other meals stay fixed: their per-serving totals for the day and the
+week are summed once, then every allowed recipe is scored against the
+targets at once with the same preloaded feature matrix the generator
+uses. A user's candidate mask (allergies, dietary rules) is cached per
+process under a shared per-user generation, so a profile change seen by
+one worker invalidates it in all of them. Plans generated with a
+daily budget only get replacements that keep the day within it, when any
+do.
+"""
+
+import numpy as np
+from django.db import transaction
+from africanmealplanner.caching import LocalTTLCache, bump_generation, get_generation
+from recipes.models import Recipe
+from .generator import (
+    CALORIES, NUTRIENT_NAMES, RATING_WEIGHT, REPEAT_WEIGHT, TOLERANCES,
+    build_context, candidate_mask, day_penalty, recipe_features
+)
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+# (user id, user generation) -> (feature generation, planning context, candidate mask)
+_candidates = LocalTTLCache(ttl=300, maxsize=5000)
+
+
+def _user_generation_name(user_id):
+    return f"swap-candidates:{user_id}"
+
+
+def user_candidates(user, start_date):
+    """Cached ``(context, candidate mask)`` for ``user`` against the current matrix"""
+    features = recipe_features.get()
+    key = (user.pk, get_generation(_user_generation_name(user.pk)))
+    cached = _candidates.get(key)
+    if cached is None or cached[0] != recipe_features.generation:
+        context = build_context(user, start_date)
+        cached = (recipe_features.generation, context, candidate_mask(context, features))
+        _candidates.set(key, cached)
+    _, context, mask = cached
+    return context._replace(start_date=start_date), mask
+
+
+def forget_user(user_id):
+    """Drop ``user_id``'s cached candidates in every process"""
+    bump_generation(_user_generation_name(user_id))
+
+
+def _recipe_nutrients(features, recipe_ids):
+    """Per-serving ``[calories, protein, carbs, fat]`` rows for ``recipe_ids``"""
+    recipe_ids = list(recipe_ids)
+    rows = np.zeros((len(recipe_ids), len(NUTRIENT_NAMES)))
+    positions = np.searchsorted(features.ids, recipe_ids)
+    missing = []
+    for row, (recipe_id, position) in enumerate(zip(recipe_ids, positions)):
+        if position < len(features.ids) and features.ids[position] == recipe_id:
+            rows[row] = features.nutrients[position]
+        else:
+            missing.append(row)
+    if missing:
+        # Unpublished or uncounted recipes still count towards the totals
+        values = Recipe.objects.filter(pk__in=[recipe_ids[row] for row in missing]).in_bulk()
+        for row in missing:
+            recipe = values.get(recipe_ids[row])
+            if recipe is not None:
+                rows[row] = [
+                    recipe.calories_per_serving or 0, recipe.protein_g or 0,
+                    recipe.carbs_g or 0, recipe.fat_g or 0,
+                ]
+    return rows
+
+
+def _spent(features, costs, recipe_ids):
+    """Summed cost per serving of ``recipe_ids``; unknown costs count as nothing"""
+    return float(np.nansum(costs[features.positions(recipe_ids)]))
+
+
+def _slot_mask(features, meal_type):
+    mask = features.slot_masks.get(meal_type)
+    if mask is None:
+        mask = features.meal_types == meal_type
+    return mask
+
+
+def swap_candidates(meal, limit=DEFAULT_LIMIT):
+    """
+    Ranked replacements for ``meal`` that keep the rest of its plan fixed.
+
+    Recipes keeping both the day and the week average within the calorie
+    and macro tolerance rank first; when none do, the closest are returned
+    with ``within_bounds`` false.
+    """
+    plan = meal.meal_plan
+    features = recipe_features.get()
+    context, mask = user_candidates(plan.user, plan.start_date)
+    targets = context.targets.copy()
+    if plan.target_calories:
+        targets *= plan.target_calories / targets[CALORIES]
+
+    meals = list(plan.meals.values_list('id', 'recipe_id', 'date'))
+    others = [(recipe_id, date) for pk, recipe_id, date in meals if pk != meal.pk]
+    nutrients = _recipe_nutrients(features, [recipe_id for recipe_id, _ in others])
+    same_day = np.array([date == meal.date for _, date in others], dtype=bool)
+    day_rest = nutrients[same_day].sum(axis=0)
+    week_rest = nutrients.sum(axis=0)
+    days = max(len({date for _, _, date in meals}), 1)
+
+    # Allowed recipes: not already that day, not over the repeat cap
+    allowed = mask & _slot_mask(features, meal.meal_type)
+    used = features.positions(recipe_id for recipe_id, _ in others)
+    counts = np.bincount(used, minlength=len(features))
+    allowed &= counts < context.max_repeats
+    allowed[features.positions([meal.recipe_id])] = False
+    allowed[features.positions(
+        recipe_id for (recipe_id, _), today in zip(others, same_day) if today
+    )] = False
+    if plan.daily_budget:
+        costs = features.cost_vector(context.price_region)
+        remaining = float(plan.daily_budget) - _spent(
+            features, costs, [recipe_id for (recipe_id, _), today in zip(others, same_day) if today]
+        )
+        affordable = allowed & (costs <= remaining)
+        if affordable.any():
+            allowed = affordable
+    if not allowed.any():
+        return []
+
+    # Cheap pre-filter on the calorie window before scoring all nutrients
+    calories = features.nutrients[:, CALORIES]
+    low = targets[CALORIES] * (1 - TOLERANCES[CALORIES]) - day_rest[CALORIES]
+    high = targets[CALORIES] * (1 + TOLERANCES[CALORIES]) - day_rest[CALORIES]
+    in_window = allowed & (calories >= low) & (calories <= high)
+    candidates = np.flatnonzero(in_window if in_window.any() else allowed)
+
+    day_totals = day_rest + features.nutrients[candidates]
+    week_average = (week_rest + features.nutrients[candidates]) / days
+    within = (
+        (np.abs(day_totals - targets) / targets <= TOLERANCES).all(axis=1)
+        & (np.abs(week_average - targets) / targets <= TOLERANCES).all(axis=1)
+    )
+    cost = (
+        day_penalty(day_totals, targets) + day_penalty(week_average, targets)
+        + REPEAT_WEIGHT * counts[candidates]
+        - RATING_WEIGHT * features.ratings[candidates] / 5.0
+    )
+    if within.any():
+        candidates, cost, within, day_totals = (
+            candidates[within], cost[within], within[within], day_totals[within]
+        )
+
+    limit = min(limit, len(candidates))
+    best = np.argpartition(cost, limit - 1)[:limit]
+    best = best[np.argsort(cost[best])]
+
+    current = _recipe_nutrients(features, [meal.recipe_id])[0]
+    return [
+        {
+            'recipe_id': int(features.ids[candidates[i]]),
+            'score': round(float(cost[i]), 4),
+            'within_bounds': bool(within[i]),
+            'delta': {
+                name: round(float(value), 1)
+                for name, value in zip(NUTRIENT_NAMES, features.nutrients[candidates[i]] - current)
+            },
+            'day_totals': {
+                name: round(float(value), 1) for name, value in zip(NUTRIENT_NAMES, day_totals[i])
+            },
+        }
+        for i in best
+    ]
+
+
+def apply_swap(meal, recipe):
+    """Replace ``meal``'s recipe and shift the plan's stored daily totals by the difference"""
+    features = recipe_features.get()
+    old, new = _recipe_nutrients(features, [meal.recipe_id, recipe.pk])
+    plan = meal.meal_plan
+    summary = plan.nutrition_summary or {}
+    date = meal.date.isoformat()
+    priced = any('cost' in day for day in summary.get('daily', []))
+    if priced:
+        context, _ = user_candidates(plan.user, plan.start_date)
+        costs = features.cost_vector(context.price_region)
+        cost_change = _spent(features, costs, [recipe.pk]) - _spent(features, costs, [meal.recipe_id])
+    for day in summary.get('daily', []):
+        if day.get('date') == date:
+            for name, before, after in zip(NUTRIENT_NAMES, old, new):
+                day[name] = round(day.get(name, 0) + float(after - before), 1)
+            if priced:
+                day['cost'] = round(day.get('cost', 0) + cost_change, 2)
+    if summary.get('daily'):
+        days = len(summary['daily'])
+        summary['average'] = {
+            name: round(sum(day.get(name, 0) for day in summary['daily']) / days, 1)
+            for name in NUTRIENT_NAMES
+        }
+        if priced:
+            summary['average']['cost'] = round(sum(day.get('cost', 0) for day in summary['daily']) / days, 2)
+
+    with transaction.atomic():
+        meal.recipe = recipe
+        meal.save(update_fields=['recipe'])
+        plan.nutrition_summary = summary
+        plan.save(update_fields=['nutrition_summary', 'updated_at'])
+    return meal
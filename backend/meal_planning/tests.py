@@ -0,0 +1,104 @@
+import datetime
+import time
+from collections import Counter
+
+import numpy as np
+from django.test import SimpleTestCase
+from .generator import (
+    DAYS, MAX_REPEATS, SLOTS, PlanningContext, RecipeFeatures, candidate_mask,
+    nutrient_targets, solve,
+)
+
+START_DATE = datetime.date(2026, 1, 5)
+
+
+def make_features(count, seed=0, allergen_text=None, prep_time=None):
+    """Synthetic catalog of ``count`` recipes, ids 1..count"""
+    rng = np.random.default_rng(seed)
+    calories = rng.uniform(250, 900, count)
+    nutrients = np.column_stack([
+        calories,
+        calories * 0.20 / 4 * rng.uniform(0.6, 1.4, count),
+        calories * 0.50 / 4 * rng.uniform(0.6, 1.4, count),
+        calories * 0.30 / 9 * rng.uniform(0.6, 1.4, count),
+    ])
+    return RecipeFeatures(
+        ids=np.arange(1, count + 1, dtype=np.int64),
+        meal_types=np.array([SLOTS[i % len(SLOTS)] for i in range(count)], dtype=object),
+        prep_time=np.asarray(
+            prep_time if prep_time is not None else rng.integers(5, 90, count), dtype=np.int32
+        ),
+        nutrients=nutrients,
+        ratings=rng.uniform(0, 5, count),
+        allergen_text=allergen_text or [''] * count,
+    )
+
+
+def make_context(**overrides):
+    options = dict(
+        user_id=1, start_date=START_DATE, servings=1, targets=nutrient_targets(2000),
+        allergies=(), compatible_recipes=(), max_prep_time=None,
+        max_repeats=MAX_REPEATS, seed=1,
+    )
+    options.update(overrides)
+    return PlanningContext(**options)
+
+
+def planned_ids(result):
+    return [int(recipe_id) for recipe_id in result.recipe_ids.ravel()]
+
+
+class HardFilterTests(SimpleTestCase):
+    """Allergies, conditions, prep time and repetition are never traded for nutrition"""
+
+    def test_allergies_are_excluded(self):
+        count = 300
+        # Every other recipe contains peanuts
+        text = ['peanuts, milk' if i % 2 else '' for i in range(count)]
+        features = make_features(count, allergen_text=text)
+        result = solve(make_context(allergies=('Peanuts',)), features)
+        self.assertTrue(all(recipe_id % 2 == 1 for recipe_id in planned_ids(result)))
+
+    def test_only_compatible_recipes_are_planned(self):
+        features = make_features(300)
+        hypertension = frozenset(range(1, 301, 3))
+        vegetarian = frozenset(range(1, 301)) - frozenset(range(1, 301, 2))
+        context = make_context(compatible_recipes=(hypertension, vegetarian))
+        mask = candidate_mask(context, features)
+        allowed = set(features.ids[mask].tolist())
+        self.assertEqual(allowed, hypertension & vegetarian)
+        self.assertTrue(set(planned_ids(solve(context, features))) <= allowed)
+
+    def test_condition_without_compatible_rows_allows_nothing(self):
+        features = make_features(30)
+        mask = candidate_mask(make_context(compatible_recipes=(frozenset(),)), features)
+        self.assertFalse(mask.any())
+
+    def test_prep_time_cap(self):
+        count = 300
+        prep_time = [10 if i % 2 else 60 for i in range(count)]
+        features = make_features(count, prep_time=prep_time)
+        result = solve(make_context(max_prep_time=30), features)
+        self.assertTrue(all(prep_time[recipe_id - 1] <= 30 for recipe_id in planned_ids(result)))
+
+    def test_repeat_cap(self):
+        features = make_features(300)
+        for max_repeats in (1, 2):
+            result = solve(make_context(max_repeats=max_repeats), features)
+            counts = Counter(planned_ids(result))
+            self.assertLessEqual(max(counts.values()), max_repeats)
+            for day in result.recipe_ids:
+                self.assertEqual(len(set(day.tolist())), len(SLOTS))
+
+
+class SolverPerformanceTests(SimpleTestCase):
+
+    def test_week_plan_under_200ms_for_100k_recipes(self):
+        features = make_features(100_000)
+        context = make_context()
+        solve(context, features)
+        started = time.perf_counter()
+        result = solve(context, features)
+        elapsed = time.perf_counter() - started
+        self.assertEqual(result.recipe_ids.shape, (DAYS, len(SLOTS)))
+        self.assertLess(elapsed, 0.2)
@@ -0,0 +1,17 @@
+from django.urls import path
+from . import views
+
+app_name = 'meal_planning'
+
+urlpatterns = [
+    # Meal Plans
+    path('plans/', views.MealPlanListCreateView.as_view(), name='meal_plans'),
+    path('plans/generate/', views.generate_meal_plan, name='generate_meal_plan'),
+    path('plans/current/', views.current_meal_plan, name='current_meal_plan'),
+    path('plans/<int:pk>/', views.MealPlanDetailView.as_view(), name='meal_plan_detail'),
+    
+    # Planned Meals
+    path('plans/<int:plan_id>/meals/', views.PlannedMealListCreateView.as_view(), name='planned_meals'),
+    path('meals/<int:pk>/', views.PlannedMealDetailView.as_view(), name='planned_meal_detail'),
+    path('meals/<int:pk>/swap/', views.swap_meal, name='swap_meal'),
+]
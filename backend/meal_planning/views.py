@@ -0,0 +1,190 @@
+import datetime
+
+from rest_framework import generics, status, permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from .generator import (
+    SLOT_MEAL_TYPES, PlanningError, build_context, generate_plan, recipe_features, save_plan
+)
+from recipes.models import Recipe
+from recipes.serializers import RecipeListSerializer
+from .models import MealPlan, PlannedMeal
+from .serializers import (
+    MealPlanSerializer, MealPlanListSerializer, PlannedMealSerializer, GeneratePlanSerializer,
+    SwapQuerySerializer, SwapSerializer
+)
+from .swap import apply_swap, swap_candidates, user_candidates
+
+
+def _plans(user):
+    return MealPlan.objects.filter(user=user).prefetch_related('meals__recipe__cuisine__region')
+
+
+class MealPlanListCreateView(generics.ListCreateAPIView):
+    """List and create meal plans"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_serializer_class(self):
+        if self.request.method == 'POST':
+            return MealPlanSerializer
+        return MealPlanListSerializer
+    
+    def get_queryset(self):
+        queryset = MealPlan.objects.filter(user=self.request.user)
+        
+        # Filter by status
+        plan_status = self.request.query_params.get('status')
+        if plan_status:
+            queryset = queryset.filter(status=plan_status)
+        return queryset
+    
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+
+class MealPlanDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """Get, update, or delete a meal plan"""
+    serializer_class = MealPlanSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return _plans(self.request.user)
+
+
+class PlannedMealListCreateView(generics.ListCreateAPIView):
+    """List and add meals of a meal plan"""
+    serializer_class = PlannedMealSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_meal_plan(self):
+        return get_object_or_404(MealPlan, id=self.kwargs['plan_id'], user=self.request.user)
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['meal_plan'] = self.get_meal_plan()
+        return context
+    
+    def get_queryset(self):
+        return PlannedMeal.objects.filter(
+            meal_plan_id=self.kwargs['plan_id'],
+            meal_plan__user=self.request.user
+        ).select_related('recipe__cuisine__region')
+    
+    def perform_create(self, serializer):
+        # Cook for the whole household unless told otherwise
+        serializer.save(
+            meal_plan=serializer.context['meal_plan'],
+            servings=serializer.validated_data.get('servings') or self.request.user.family_size
+        )
+
+
+class PlannedMealDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """Get, update, or remove a planned meal"""
+    serializer_class = PlannedMealSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return PlannedMeal.objects.filter(
+            meal_plan__user=self.request.user
+        ).select_related('meal_plan', 'recipe__cuisine__region')
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def generate_meal_plan(request):
+    """Generate a week of breakfasts, lunches and dinners fitting the user's targets"""
+    serializer = GeneratePlanSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    options = serializer.validated_data
+    # Plans start next Monday unless a date is given
+    today = timezone.localdate()
+    start_date = options.get('start_date') or today + datetime.timedelta(days=7 - today.weekday())
+    context = build_context(
+        request.user,
+        start_date,
+        calorie_target=options.get('calorie_target'),
+        max_prep_time=options.get('max_prep_time'),
+        max_repeats=options['max_repeats'],
+        daily_budget=options.get('daily_budget')
+    )
+    
+    try:
+        result = generate_plan(context)
+        plan = save_plan(context, result, options.get('name', ''))
+    except PlanningError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    
+    return Response(
+        MealPlanSerializer(_plans(request.user).get(pk=plan.pk)).data,
+        status=status.HTTP_201_CREATED
+    )
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def current_meal_plan(request):
+    """The user's active meal plan covering today"""
+    today = timezone.localdate()
+    plan = _plans(request.user).filter(
+        status='active',
+        start_date__lte=today,
+        end_date__gte=today
+    ).first()
+    if plan is None:
+        return Response({'error': 'No active meal plan'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(MealPlanSerializer(plan).data)
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([permissions.IsAuthenticated])
+def swap_meal(request, pk):
+    """Ranked replacements for one planned meal (GET) or swap it (POST)"""
+    meal = get_object_or_404(
+        PlannedMeal.objects.select_related('meal_plan__user'),
+        pk=pk,
+        meal_plan__user=request.user
+    )
+    
+    if request.method == 'GET':
+        serializer = SwapQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        alternatives = swap_candidates(meal, serializer.validated_data['limit'])
+        recipes = Recipe.objects.select_related('cuisine__region').in_bulk(
+            [alternative['recipe_id'] for alternative in alternatives]
+        )
+        for alternative in alternatives:
+            alternative['recipe'] = RecipeListSerializer(recipes[alternative['recipe_id']]).data
+        return Response({'meal': meal.pk, 'alternatives': alternatives})
+    
+    serializer = SwapSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    recipe = serializer.validated_data['recipe_id']
+    if recipe.meal_type not in SLOT_MEAL_TYPES.get(meal.meal_type, (meal.meal_type,)):
+        return Response(
+            {'recipe_id': [f"Recipe is not suitable for {meal.meal_type}"]},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    # Recipes outside the feature matrix (no calories yet) cannot be checked
+    positions = recipe_features.get().positions([recipe.pk])
+    if not len(positions):
+        return Response(
+            {'recipe_id': ["Recipe is not available for meal plans yet"]},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    _, mask = user_candidates(request.user, meal.meal_plan.start_date)
+    if not mask[positions].all():
+        return Response(
+            {'recipe_id': ["Recipe does not fit your allergies or dietary needs"]},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    apply_swap(meal, recipe)
+    return Response(PlannedMealSerializer(meal).data)
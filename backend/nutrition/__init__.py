@@ -0,0 +1 @@
+# Nutrition app for intake logging and daily/weekly rollups
\ No newline at end of file
@@ -0,0 +1,33 @@
+from django.contrib import admin
+from .models import IntakeEntry, DailyIntake, WeeklyIntake
+
+
+@admin.register(IntakeEntry)
+class IntakeEntryAdmin(admin.ModelAdmin):
+    list_display = ['user', 'name', 'date', 'meal_type', 'source', 'calories', 'water_ml']
+    list_filter = ['source', 'meal_type', 'date']
+    search_fields = ['user__username', 'user__email', 'name']
+    raw_id_fields = ['user', 'recipe', 'user_recipe']
+    readonly_fields = ['created_at']
+    
+    def has_change_permission(self, request, obj=None):
+        # Edits must go through nutrition.intake to keep the rollups in step
+        return False
+
+
+@admin.register(DailyIntake)
+class DailyIntakeAdmin(admin.ModelAdmin):
+    list_display = ['user', 'date', 'calories', 'protein_g', 'water_ml', 'entry_count']
+    list_filter = ['date']
+    search_fields = ['user__username', 'user__email']
+    raw_id_fields = ['user']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(WeeklyIntake)
+class WeeklyIntakeAdmin(admin.ModelAdmin):
+    list_display = ['user', 'week_start', 'calories', 'protein_g', 'water_ml', 'entry_count']
+    list_filter = ['week_start']
+    search_fields = ['user__username', 'user__email']
+    raw_id_fields = ['user']
+    readonly_fields = ['updated_at']
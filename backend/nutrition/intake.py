@@ -0,0 +1,253 @@
+"""
+Intake logging and its per-day and per-week rollups.
+
+Entries are written in batches: one bulk insert, then one additive upsert
+per rollup table (``INSERT ... ON CONFLICT DO UPDATE SET total = total +
+EXCLUDED.total``) with the batch's totals summed per bucket first, so
+concurrent writers never lose an increment and dashboards read a handful
+of bucket rows instead of summing raw entries. Edits and deletes apply
+their difference the same way; ``rebuild_rollups`` recomputes buckets from
+the raw entries should they ever drift.
+"""
+
+import datetime
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+from meal_planning.generator import DEFAULT_CALORIE_TARGET, nutrient_targets
+from accounts.models import UserProfile
+from .models import IntakeEntry, DailyIntake, WeeklyIntake
+
+TOTAL_FIELDS = ('calories', 'protein_g', 'carbs_g', 'fat_g', 'fiber_g', 'sodium_mg', 'water_ml')
+# Per-serving recipe field for each entry total
+RECIPE_NUTRIENTS = {
+    'calories': 'calories_per_serving',
+    'protein_g': 'protein_g',
+    'carbs_g': 'carbs_g',
+    'fat_g': 'fat_g',
+    'fiber_g': 'fiber_g',
+    'sodium_mg': 'sodium_mg',
+}
+
+MAX_BATCH_SIZE = 500
+CREATE_BATCH_SIZE = 500
+UPSERT_BATCH_SIZE = 500
+# Inserts retried after losing a race on the same client_id
+MAX_INSERT_ATTEMPTS = 3
+
+
+def week_start(date):
+    """Monday of ``date``'s week"""
+    return date - datetime.timedelta(days=date.weekday())
+
+
+def entry_from_recipe(user, recipe, servings=1.0, **fields):
+    """Unsaved entry for ``servings`` of a recipe, with its nutrition scaled and copied"""
+    values = {
+        field: round((getattr(recipe, source) or 0) * servings, 1)
+        for field, source in RECIPE_NUTRIENTS.items()
+    }
+    values['name'] = recipe.name
+    if recipe.meal_type in dict(IntakeEntry.MEAL_TYPE_CHOICES):
+        values['meal_type'] = recipe.meal_type
+    # Explicit fields win over the recipe's
+    values.update(fields)
+    return IntakeEntry(user=user, recipe=recipe, servings=servings, **values)
+
+
+def _add(buckets, key, values):
+    totals = buckets.get(key)
+    if totals is None:
+        buckets[key] = list(values)
+    else:
+        for i, value in enumerate(values):
+            totals[i] += value
+
+
+def _bucket_deltas(entries, sign, daily=None, weekly=None):
+    """Sum ``sign`` times each entry into ``{(user id, day or week): totals + [count]}``"""
+    daily = {} if daily is None else daily
+    weekly = {} if weekly is None else weekly
+    for entry in entries:
+        values = [sign * (getattr(entry, field) or 0.0) for field in TOTAL_FIELDS] + [sign]
+        _add(daily, (entry.user_id, entry.date), values)
+        _add(weekly, (entry.user_id, week_start(entry.date)), values)
+    return daily, weekly
+
+
+def _upsert(model, key_field, deltas):
+    """Add ``deltas`` to ``model``'s buckets, creating missing ones, in chunked statements"""
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = ['user_id', key_field, *TOTAL_FIELDS, 'entry_count', 'updated_at']
+    increments = ', '.join(
+        f'{quote(column)} = {table}.{quote(column)} + EXCLUDED.{quote(column)}'
+        for column in [*TOTAL_FIELDS, 'entry_count']
+    )
+    row_sql = '(' + ', '.join(['%s'] * len(columns)) + ')'
+
+    now = timezone.now()
+    # Sorted so concurrent batches lock buckets in the same order
+    rows = [
+        (user_id, key, *values[:-1], int(values[-1]), now)
+        for (user_id, key), values in sorted(deltas.items())
+    ]
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            chunk = rows[start:start + UPSERT_BATCH_SIZE]
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(map(quote, columns))}) "
+                f"VALUES {', '.join([row_sql] * len(chunk))} "
+                f"ON CONFLICT ({quote('user_id')}, {quote(key_field)}) DO UPDATE SET "
+                f"{increments}, {quote('updated_at')} = EXCLUDED.{quote('updated_at')}",
+                [value for row in chunk for value in row]
+            )
+
+
+def _apply(daily, weekly):
+    _upsert(DailyIntake, 'date', daily)
+    _upsert(WeeklyIntake, 'week_start', weekly)
+
+
+def _unlogged(entries):
+    """``entries`` minus those whose ``client_id`` is logged or repeated"""
+    keyed = [entry for entry in entries if entry.client_id]
+    if not keyed:
+        return entries
+    seen = set(IntakeEntry.objects.filter(
+        user_id__in={entry.user_id for entry in keyed},
+        client_id__in={entry.client_id for entry in keyed}
+    ).values_list('user_id', 'client_id'))
+    fresh = []
+    for entry in entries:
+        key = (entry.user_id, entry.client_id)
+        if entry.client_id and key in seen:
+            continue
+        seen.add(key)
+        fresh.append(entry)
+    return fresh
+
+
+def record_entries(entries):
+    """
+    Insert unsaved ``entries`` and add them to the rollups in one
+    transaction. Entries whose ``client_id`` is already logged are
+    skipped. Returns the entries created.
+    """
+    entries = list(entries)
+    for entry in entries:
+        if entry.date is None:
+            entry.date = timezone.localdate(entry.consumed_at)
+
+    for attempt in range(MAX_INSERT_ATTEMPTS):
+        entries = _unlogged(entries)
+        if not entries:
+            return []
+        try:
+            with transaction.atomic():
+                created = IntakeEntry.objects.bulk_create(entries, batch_size=CREATE_BATCH_SIZE)
+                _apply(*_bucket_deltas(created, 1))
+            return created
+        except IntegrityError:
+            # A concurrent request logged one of the client_ids after the
+            # check; nothing was written, so drop the duplicates and retry
+            if attempt == MAX_INSERT_ATTEMPTS - 1:
+                raise
+            for entry in entries:
+                entry.pk = None
+
+
+def update_entry(entry, **fields):
+    """Change an entry and move the difference between its old and new buckets"""
+    previous = IntakeEntry(**{
+        field: getattr(entry, field) for field in ('user_id', 'date', *TOTAL_FIELDS)
+    })
+    for field, value in fields.items():
+        setattr(entry, field, value)
+    with transaction.atomic():
+        entry.save()
+        daily, weekly = _bucket_deltas([previous], -1)
+        _bucket_deltas([entry], 1, daily, weekly)
+        # Within the same bucket the counts cancel and only the totals move
+        _apply(daily, weekly)
+    return entry
+
+
+def delete_entries(entries):
+    """Delete entries and take them out of the rollups"""
+    entries = list(entries)
+    if not entries:
+        return 0
+    with transaction.atomic():
+        IntakeEntry.objects.filter(pk__in=[entry.pk for entry in entries]).delete()
+        _apply(*_bucket_deltas(entries, -1))
+    return len(entries)
+
+
+def rebuild_rollups(user_ids=None):
+    """
+    Recompute the daily and weekly buckets of ``user_ids`` (default: every
+    user) from their entries. Returns ``(daily rows, weekly rows)``.
+    """
+    entries = IntakeEntry.objects.all()
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+    sums = entries.values('user_id', 'date').annotate(
+        entry_count=Count('pk'), **{field: Sum(field) for field in TOTAL_FIELDS}
+    ).order_by()
+
+    daily, weekly = [], {}
+    for row in sums:
+        values = [row[field] or 0.0 for field in TOTAL_FIELDS] + [row['entry_count']]
+        daily.append(DailyIntake(
+            user_id=row['user_id'], date=row['date'], entry_count=row['entry_count'],
+            **{field: row[field] or 0.0 for field in TOTAL_FIELDS}
+        ))
+        _add(weekly, (row['user_id'], week_start(row['date'])), values)
+
+    with transaction.atomic():
+        for model in (DailyIntake, WeeklyIntake):
+            stale = model.objects.all()
+            if user_ids is not None:
+                stale = stale.filter(user_id__in=user_ids)
+            stale.delete()
+        DailyIntake.objects.bulk_create(daily, batch_size=CREATE_BATCH_SIZE)
+        WeeklyIntake.objects.bulk_create([
+            WeeklyIntake(
+                user_id=user_id, week_start=start, entry_count=int(values[-1]),
+                **dict(zip(TOTAL_FIELDS, values))
+            )
+            for (user_id, start), values in weekly.items()
+        ], batch_size=CREATE_BATCH_SIZE)
+    return len(daily), len(weekly)
+
+
+def intake_targets(user):
+    """Daily targets from the user's profile: calories, macros (g) and water (ml)"""
+    profile = UserProfile.objects.filter(user=user).prefetch_related('fitness_goals').first()
+    calories = profile and (profile.daily_calorie_target or profile.daily_calories) or DEFAULT_CALORIE_TARGET
+    macros = [goal.recommended_macros for goal in profile.fitness_goals.all()] if profile else []
+    targets = nutrient_targets(calories, macros)
+    return {
+        'calories': round(float(targets[0]), 1),
+        'protein_g': round(float(targets[1]), 1),
+        'carbs_g': round(float(targets[2]), 1),
+        'fat_g': round(float(targets[3]), 1),
+        'water_ml': round(profile.daily_water_target * 1000) if profile and profile.daily_water_target else None,
+    }
+
+
+def bucket_totals(bucket):
+    """Rounded totals of a rollup row (zeros for a day or week without entries)"""
+    totals = {field: round(getattr(bucket, field), 1) if bucket else 0.0 for field in TOTAL_FIELDS}
+    totals['entry_count'] = bucket.entry_count if bucket else 0
+    return totals
+
+
+def progress(totals, targets, days=1):
+    """Share of each target reached by ``totals`` over ``days``"""
+    return {
+        field: round(totals[field] / (target * days), 3)
+        for field, target in targets.items() if target
+    }
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+from nutrition.intake import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute daily and weekly intake rollups from the logged entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Only this user id (repeatable)')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        daily, weekly = rebuild_rollups(options['users'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {daily} daily and {weekly} weekly rollups in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,124 @@
+from django.db import models
+from django.db.models import Q
+from django.contrib.auth import get_user_model
+from django.core.validators import MinValueValidator
+from django.utils import timezone
+from recipes.models import Recipe, UserRecipe
+
+User = get_user_model()
+
+
+class IntakeEntry(models.Model):
+    """Something a user ate or drank"""
+    MEAL_TYPE_CHOICES = [
+        ('breakfast', 'Breakfast'),
+        ('lunch', 'Lunch'),
+        ('dinner', 'Dinner'),
+        ('snack', 'Snack'),
+    ]
+    SOURCE_CHOICES = [
+        ('manual', 'Manual'),
+        ('cooked', 'Cooked Recipe'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='intake_entries')
+    date = models.DateField(help_text="Local day the entry counts towards")
+    consumed_at = models.DateTimeField(default=timezone.now)
+    meal_type = models.CharField(max_length=20, choices=MEAL_TYPE_CHOICES, default='snack')
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='manual')
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='intake_entries'
+    )
+    user_recipe = models.ForeignKey(
+        UserRecipe,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='intake_entries',
+        help_text="Cooking session the entry was logged from"
+    )
+    name = models.CharField(max_length=200)
+    servings = models.FloatField(default=1.0, validators=[MinValueValidator(0.0)])
+    
+    # Totals for the servings eaten
+    calories = models.FloatField(default=0.0, validators=[MinValueValidator(0.0)])
+    protein_g = models.FloatField(default=0.0, validators=[MinValueValidator(0.0)])
+    carbs_g = models.FloatField(default=0.0, validators=[MinValueValidator(0.0)])
+    fat_g = models.FloatField(default=0.0, validators=[MinValueValidator(0.0)])
+    fiber_g = models.FloatField(default=0.0, validators=[MinValueValidator(0.0)])
+    sodium_mg = models.FloatField(default=0.0, validators=[MinValueValidator(0.0)])
+    water_ml = models.FloatField(default=0.0, validators=[MinValueValidator(0.0)])
+    
+    notes = models.TextField(blank=True)
+    client_id = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="Id assigned by the app so retried uploads are not logged twice"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'intake_entries'
+        ordering = ['-consumed_at']
+        verbose_name_plural = 'Intake entries'
+        indexes = [
+            models.Index(fields=['user', 'date']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'client_id'],
+                condition=~Q(client_id=''),
+                name='unique_intake_client_id'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.name} ({self.date})"
+
+
+class IntakeTotals(models.Model):
+    """Summed intake of a bucket of entries"""
+    calories = models.FloatField(default=0.0)
+    protein_g = models.FloatField(default=0.0)
+    carbs_g = models.FloatField(default=0.0)
+    fat_g = models.FloatField(default=0.0)
+    fiber_g = models.FloatField(default=0.0)
+    sodium_mg = models.FloatField(default=0.0)
+    water_ml = models.FloatField(default=0.0)
+    entry_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        abstract = True
+
+
+class DailyIntake(IntakeTotals):
+    """A user's intake for one day, kept up to date as entries are logged"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_intake')
+    date = models.DateField()
+    
+    class Meta:
+        db_table = 'daily_intake'
+        unique_together = ['user', 'date']
+        ordering = ['-date']
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.date}: {self.calories:.0f} kcal"
+
+
+class WeeklyIntake(IntakeTotals):
+    """A user's intake for one week (Monday to Sunday)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='weekly_intake')
+    week_start = models.DateField()
+    
+    class Meta:
+        db_table = 'weekly_intake'
+        unique_together = ['user', 'week_start']
+        ordering = ['-week_start']
+    
+    def __str__(self):
+        return f"{self.user.username} - week of {self.week_start}: {self.calories:.0f} kcal"
@@ -0,0 +1,97 @@
+from rest_framework import serializers
+from recipes.models import Recipe
+from .intake import (
+    RECIPE_NUTRIENTS, TOTAL_FIELDS, bucket_totals, entry_from_recipe, record_entries, update_entry
+)
+from .models import IntakeEntry, DailyIntake, WeeklyIntake
+
+
+class IntakeEntryListSerializer(serializers.ListSerializer):
+    """Batch upload: one insert and one rollup update for the whole list"""
+    
+    def create(self, validated_data):
+        return record_entries([self.child.build_entry(attrs) for attrs in validated_data])
+
+
+class IntakeEntrySerializer(serializers.ModelSerializer):
+    recipe = serializers.PrimaryKeyRelatedField(
+        queryset=Recipe.objects.all(), required=False, allow_null=True
+    )
+    
+    class Meta:
+        model = IntakeEntry
+        fields = [
+            'id', 'date', 'consumed_at', 'meal_type', 'source', 'recipe', 'name',
+            'servings', 'calories', 'protein_g', 'carbs_g', 'fat_g', 'fiber_g',
+            'sodium_mg', 'water_ml', 'notes', 'client_id', 'created_at'
+        ]
+        read_only_fields = ['source', 'created_at']
+        extra_kwargs = {
+            'date': {'required': False},
+            'name': {'required': False},
+        }
+        list_serializer_class = IntakeEntryListSerializer
+    
+    def validate(self, attrs):
+        recipe = attrs.get('recipe')
+        if self.instance is None:
+            if recipe is None and not attrs.get('name'):
+                raise serializers.ValidationError({'name': "Name the food or choose a recipe"})
+            if recipe is None and not any(attrs.get(field) for field in TOTAL_FIELDS):
+                raise serializers.ValidationError("Enter calories, nutrients or water")
+        elif 'recipe' in attrs or 'servings' in attrs:
+            recipe = attrs.get('recipe', self.instance.recipe)
+            if recipe is not None:
+                # Recipe nutrition follows the servings eaten unless given
+                servings = attrs.get('servings', self.instance.servings)
+                for field, source in RECIPE_NUTRIENTS.items():
+                    attrs.setdefault(field, round((getattr(recipe, source) or 0) * servings, 1))
+        return attrs
+    
+    def build_entry(self, attrs):
+        """Unsaved entry for validated ``attrs``; recipe nutrition fills in what is not given"""
+        attrs = dict(attrs)
+        recipe = attrs.pop('recipe', None)
+        if recipe is not None:
+            return entry_from_recipe(attrs.pop('user'), recipe, attrs.pop('servings', 1.0), **attrs)
+        return IntakeEntry(**attrs)
+    
+    def create(self, validated_data):
+        created = record_entries([self.build_entry(validated_data)])
+        if not created:
+            raise serializers.ValidationError({'client_id': "This entry was already logged"})
+        return created[0]
+    
+    def update(self, instance, validated_data):
+        return update_entry(instance, **validated_data)
+
+
+class IntakeTotalsSerializer(serializers.ModelSerializer):
+    totals = serializers.SerializerMethodField()
+    
+    def get_totals(self, obj):
+        return bucket_totals(obj)
+
+
+class DailyIntakeSerializer(IntakeTotalsSerializer):
+    class Meta:
+        model = DailyIntake
+        fields = ['date', 'totals', 'updated_at']
+
+
+class WeeklyIntakeSerializer(IntakeTotalsSerializer):
+    class Meta:
+        model = WeeklyIntake
+        fields = ['week_start', 'totals', 'updated_at']
+
+
+class IntakeRangeSerializer(serializers.Serializer):
+    """Serializer for rollup query parameters"""
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    
+    def validate(self, attrs):
+        if attrs.get('start_date') and attrs.get('end_date') and attrs['end_date'] < attrs['start_date']:
+            raise serializers.ValidationError({'end_date': "End date must not be before the start date"})
+        return attrs
+
@@ -0,0 +1,21 @@
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from recipes.signals import recipe_cooked
+from .intake import entry_from_recipe, record_entries
+
+
+@receiver(recipe_cooked)
+def log_cooked_recipe(sender, user_recipe, **kwargs):
+    """Log one serving of a completed cooking session for the cook"""
+    consumed_at = user_recipe.cooking_completed_at or timezone.now()
+    entry = entry_from_recipe(
+        user_recipe.user,
+        user_recipe.recipe,
+        consumed_at=consumed_at,
+        date=timezone.localdate(consumed_at),
+        source='cooked',
+        user_recipe=user_recipe,
+        client_id=f"cooked:{user_recipe.pk}:{int(consumed_at.timestamp())}",
+    )
+    transaction.on_commit(lambda: record_entries([entry]))
@@ -0,0 +1,15 @@
+from django.urls import path
+from . import views
+
+app_name = 'nutrition'
+
+urlpatterns = [
+    # Intake log
+    path('entries/', views.IntakeEntryListCreateView.as_view(), name='intake_entries'),
+    path('entries/<int:pk>/', views.IntakeEntryDetailView.as_view(), name='intake_entry_detail'),
+    
+    # Rollups
+    path('daily/', views.daily_intake, name='daily_intake'),
+    path('weekly/', views.weekly_intake, name='weekly_intake'),
+    path('dashboard/', views.intake_dashboard, name='intake_dashboard'),
+]
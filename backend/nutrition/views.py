@@ -0,0 +1,148 @@
+import datetime
+
+from rest_framework import generics, permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from django.utils import timezone
+from .intake import (
+    MAX_BATCH_SIZE, TOTAL_FIELDS, bucket_totals, delete_entries, intake_targets, progress, week_start
+)
+from .models import IntakeEntry, DailyIntake, WeeklyIntake
+from .serializers import (
+    IntakeEntrySerializer, DailyIntakeSerializer, WeeklyIntakeSerializer, IntakeRangeSerializer
+)
+
+DASHBOARD_DAYS = 7
+MAX_RANGE_DAYS = 366
+
+
+class IntakeEntryListCreateView(generics.ListCreateAPIView):
+    """List intake entries, or log one entry or a batch (a JSON list)"""
+    serializer_class = IntakeEntrySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        queryset = IntakeEntry.objects.filter(user=self.request.user)
+        
+        # Filter by date range
+        start_date = self.request.query_params.get('start_date')
+        end_date = self.request.query_params.get('end_date')
+        date = self.request.query_params.get('date')
+        if date:
+            queryset = queryset.filter(date=date)
+        if start_date:
+            queryset = queryset.filter(date__gte=start_date)
+        if end_date:
+            queryset = queryset.filter(date__lte=end_date)
+        
+        # Filter by meal type
+        meal_type = self.request.query_params.get('meal_type')
+        if meal_type:
+            queryset = queryset.filter(meal_type=meal_type)
+        return queryset
+    
+    def get_serializer(self, *args, **kwargs):
+        if isinstance(kwargs.get('data'), list):
+            kwargs.update(many=True, max_length=MAX_BATCH_SIZE)
+        return super().get_serializer(*args, **kwargs)
+    
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+
+class IntakeEntryDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """Get, correct, or delete an intake entry"""
+    serializer_class = IntakeEntrySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return IntakeEntry.objects.filter(user=self.request.user)
+    
+    def perform_destroy(self, instance):
+        delete_entries([instance])
+
+
+def _range(request, default_days):
+    serializer = IntakeRangeSerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    end_date = serializer.validated_data.get('end_date') or timezone.localdate()
+    start_date = serializer.validated_data.get('start_date') or end_date - datetime.timedelta(days=default_days - 1)
+    start_date = max(start_date, end_date - datetime.timedelta(days=MAX_RANGE_DAYS - 1))
+    return start_date, end_date
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def daily_intake(request):
+    """Daily totals for a date range (default: the last 30 days), newest first"""
+    start_date, end_date = _range(request, 30)
+    days = DailyIntake.objects.filter(
+        user=request.user, date__range=(start_date, end_date), entry_count__gt=0
+    ).order_by('-date')
+    return Response({
+        'start_date': start_date,
+        'end_date': end_date,
+        'targets': intake_targets(request.user),
+        'days': DailyIntakeSerializer(days, many=True).data,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def weekly_intake(request):
+    """Weekly totals and daily averages for a date range (default: the last 12 weeks)"""
+    start_date, end_date = _range(request, 12 * 7)
+    weeks = WeeklyIntake.objects.filter(
+        user=request.user, week_start__range=(week_start(start_date), end_date), entry_count__gt=0
+    ).order_by('-week_start')
+    data = WeeklyIntakeSerializer(weeks, many=True).data
+    for week in data:
+        week['daily_average'] = {
+            field: round(week['totals'][field] / 7, 1) for field in TOTAL_FIELDS
+        }
+    return Response({
+        'start_date': week_start(start_date),
+        'end_date': end_date,
+        'targets': intake_targets(request.user),
+        'weeks': data,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def intake_dashboard(request):
+    """Today, the last week and this calendar week against the user's targets"""
+    today = timezone.localdate()
+    first_day = today - datetime.timedelta(days=DASHBOARD_DAYS - 1)
+    days = {
+        day.date: day for day in DailyIntake.objects.filter(
+            user=request.user, date__range=(first_day, today)
+        )
+    }
+    week = WeeklyIntake.objects.filter(user=request.user, week_start=week_start(today)).first()
+    targets = intake_targets(request.user)
+    
+    today_totals = bucket_totals(days.get(today))
+    week_totals = bucket_totals(week)
+    elapsed = today.weekday() + 1
+    return Response({
+        'date': today,
+        'targets': targets,
+        'today': {
+            'totals': today_totals,
+            'progress': progress(today_totals, targets),
+            'remaining': {
+                field: round(max(target - today_totals[field], 0), 1)
+                for field, target in targets.items() if target
+            },
+        },
+        'week': {
+            'week_start': week_start(today),
+            'totals': week_totals,
+            'progress': progress(week_totals, targets, days=elapsed),
+        },
+        'last_7_days': [
+            {'date': day, 'totals': bucket_totals(days.get(day))}
+            for day in (first_day + datetime.timedelta(days=offset) for offset in range(DASHBOARD_DAYS))
+        ],
+    })
@@ -0,0 +1,137 @@
+"""
+Allergy-safe recipe rewriting.
+
+Allergen-bearing entries in ``Recipe.ingredients`` are replaced with the best
+safe substitute from the in-memory substitute graph. Each rewrite carries a
+confidence score that drops with substitute distance and category changes.
+A recipe whose ``allergen_warnings`` name one of the allergies is only
+adaptable when a substitution took that allergy out; otherwise the allergen
+comes from an entry the graph cannot see and the recipe is not safe.
+"""
+
+import hashlib
+from collections import namedtuple
+
+from django.core.cache import cache
+from .linking import ingredient_linker
+from .substitutes import substitute_graph, normalize_allergens, contains_allergen
+
+RecipeAdaptation = namedtuple(
+    'RecipeAdaptation', ['ingredients', 'substitutions', 'confidence', 'allergen_warnings']
+)
+
+CACHE_TTL = 60 * 60 * 24
+SUBSTITUTE_DEPTH = 2
+
+# Confidence multipliers per substitution
+DEPTH_CONFIDENCE = {1: 0.9, 2: 0.75, 3: 0.6, 4: 0.5}
+CROSS_CATEGORY_PENALTY = 0.8
+# Entries that cannot be matched to the catalog may hide unlisted allergens
+UNLINKED_PENALTY = 0.97
+
+# Cached marker for recipes that cannot be made safe
+_NOT_ADAPTABLE = 'not-adaptable'
+
+
+def adapt_ingredients(ingredients, allergens, graph, linker, warnings=()):
+    """
+    Rewrite an ingredient list for ``allergens``.
+
+    Returns a ``RecipeAdaptation``, or None when some allergen-bearing
+    ingredient has no safe substitute or one of the recipe's ``warnings``
+    matches an allergy no substitution removed.
+    """
+    allergens = normalize_allergens(allergens)
+    adapted = []
+    substitutions = []
+    removed = set()
+    confidence = 1.0
+
+    for entry in ingredients:
+        name = str(entry.get('name', ''))
+        named_allergen = contains_allergen((name.lower(),), allergens)
+        ingredient_id = entry.get('ingredient_id') or linker.resolve(name).ingredient_id
+
+        if ingredient_id is None or ingredient_id not in graph.nodes:
+            if named_allergen:
+                return None
+            if allergens:
+                confidence *= UNLINKED_PENALTY
+            adapted.append(entry)
+            continue
+
+        if not named_allergen and graph.is_safe(ingredient_id, allergens):
+            adapted.append(entry)
+            continue
+
+        options = graph.safe_substitutes(ingredient_id, allergens, SUBSTITUTE_DEPTH)
+        if not options:
+            return None
+
+        best = options[0]
+        score = DEPTH_CONFIDENCE[best['depth']]
+        if not best['same_category']:
+            score *= CROSS_CATEGORY_PENALTY
+        confidence *= score
+
+        sources = (*graph.nodes[ingredient_id].allergens, name.lower())
+        removed.update(allergen for allergen in allergens if contains_allergen(sources, (allergen,)))
+        adapted.append(dict(entry, name=best['name'], ingredient_id=best['id'], substituted_for=name))
+        substitutions.append({
+            'original': name,
+            'substitute': best['name'],
+            'substitute_id': best['id'],
+            'depth': best['depth'],
+            'score': round(score, 3),
+        })
+
+    remaining = []
+    for warning in warnings or []:
+        matched = {allergen for allergen in allergens if contains_allergen((str(warning).lower(),), (allergen,))}
+        if matched - removed:
+            return None
+        if not matched:
+            remaining.append(warning)
+    return RecipeAdaptation(adapted, substitutions, round(confidence, 3), remaining)
+
+
+def _cache_key(recipe, allergens, generation):
+    allergen_hash = hashlib.sha1(','.join(sorted(allergens)).encode()).hexdigest()[:16]
+    updated = recipe.updated_at.timestamp() if recipe.updated_at else 0
+    return f"recipe-adaptation:v2:{recipe.pk}:{updated}:{generation}:{allergen_hash}"
+
+
+def adapt_recipes(recipes, allergens):
+    """
+    Adapt already-loaded recipes in bulk; returns ``{recipe_id: adaptation}``
+    with None for recipes that cannot be made safe. Rewrites are cached per
+    (recipe, allergen set) and never query the database per recipe.
+    """
+    allergens = normalize_allergens(allergens)
+    graph = substitute_graph.get()
+    linker = ingredient_linker.get()
+    generation = f"{substitute_graph.generation}.{ingredient_linker.generation}"
+    keys = {recipe.pk: _cache_key(recipe, allergens, generation) for recipe in recipes}
+    cached = cache.get_many(keys.values())
+
+    results = {}
+    missing = {}
+    for recipe in recipes:
+        value = cached.get(keys[recipe.pk])
+        if value is None:
+            value = adapt_ingredients(
+                recipe.ingredients or [], allergens, graph, linker, recipe.allergen_warnings
+            )
+            missing[keys[recipe.pk]] = value if value is not None else _NOT_ADAPTABLE
+        elif value == _NOT_ADAPTABLE:
+            value = None
+        results[recipe.pk] = value
+
+    if missing:
+        cache.set_many(missing, CACHE_TTL)
+    return results
+
+
+def adapt_recipe(recipe, allergens):
+    """Adapt a single recipe for ``allergens`` (see ``adapt_recipes``)"""
+    return adapt_recipes([recipe], allergens)[recipe.pk]
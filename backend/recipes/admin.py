@@ -1,8 +1,12 @@
 from django.contrib import admin
+from django.db.models import Count
+from django.urls import reverse
 from django.utils.html import format_html
+from .duplicates import index_recipes
 from .models import (
     Region, Cuisine, Ingredient, Recipe, RecipeRating,
-    UserRecipe, RecipeCollection, CookingTip
+    UserRecipe, RecipeCollection, CookingTip, RecipeCompatibility, IngredientPrice,
+    RecipeDuplicate
 )
 
 
@@ -27,25 +31,82 @@ class IngredientAdmin(admin.ModelAdmin):
     list_filter = ['category', 'is_active', 'common_regions']
     search_fields = ['name', 'local_names', 'description']
     filter_horizontal = ['common_regions', 'substitutes']
-    readonly_fields = ['created_at']
+    readonly_fields = ['season_mask', 'created_at']
+
+
+@admin.register(IngredientPrice)
+class IngredientPriceAdmin(admin.ModelAdmin):
+    list_display = ['ingredient', 'region', 'price', 'quantity', 'source', 'updated_at']
+    list_filter = ['region', 'ingredient__category']
+    search_fields = ['ingredient__name', 'source']
+    raw_id_fields = ['ingredient']
+    readonly_fields = ['dimension', 'unit', 'amount', 'updated_at']
+
+
+@admin.register(RecipeCompatibility)
+class RecipeCompatibilityAdmin(admin.ModelAdmin):
+    list_display = ['recipe', 'condition_type', 'condition_id', 'is_compatible', 'computed_at']
+    list_filter = ['condition_type', 'is_compatible']
+    search_fields = ['recipe__name']
+    raw_id_fields = ['recipe']
+    readonly_fields = ['violations', 'computed_at']
+
+
+class HasDuplicatesFilter(admin.SimpleListFilter):
+    title = 'possible duplicates'
+    parameter_name = 'has_duplicates'
+    
+    def lookups(self, request, model_admin):
+        return [('yes', 'Yes'), ('no', 'No')]
+    
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.filter(duplicate_candidates__isnull=False).distinct()
+        if self.value() == 'no':
+            return queryset.filter(duplicate_candidates__isnull=True)
+        return queryset
+
+
+class RecipeDuplicateInline(admin.TabularInline):
+    model = RecipeDuplicate
+    fk_name = 'recipe'
+    verbose_name = 'possible duplicate'
+    verbose_name_plural = 'possible duplicates'
+    fields = ['other_link', 'similarity', 'detected_at']
+    readonly_fields = ['other_link', 'similarity', 'detected_at']
+    extra = 0
+    can_delete = False
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('other')
+    
+    @admin.display(description='Recipe')
+    def other_link(self, obj):
+        return format_html(
+            '<a href="{}">{}</a> ({})',
+            reverse('admin:recipes_recipe_change', args=[obj.other_id]), obj.other.name, obj.other.slug
+        )
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     list_display = [
         'name', 'cuisine', 'difficulty', 'meal_type', 'total_time',
-        'average_rating', 'total_ratings', 'is_published', 'is_featured'
+        'average_rating', 'total_ratings', 'is_published', 'is_featured',
+        'duplicate_count'
     ]
     list_filter = [
         'difficulty', 'meal_type', 'cuisine__region', 'is_published',
-        'is_featured', 'created_at'
+        'is_featured', HasDuplicatesFilter, 'created_at'
     ]
     search_fields = ['name', 'description', 'tags']
     readonly_fields = [
         'slug', 'average_rating', 'total_ratings', 'total_time',
         'created_at', 'updated_at'
     ]
-    prepopulated_fields = {'slug': ('name',)}
     
     fieldsets = (
         ('Basic Information', {
@@ -90,8 +151,23 @@ class RecipeAdmin(admin.ModelAdmin):
         }),
     )
     
+    inlines = [RecipeDuplicateInline]
+    actions = ['check_duplicates']
+    
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('cuisine__region', 'created_by')
+        return super().get_queryset(request).select_related('cuisine__region', 'created_by').annotate(
+            duplicate_count=Count('duplicate_candidates')
+        )
+    
+    @admin.display(description='Duplicates?', ordering='duplicate_count')
+    def duplicate_count(self, obj):
+        return obj.duplicate_count or ''
+    
+    @admin.action(description='Check selected recipes for duplicates again')
+    def check_duplicates(self, request, queryset):
+        found = index_recipes(list(queryset.select_related(None).only('id', 'name', 'ingredients')))
+        flagged = sum(1 for duplicates in found.values() if duplicates)
+        self.message_user(request, f"{flagged} of {len(found)} recipes have possible duplicates.")
 
 
 @admin.register(RecipeRating)
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class RecipesConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'recipes'
+
+    def ready(self):
+        from . import signals  # noqa: F401
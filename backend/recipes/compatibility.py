@@ -0,0 +1,268 @@
+"""
+Precomputed recipe x condition compatibility.
+
+Compiled rules (see ``rules``) are evaluated in bulk with NumPy over a chunk
+of recipes: per-serving nutrients as a float matrix, linked ingredient
+categories as a bitmask and normalized ingredient names for name rules.
+Results are stored in ``RecipeCompatibility`` so recommendations and search
+keep only recipes with a stored compatible row for every condition.
+
+Evaluation fails closed: a nutrient the recipe has no figure for breaks any
+bound on it, and an ingredient that is not linked to the catalog (so its
+category is unknown) breaks every category rule, unless it is one of the
+``UNLINKED_STAPLES`` that no category rule is about.
+"""
+
+import re
+import threading
+
+import numpy as np
+from django.db import connections, transaction
+from django.db.models import Exists, Min, OuterRef, Q
+from accounts.models import HealthCondition, DietaryPreference
+from africanmealplanner.caching import GenerationalSnapshot
+from .linking import normalize_name
+from .models import Ingredient, Recipe, RecipeCompatibility
+from .nutrition import NUTRIENTS, NUTRIENT_ALIASES
+from .rules import (
+    CATEGORIES, NUTRIENT, CATEGORY, MAX, HEALTH_CONDITION, DIETARY_PREFERENCE, load_rulesets
+)
+
+CHUNK_SIZE = 2000
+CREATE_BATCH_SIZE = 1000
+
+CONDITION_MODELS = {
+    HealthCondition: HEALTH_CONDITION,
+    DietaryPreference: DIETARY_PREFERENCE,
+}
+
+# Unlinked entries that cannot break a category rule (normalized names)
+UNLINKED_STAPLES = frozenset([
+    'water', 'ice', 'salt', 'sea salt', 'pepper', 'black pepper', 'white pepper',
+    'sugar', 'brown sugar', 'baking soda', 'baking powder', 'yeast', 'vinegar',
+])
+
+CATEGORY_BITS = {category: 1 << i for i, category in enumerate(sorted(CATEGORIES))}
+NUTRIENT_COLUMNS = {name: i for i, name in enumerate(NUTRIENTS)}
+
+_NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER.search(str(value))
+    return float(match.group()) if match else None
+
+
+def build_ingredient_catalog():
+    """ingredient id -> (category bit, normalized name)"""
+    return {
+        pk: (CATEGORY_BITS.get(category, 0), normalize_name(name))
+        for pk, category, name in Ingredient.objects.values_list('id', 'category', 'name')
+    }
+
+
+ingredient_catalog = GenerationalSnapshot('ingredient-catalog', build_ingredient_catalog)
+
+
+def recipe_features(recipes, catalog):
+    """
+    (recipes x NUTRIENTS matrix with NaN for unknown values, category bitmask
+    per recipe, whether any ingredient is unlinked, padded ingredient names
+    per recipe)
+    """
+    nutrients = np.full((len(recipes), len(NUTRIENTS)), np.nan)
+    categories = np.zeros(len(recipes), dtype=np.int64)
+    unlinked = np.zeros(len(recipes), dtype=bool)
+    names = []
+    for position, recipe in enumerate(recipes):
+        for key, value in (recipe.nutritional_info or {}).items():
+            key = str(key).strip().lower()
+            column = NUTRIENT_COLUMNS.get(NUTRIENT_ALIASES.get(key, key))
+            number = _number(value) if column is not None else None
+            if number is not None:
+                nutrients[position, column] = number
+
+        recipe_names = set()
+        for entry in recipe.ingredients or []:
+            if not isinstance(entry, dict):
+                continue
+            bit, name = catalog.get(entry.get('ingredient_id'), (0, None))
+            entry_name = normalize_name(entry.get('name', ''))
+            categories[position] |= bit
+            unlinked[position] |= name is None and entry_name not in UNLINKED_STAPLES
+            recipe_names.add(f" {entry_name} ")
+            if name:
+                recipe_names.add(f" {name} ")
+        names.append(recipe_names)
+    return nutrients, categories, unlinked, names
+
+
+def evaluate(recipes, rulesets, catalog):
+    """Unsaved ``RecipeCompatibility`` rows for every recipe x rule set"""
+    nutrients, categories, unlinked, names = recipe_features(recipes, catalog)
+    term_matches = {}
+    no_match = np.zeros(len(recipes), dtype=bool)
+
+    def violated(rule):
+        """(breaks the rule, only because the input is unknown)"""
+        if rule.kind == NUTRIENT:
+            values = nutrients[:, NUTRIENT_COLUMNS[rule.target]]
+            unknown = np.isnan(values)
+            return (values > rule.value if rule.bound == MAX else values < rule.value) | unknown, unknown
+        if rule.kind == CATEGORY:
+            matched = (categories & CATEGORY_BITS[rule.target]) != 0
+            return matched | unlinked, unlinked & ~matched
+        if rule.target not in term_matches:
+            term = f" {rule.target} "
+            term_matches[rule.target] = np.fromiter(
+                (any(term in name for name in recipe_names) for recipe_names in names),
+                dtype=bool, count=len(recipes)
+            )
+        return term_matches[rule.target], no_match
+
+    rows = []
+    for ruleset in rulesets:
+        matrix = np.zeros((len(recipes), len(ruleset.rules)), dtype=bool)
+        unknown = np.zeros_like(matrix)
+        for column, rule in enumerate(ruleset.rules):
+            matrix[:, column], unknown[:, column] = violated(rule)
+        incompatible = matrix.any(axis=1)
+
+        for position, recipe in enumerate(recipes):
+            violations = []
+            if incompatible[position]:
+                violations = [
+                    f"{ruleset.rules[i].label} (unknown)" if unknown[position, i] else ruleset.rules[i].label
+                    for i in np.flatnonzero(matrix[position])
+                ]
+            rows.append(RecipeCompatibility(
+                recipe_id=recipe.pk,
+                condition_type=ruleset.condition_type,
+                condition_id=ruleset.condition_id,
+                is_compatible=not incompatible[position],
+                violations=violations,
+            ))
+    return rows
+
+
+def _condition_filter(health_condition_ids=(), dietary_preference_ids=()):
+    scope = Q()
+    if health_condition_ids:
+        scope |= Q(condition_type=HEALTH_CONDITION, condition_id__in=health_condition_ids)
+    if dietary_preference_ids:
+        scope |= Q(condition_type=DIETARY_PREFERENCE, condition_id__in=dietary_preference_ids)
+    return scope
+
+
+def recompute_compatibility(recipe_ids=None, rulesets=None, chunk_size=CHUNK_SIZE):
+    """
+    Re-evaluate ``rulesets`` (default: every condition and preference) for
+    ``recipe_ids`` (default: every recipe) and replace their stored rows.
+    Returns the number of rows written.
+    """
+    rulesets = load_rulesets() if rulesets is None else rulesets
+    if not rulesets:
+        return 0
+    if recipe_ids is None:
+        recipe_ids = Recipe.objects.order_by('pk').values_list('pk', flat=True)
+    recipe_ids = list(recipe_ids)
+
+    scope = _condition_filter(
+        [r.condition_id for r in rulesets if r.condition_type == HEALTH_CONDITION],
+        [r.condition_id for r in rulesets if r.condition_type == DIETARY_PREFERENCE],
+    )
+    catalog = ingredient_catalog.get()
+    written = 0
+    for start in range(0, len(recipe_ids), chunk_size):
+        chunk = recipe_ids[start:start + chunk_size]
+        recipes = list(Recipe.objects.filter(pk__in=chunk).only('id', 'ingredients', 'nutritional_info'))
+        rows = evaluate(recipes, rulesets, catalog)
+        with transaction.atomic():
+            RecipeCompatibility.objects.filter(scope, recipe_id__in=chunk).delete()
+            RecipeCompatibility.objects.bulk_create(rows, batch_size=CREATE_BATCH_SIZE)
+        written += len(rows)
+    return written
+
+
+def recompute_for_recipes(recipe_ids):
+    """Incremental recompute after recipe edits"""
+    return recompute_compatibility(recipe_ids=recipe_ids)
+
+
+def recompute_for_condition(condition_type, condition_id):
+    """Incremental recompute after a condition's rules changed"""
+    return recompute_compatibility(rulesets=load_rulesets(condition_type, [condition_id]))
+
+
+def recompute_in_background(condition_type, condition_id):
+    """
+    ``recompute_for_condition`` on a daemon thread, so a new condition gets
+    rows without holding up the request that created it. A crash leaves it
+    for ``recompute_stale``.
+    """
+    def run():
+        try:
+            recompute_for_condition(condition_type, condition_id)
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=run, name=f'compatibility-{condition_type}-{condition_id}', daemon=True).start()
+
+
+def stale_conditions():
+    """
+    ``{condition type: [ids]}`` of conditions and preferences edited (or
+    created) since their rows were last fully recomputed
+    """
+    stale = {}
+    for model, condition_type in CONDITION_MODELS.items():
+        computed = dict(
+            RecipeCompatibility.objects.filter(condition_type=condition_type)
+            .values('condition_id').annotate(oldest=Min('computed_at'))
+            .values_list('condition_id', 'oldest')
+        )
+        for pk, updated_at in model.objects.values_list('pk', 'updated_at'):
+            if pk not in computed or computed[pk] < updated_at:
+                stale.setdefault(condition_type, []).append(pk)
+    return stale
+
+
+def recompute_stale(chunk_size=CHUNK_SIZE):
+    """Recompute every stale condition; returns ``(conditions, rows written)``"""
+    rulesets = []
+    for condition_type, condition_ids in stale_conditions().items():
+        rulesets.extend(load_rulesets(condition_type, condition_ids))
+    if not rulesets or not Recipe.objects.exists():
+        return 0, 0
+    return len(rulesets), recompute_compatibility(rulesets=rulesets, chunk_size=chunk_size)
+
+
+def exclude_incompatible(queryset, health_condition_ids=(), dietary_preference_ids=()):
+    """
+    Keep recipes with a stored compatible row for every given condition.
+    Recipes not evaluated yet (no row) are dropped along with known
+    incompatible ones.
+    """
+    for condition_type, condition_ids in (
+        (HEALTH_CONDITION, health_condition_ids),
+        (DIETARY_PREFERENCE, dietary_preference_ids),
+    ):
+        for condition_id in set(condition_ids):
+            queryset = queryset.filter(Exists(RecipeCompatibility.objects.filter(
+                recipe=OuterRef('pk'), condition_type=condition_type,
+                condition_id=condition_id, is_compatible=True,
+            )))
+    return queryset
+
+
+def exclude_incompatible_for_profile(queryset, profile):
+    """``exclude_incompatible`` for a user's health conditions and dietary preferences"""
+    return exclude_incompatible(
+        queryset,
+        [condition.pk for condition in profile.health_conditions.all()],
+        [preference.pk for preference in profile.dietary_preferences.all()],
+    )
@@ -0,0 +1,196 @@
+"""
+Near-duplicate recipe detection with MinHash and LSH.
+
+A recipe's features are its linked ingredients (or normalized names of
+unlinked entries) and the character trigrams of its normalized name.
+``NUM_PERM`` hash permutations of that set give a MinHash signature whose
+share of equal positions estimates the Jaccard similarity of two recipes.
+Signatures are cut into ``BANDS`` bands of ``ROWS`` values; each band is
+hashed into an indexed bucket key, so candidates for a recipe are the
+recipes sharing any of its keys, one indexed lookup instead of a scan.
+Candidates whose estimated similarity reaches ``DUPLICATE_THRESHOLD`` are
+stored as ``RecipeDuplicate`` pairs for review in the admin.
+
+The permutation coefficients are fixed: stored signatures stay comparable
+across processes, and changing them requires ``detect_duplicate_recipes``.
+"""
+
+import hashlib
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+from django.dispatch import Signal
+from .compatibility import recompute_for_recipes
+from .linking import normalize_name
+from .models import Recipe, RecipeDuplicate, RecipeSignature, RecipeSignatureBucket
+from .nutrition import recompute_recipes
+from .pricing import recompute_costs
+from .seasonality import recompute_seasonality
+from .slugs import allocate_slugs
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# About (1 / BANDS) ** (1 / ROWS) = 0.5 is where candidates start to be found
+DUPLICATE_THRESHOLD = 0.6
+
+CHUNK_SIZE = 2000
+QUERY_CHUNK_SIZE = 1000
+CREATE_BATCH_SIZE = 1000
+
+_PRIME = (1 << 61) - 1
+_coefficients = np.random.RandomState(1729).randint(1, _PRIME, size=(2, NUM_PERM), dtype=np.uint64)
+
+# Sent with ``recipe_ids`` after ``bulk_create_recipes``, which bypasses post_save
+recipes_bulk_created = Signal()
+
+
+def recipe_features(name, ingredients):
+    """Feature strings of a recipe: ingredients and name trigrams"""
+    features = set()
+    for entry in ingredients or []:
+        if not isinstance(entry, dict):
+            continue
+        if entry.get('ingredient_id'):
+            features.add(f"i:{entry['ingredient_id']}")
+        else:
+            entry_name = normalize_name(str(entry.get('name', '')))
+            if entry_name:
+                features.add(f"n:{entry_name}")
+    padded = f"  {normalize_name(name or '')} "
+    features.update(f"s:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return features
+
+
+def minhash(features):
+    """``NUM_PERM`` MinHash values of a non-empty feature set"""
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=4).digest(), 'big') for feature in features),
+        dtype=np.uint64, count=len(features)
+    )
+    # a * x + b wraps at 2^64 before the modulo, which keeps the permutations independent
+    values = (hashes[:, None] * _coefficients[0] + _coefficients[1]) % np.uint64(_PRIME)
+    return values.min(axis=0).astype(np.int64)
+
+
+def band_keys(signature):
+    """Bucket key of each band of a signature, as signed 64-bit integers"""
+    return [
+        int.from_bytes(
+            hashlib.blake2b(band.to_bytes(1, 'big') + signature[band * ROWS:(band + 1) * ROWS].tobytes(),
+                            digest_size=8).digest(),
+            'big', signed=True
+        )
+        for band in range(BANDS)
+    ]
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.mean(first == second))
+
+
+def _signature(stored):
+    return np.frombuffer(bytes(stored), dtype=np.int64)
+
+
+def index_recipes(recipes):
+    """
+    (Re)compute the signatures and bucket keys of loaded recipes and record
+    their duplicates among all indexed recipes, including each other.
+    Returns ``{recipe id: [(other id, similarity), ...]}``.
+    """
+    recipe_ids = [recipe.pk for recipe in recipes]
+    signatures = {}
+    for recipe in recipes:
+        features = recipe_features(recipe.name, recipe.ingredients)
+        if features:
+            signatures[recipe.pk] = minhash(features)
+    keys = {recipe_id: band_keys(signature) for recipe_id, signature in signatures.items()}
+
+    with transaction.atomic():
+        RecipeSignatureBucket.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeSignature.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeDuplicate.objects.filter(Q(recipe_id__in=recipe_ids) | Q(other_id__in=recipe_ids)).delete()
+        RecipeSignature.objects.bulk_create([
+            RecipeSignature(recipe_id=recipe_id, signature=signature.tobytes())
+            for recipe_id, signature in signatures.items()
+        ], batch_size=CREATE_BATCH_SIZE)
+        RecipeSignatureBucket.objects.bulk_create([
+            RecipeSignatureBucket(recipe_id=recipe_id, key=key)
+            for recipe_id, recipe_keys in keys.items() for key in set(recipe_keys)
+        ], batch_size=CREATE_BATCH_SIZE)
+
+        # Members of every bucket the batch touches, own rows included
+        members = defaultdict(set)
+        distinct = sorted({key for recipe_keys in keys.values() for key in recipe_keys})
+        for start in range(0, len(distinct), QUERY_CHUNK_SIZE):
+            for key, recipe_id in RecipeSignatureBucket.objects.filter(
+                key__in=distinct[start:start + QUERY_CHUNK_SIZE]
+            ).values_list('key', 'recipe_id'):
+                members[key].add(recipe_id)
+        candidates = {
+            recipe_id: set().union(*(members[key] for key in recipe_keys)) - {recipe_id}
+            for recipe_id, recipe_keys in keys.items()
+        }
+        stored = dict(RecipeSignature.objects.filter(
+            recipe_id__in=set().union(*candidates.values()) - set(signatures)
+        ).values_list('recipe_id', 'signature')) if candidates else {}
+        for recipe_id, signature in stored.items():
+            signatures[recipe_id] = _signature(signature)
+
+        found = defaultdict(list)
+        pairs = []
+        for recipe_id, others in candidates.items():
+            for other_id in others:
+                score = similarity(signatures[recipe_id], signatures[other_id])
+                if score < DUPLICATE_THRESHOLD:
+                    continue
+                found[recipe_id].append((other_id, round(score, 3)))
+                # Pairs inside the batch are seen from both sides
+                if other_id not in keys or recipe_id < other_id:
+                    pairs.extend([
+                        RecipeDuplicate(recipe_id=recipe_id, other_id=other_id, similarity=round(score, 3)),
+                        RecipeDuplicate(recipe_id=other_id, other_id=recipe_id, similarity=round(score, 3)),
+                    ])
+        RecipeDuplicate.objects.bulk_create(pairs, batch_size=CREATE_BATCH_SIZE, ignore_conflicts=True)
+    return {recipe_id: sorted(found[recipe_id], key=lambda pair: -pair[1]) for recipe_id in recipe_ids}
+
+
+def reindex_all(chunk_size=CHUNK_SIZE):
+    """Index every recipe in chunks; returns ``(recipes, duplicate pairs)``"""
+    recipe_ids = list(Recipe.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(recipe_ids), chunk_size):
+        index_recipes(list(
+            Recipe.objects.filter(pk__in=recipe_ids[start:start + chunk_size]).only('id', 'name', 'ingredients')
+        ))
+    return len(recipe_ids), RecipeDuplicate.objects.count() // 2
+
+
+def bulk_create_recipes(recipes, batch_size=CREATE_BATCH_SIZE):
+    """
+    Create unsaved recipes in bulk: unique slugs allocated up front, then
+    the derived data ``Recipe.save`` and its signals would have produced,
+    computed per batch. Returns the created recipes.
+    """
+    recipes = list(recipes)
+    missing = [recipe for recipe in recipes if not recipe.slug]
+    for recipe, slug in zip(missing, allocate_slugs([recipe.name for recipe in missing])):
+        recipe.slug = slug
+    for recipe in recipes:
+        if not recipe.total_time:
+            recipe.total_time = recipe.prep_time + recipe.cook_time
+
+    with transaction.atomic():
+        created = Recipe.objects.bulk_create(recipes, batch_size=batch_size)
+    recipe_ids = [recipe.pk for recipe in created]
+    recompute_recipes(Recipe.objects.filter(pk__in=recipe_ids))
+    recompute_for_recipes(recipe_ids)
+    recompute_seasonality(recipe_ids)
+    recompute_costs(recipe_ids)
+    for start in range(0, len(created), CHUNK_SIZE):
+        index_recipes(created[start:start + CHUNK_SIZE])
+    recipes_bulk_created.send(sender=Recipe, recipe_ids=recipe_ids)
+    return created
@@ -1,5 +1,7 @@
 import django_filters
 from .models import Recipe, Cuisine, Region
+from .pricing import filter_by_cost
+from .seasonality import filter_in_season
 
 
 class RecipeFilter(django_filters.FilterSet):
@@ -30,8 +32,21 @@ class RecipeFilter(django_filters.FilterSet):
     max_servings = django_filters.NumberFilter(field_name='servings', lookup_expr='lte')
     
     # Calories
+    min_calories = django_filters.NumberFilter(field_name='calories_per_serving', lookup_expr='gte')
     max_calories = django_filters.NumberFilter(field_name='calories_per_serving', lookup_expr='lte')
     
+    # Nutrients per serving
+    min_protein = django_filters.NumberFilter(field_name='protein_g', lookup_expr='gte')
+    max_protein = django_filters.NumberFilter(field_name='protein_g', lookup_expr='lte')
+    min_carbs = django_filters.NumberFilter(field_name='carbs_g', lookup_expr='gte')
+    max_carbs = django_filters.NumberFilter(field_name='carbs_g', lookup_expr='lte')
+    min_fat = django_filters.NumberFilter(field_name='fat_g', lookup_expr='gte')
+    max_fat = django_filters.NumberFilter(field_name='fat_g', lookup_expr='lte')
+    min_fiber = django_filters.NumberFilter(field_name='fiber_g', lookup_expr='gte')
+    max_fiber = django_filters.NumberFilter(field_name='fiber_g', lookup_expr='lte')
+    min_sodium = django_filters.NumberFilter(field_name='sodium_mg', lookup_expr='gte')
+    max_sodium = django_filters.NumberFilter(field_name='sodium_mg', lookup_expr='lte')
+    
     # Rating
     min_rating = django_filters.NumberFilter(field_name='average_rating', lookup_expr='gte')
     
@@ -41,6 +56,21 @@ class RecipeFilter(django_filters.FilterSet):
     # Exclude allergens
     exclude_allergens = django_filters.CharFilter(method='filter_exclude_allergens')
     
+    # Seasonality (most ingredients in season this month, optionally in a region)
+    in_season = django_filters.BooleanFilter(method='filter_in_season')
+    season_region = django_filters.ModelChoiceFilter(
+        queryset=Region.objects.all(),
+        method='filter_season_region'
+    )
+    
+    # Budget (estimated cost per serving, at a region's prices or the defaults)
+    min_cost = django_filters.NumberFilter(method='filter_cost')
+    max_cost = django_filters.NumberFilter(method='filter_cost')
+    cost_region = django_filters.ModelChoiceFilter(
+        queryset=Region.objects.all(),
+        method='filter_cost_region'
+    )
+    
     # Featured recipes
     is_featured = django_filters.BooleanFilter()
     
@@ -52,8 +82,11 @@ class RecipeFilter(django_filters.FilterSet):
         fields = [
             'name', 'description', 'cuisine', 'region', 'difficulty', 'meal_type',
             'max_prep_time', 'max_cook_time', 'max_total_time', 'min_servings',
-            'max_servings', 'max_calories', 'min_rating', 'dietary_labels',
-            'exclude_allergens', 'is_featured', 'tags'
+            'max_servings', 'min_calories', 'max_calories', 'min_protein', 'max_protein',
+            'min_carbs', 'max_carbs', 'min_fat', 'max_fat', 'min_fiber', 'max_fiber',
+            'min_sodium', 'max_sodium', 'min_rating', 'dietary_labels',
+            'exclude_allergens', 'in_season', 'season_region', 'min_cost', 'max_cost',
+            'cost_region', 'is_featured', 'tags'
         ]
     
     def filter_dietary_labels(self, queryset, name, value):
@@ -72,6 +105,32 @@ class RecipeFilter(django_filters.FilterSet):
                 queryset = queryset.exclude(allergen_warnings__icontains=allergen)
         return queryset
     
+    def filter_in_season(self, queryset, name, value):
+        """Keep recipes whose ingredients are mostly in season"""
+        if value:
+            region = self.form.cleaned_data.get('season_region')
+            queryset = filter_in_season(queryset, region=region)
+        return queryset
+    
+    def filter_season_region(self, queryset, name, value):
+        """Region for in_season, applied by filter_in_season"""
+        return queryset
+    
+    def filter_cost(self, queryset, name, value):
+        """Keep recipes whose cost per serving is within min_cost..max_cost"""
+        data = self.form.cleaned_data
+        if name == 'max_cost' and data.get('min_cost') is not None:
+            # Already applied together with min_cost
+            return queryset
+        return filter_by_cost(
+            queryset, region=data.get('cost_region'),
+            minimum=data.get('min_cost'), maximum=data.get('max_cost')
+        )
+    
+    def filter_cost_region(self, queryset, name, value):
+        """Region for min_cost/max_cost, applied by filter_cost"""
+        return queryset
+    
     def filter_tags(self, queryset, name, value):
         """Filter by tags (comma-separated)"""
         if value:
@@ -0,0 +1,130 @@
+"""
+Entity linking of free-text ``Recipe.ingredients`` entries to ``Ingredient`` rows.
+
+Entry names are normalized (accents, punctuation, preparation words, plurals)
+and resolved against an in-memory index over ``Ingredient.name`` and
+``local_names``: exact match first, then the longest catalog name contained
+in the entry ("red palm oil" -> "palm oil"), then a fuzzy fallback.
+"""
+
+import difflib
+import re
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+
+from africanmealplanner.caching import GenerationalSnapshot
+from .models import Ingredient
+
+LinkResult = namedtuple('LinkResult', ['ingredient_id', 'method'])
+
+FUZZY_CUTOFF = 0.85
+
+# Preparation and size words that never distinguish ingredients
+DESCRIPTORS = frozenset([
+    'a', 'an', 'and', 'or', 'of', 'the', 'to', 'taste', 'optional', 'for',
+    'fresh', 'freshly', 'dried', 'dry', 'chopped', 'sliced', 'diced',
+    'minced', 'ground', 'grated', 'crushed', 'peeled', 'washed', 'cleaned',
+    'cooked', 'boiled', 'fried', 'roasted', 'smoked', 'raw', 'ripe',
+    'finely', 'roughly', 'thinly', 'large', 'medium', 'small', 'whole',
+    'big', 'pieces', 'piece', 'cut', 'into', 'about', 'some',
+])
+
+_PARENTHETICAL = re.compile(r'\([^)]*\)')
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def _singular(token):
+    if len(token) <= 3 or token.endswith('ss'):
+        return token
+    if token.endswith('ies'):
+        return token[:-3] + 'y'
+    if token.endswith('oes'):
+        return token[:-2]
+    if token.endswith('s'):
+        return token[:-1]
+    return token
+
+
+@lru_cache(maxsize=65536)
+def normalize_name(text):
+    """Canonical lookup key for an ingredient name"""
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    text = _PARENTHETICAL.sub(' ', text)
+    tokens = [
+        _singular(token) for token in _NON_WORD.sub(' ', text).split()
+        if token not in DESCRIPTORS and not token.isdigit()
+    ]
+    return ' '.join(tokens)
+
+
+class IngredientLinker:
+    """Normalized name index over the ingredient catalog"""
+
+    def __init__(self, names):
+        self.index = {}
+        for key, pk in names:
+            key = normalize_name(key)
+            if key:
+                self.index.setdefault(key, pk)
+        self.ingredient_ids = frozenset(self.index.values())
+        self.max_tokens = max((key.count(' ') + 1 for key in self.index), default=0)
+
+        # token -> keys sharing it, to narrow the fuzzy search
+        self._keys_by_token = {}
+        for key in self.index:
+            for token in key.split():
+                self._keys_by_token.setdefault(token, []).append(key)
+        self.resolve = lru_cache(maxsize=65536)(self._resolve)
+
+    def _resolve(self, name):
+        key = normalize_name(name)
+        if not key:
+            return LinkResult(None, None)
+        if key in self.index:
+            return LinkResult(self.index[key], 'exact')
+
+        # Longest catalog name appearing as a contiguous run of tokens
+        tokens = key.split()
+        for size in range(min(len(tokens), self.max_tokens), 0, -1):
+            for start in range(len(tokens) - size + 1):
+                candidate = ' '.join(tokens[start:start + size])
+                if candidate in self.index:
+                    return LinkResult(self.index[candidate], 'partial')
+
+        candidates = {
+            candidate for token in tokens for candidate in self._keys_by_token.get(token, ())
+        } or self.index.keys()
+        match = difflib.get_close_matches(key, candidates, n=1, cutoff=FUZZY_CUTOFF)
+        if match:
+            return LinkResult(self.index[match[0]], 'fuzzy')
+        return LinkResult(None, None)
+
+    def link_entry(self, entry, relink=False):
+        """Set ``entry['ingredient_id']``; returns the LinkResult used"""
+        current = entry.get('ingredient_id')
+        if current in self.ingredient_ids and not relink:
+            return LinkResult(current, 'existing')
+        result = self.resolve(str(entry.get('name', '')))
+        entry['ingredient_id'] = result.ingredient_id
+        return result
+
+
+def build_linker():
+    names = []
+    aliases = []
+    for pk, name, local_names in Ingredient.objects.values_list('id', 'name', 'local_names'):
+        names.append((name, pk))
+        aliases.extend((str(alias), pk) for alias in (local_names or []))
+    # Canonical names win over local names that normalize to the same key
+    return IngredientLinker(names + aliases)
+
+
+ingredient_linker = GenerationalSnapshot('ingredient-linker', build_linker)
+
+
+def link_ingredients(ingredients):
+    """Link every entry of a ``Recipe.ingredients`` list in place"""
+    linker = ingredient_linker.get()
+    return [linker.link_entry(entry) for entry in ingredients]
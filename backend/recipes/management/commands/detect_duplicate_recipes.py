@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+from recipes.duplicates import CHUNK_SIZE, reindex_all
+
+
+class Command(BaseCommand):
+    help = 'Recompute MinHash signatures of every recipe and record near-duplicate pairs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        recipes, pairs = reindex_all(options['chunk_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Signed {recipes} recipes and found {pairs} possible duplicate pairs in {elapsed:.1f}s'
+        ))
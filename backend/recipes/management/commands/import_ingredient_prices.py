@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from recipes.pricing import import_prices, read_price_rows, recompute_costs, CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        'Import ingredient prices from a CSV file (columns: ingredient, region, '
+        'price, quantity, source) and re-price every recipe'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file; a blank region sets the default price')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--skip-costs', action='store_true', help='Import prices only')
+        parser.add_argument('--top', type=int, default=20, help='Number of rejected rows to report')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as fp:
+                imported, errors = import_prices(read_price_rows(fp))
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        for number, error in errors[:options['top']]:
+            self.stderr.write(f'  line {number}: {error}')
+        if len(errors) > options['top']:
+            self.stderr.write(f'  ... and {len(errors) - options["top"]} more')
+
+        written = 0
+        if imported and not options['skip_costs']:
+            written = recompute_costs(chunk_size=options['chunk_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} prices ({len(errors)} rows rejected) and wrote '
+            f'{written} recipe costs in {elapsed:.1f}s'
+        ))
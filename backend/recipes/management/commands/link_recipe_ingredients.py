@@ -0,0 +1,138 @@
+import copy
+import multiprocessing
+import os
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+from recipes.compatibility import recompute_for_recipes
+from recipes.linking import ingredient_linker
+from recipes.models import Recipe
+from recipes.nutrition import recompute_recipes
+from recipes.pricing import recompute_costs
+from recipes.quantities import UNSPECIFIED_QUANTITY, parse_quantities, quantity_to_dict
+from recipes.seasonality import recompute_seasonality
+
+
+def _link_chunk(args):
+    """Link and parse one chunk of recipes; runs in a worker process"""
+    recipe_ids, relink, dry_run = args
+    linker = ingredient_linker.get()
+    stats = {
+        'entries': 0, 'methods': Counter(), 'unresolved': Counter(),
+        'parsed': 0, 'unparsed': Counter(), 'changed': [],
+    }
+
+    recipes = list(Recipe.objects.filter(pk__in=recipe_ids).only('id', 'ingredients'))
+    before = {recipe.pk: copy.deepcopy(recipe.ingredients) for recipe in recipes}
+    entries = [
+        entry for recipe in recipes for entry in (recipe.ingredients or [])
+        if isinstance(entry, dict)
+    ]
+    quantities = parse_quantities(entry.get('quantity', '') for entry in entries)
+
+    for entry, quantity in zip(entries, quantities):
+        stats['entries'] += 1
+        result = linker.link_entry(entry, relink=relink)
+        if result.ingredient_id is None:
+            stats['unresolved'][str(entry.get('name', '')).strip().lower()] += 1
+        else:
+            stats['methods'][result.method] += 1
+
+        # Stored like RecipeCreateSerializer does: unreadable text is unspecified
+        entry['parsed_quantity'] = quantity_to_dict(quantity or UNSPECIFIED_QUANTITY)
+        if quantity is None:
+            stats['unparsed'][str(entry.get('quantity', '')).strip().lower()] += 1
+        else:
+            stats['parsed'] += 1
+
+    changed = [recipe for recipe in recipes if recipe.ingredients != before[recipe.pk]]
+    stats['changed'] = [recipe.pk for recipe in changed]
+    if not dry_run and changed:
+        # bulk_update skips auto_now; caches keyed on updated_at need the bump
+        now = timezone.now()
+        for recipe in changed:
+            recipe.updated_at = now
+        Recipe.objects.bulk_update(changed, ['ingredients', 'updated_at'], batch_size=500)
+    return stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Link Recipe.ingredients entries to Ingredient rows and normalize '
+        'their quantities across the catalog'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--relink', action='store_true', help='Re-resolve entries that are already linked')
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--top', type=int, default=20, help='Number of unresolved names to report')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        recipe_ids = list(Recipe.objects.order_by('pk').values_list('pk', flat=True))
+        chunk_size = options['chunk_size']
+        tasks = [
+            (recipe_ids[start:start + chunk_size], options['relink'], options['dry_run'])
+            for start in range(0, len(recipe_ids), chunk_size)
+        ]
+
+        # Build the index once so forked workers share it copy-on-write, and
+        # close connections so each worker opens its own.
+        ingredient_linker.get()
+        connections.close_all()
+
+        entries = 0
+        methods = Counter()
+        unresolved = Counter()
+        parsed = 0
+        unparsed = Counter()
+        changed = []
+        with multiprocessing.get_context('fork').Pool(options['workers']) as pool:
+            for stats in pool.imap_unordered(_link_chunk, tasks):
+                entries += stats['entries']
+                methods.update(stats['methods'])
+                unresolved.update(stats['unresolved'])
+                parsed += stats['parsed']
+                unparsed.update(stats['unparsed'])
+                changed.extend(stats['changed'])
+
+        resolved = sum(methods.values())
+        rate = (resolved / entries * 100) if entries else 0
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f"{len(recipe_ids)} recipes, {entries} entries, "
+            f"{resolved} resolved ({rate:.1f}%) in {elapsed:.1f}s"
+        )
+        for method, count in methods.most_common():
+            self.stdout.write(f"  {method}: {count}")
+        parse_rate = (parsed / entries * 100) if entries else 0
+        self.stdout.write(f"{parsed} quantities parsed ({parse_rate:.1f}%)")
+        if unresolved:
+            self.stdout.write(f"Top unresolved names ({len(unresolved)} distinct):")
+            for name, count in unresolved.most_common(options['top']):
+                self.stdout.write(f"  {count:>6}  {name}")
+        if unparsed:
+            self.stdout.write(f"Top unparsed quantities ({len(unparsed)} distinct):")
+            for quantity, count in unparsed.most_common(options['top']):
+                self.stdout.write(f"  {count:>6}  {quantity}")
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Dry run: {len(changed)} recipes would be updated'))
+            return
+
+        # bulk_update sent no post_save: refresh everything derived from links
+        changed.sort()
+        started = time.monotonic()
+        recompute_recipes(Recipe.objects.filter(pk__in=changed))
+        recompute_for_recipes(changed)
+        recompute_seasonality(changed)
+        recompute_costs(changed)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Recipe ingredients linked; refreshed nutrition, compatibility, seasonality '
+            f'and costs of {len(changed)} recipes in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,54 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from recipes.compatibility import recompute_compatibility, recompute_stale, CHUNK_SIZE
+from recipes.rules import load_rulesets
+
+
+class Command(BaseCommand):
+    help = 'Recompile dietary rules and rebuild the recipe compatibility table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            '--stale', action='store_true',
+            help='Only recompute conditions edited since their last recompute'
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='With --stale, keep checking every COMPATIBILITY_REFRESH_INTERVAL seconds'
+        )
+
+    def handle(self, *args, **options):
+        if options['stale']:
+            return self.handle_stale(options['chunk_size'], options['loop'])
+
+        rulesets = load_rulesets()
+        for ruleset in rulesets:
+            rules = ', '.join(rule.label for rule in ruleset.rules) or 'no rules'
+            self.stdout.write(f'{ruleset.name}: {rules}')
+            if ruleset.unparsed:
+                self.stdout.write(self.style.WARNING(
+                    f"  could not compile: {', '.join(ruleset.unparsed)}"
+                ))
+
+        started = time.monotonic()
+        written = recompute_compatibility(rulesets=rulesets, chunk_size=options['chunk_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} compatibility rows for {len(rulesets)} conditions in {elapsed:.1f}s'
+        ))
+
+    def handle_stale(self, chunk_size, loop):
+        while True:
+            started = time.monotonic()
+            conditions, written = recompute_stale(chunk_size)
+            if conditions or not loop:
+                elapsed = time.monotonic() - started
+                self.stdout.write(self.style.SUCCESS(
+                    f'Wrote {written} compatibility rows for {conditions} stale conditions in {elapsed:.1f}s'
+                ))
+            if not loop:
+                break
+            time.sleep(settings.COMPATIBILITY_REFRESH_INTERVAL)
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+from recipes.pricing import recompute_costs, CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Recompute estimated recipe costs from the current ingredient prices'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = recompute_costs(chunk_size=options['chunk_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} recipe costs in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+from recipes.models import Recipe
+from recipes.nutrition import recompute_recipes, CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Recompute derived per-serving nutrition for every recipe'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        updated = recompute_recipes(Recipe.objects.all(), chunk_size=options['chunk_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated nutrition for {updated} recipes in {elapsed:.1f}s'
+        ))
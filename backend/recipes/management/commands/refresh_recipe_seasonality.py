@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from recipes.models import Ingredient
+from recipes.seasonality import (
+    recompute_seasonality, prune_seasonality, season_mask, current_month, CHUNK_SIZE
+)
+
+
+class Command(BaseCommand):
+    help = 'Recompute ingredient month masks and recipe season scores (run monthly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', type=int, choices=range(1, 13), default=None)
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        month = options['month'] or current_month()
+        started = time.monotonic()
+
+        # Masks are kept up to date on save; this catches rows written in bulk
+        stale = []
+        for ingredient in Ingredient.objects.only('id', 'seasonality', 'season_mask'):
+            mask = season_mask(ingredient.seasonality)
+            if mask != ingredient.season_mask:
+                ingredient.season_mask = mask
+                stale.append(ingredient)
+        Ingredient.objects.bulk_update(stale, ['season_mask'], batch_size=1000)
+
+        written = recompute_seasonality(month=month, chunk_size=options['chunk_size'])
+        # Readers use this month's scores; a month computed ahead is kept too
+        pruned = prune_seasonality({current_month(), month})
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated {len(stale)} ingredient masks and wrote {written} season scores '
+            f'for month {month} ({pruned} old scores pruned) in {elapsed:.1f}s'
+        ))
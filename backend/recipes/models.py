@@ -1,10 +1,25 @@
-from django.db import models
+import re
+
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.utils.text import slugify
+from africanmealplanner.tracking import FieldTrackerMixin
 
 User = get_user_model()
 
+_NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+
+
+def _as_number(value):
+    """Float from a JSON nutrient value such as 12, 12.5 or '12g'"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER.search(str(value))
+    return float(match.group()) if match else None
+
 
 class Region(models.Model):
     """African regions for recipe categorization"""
@@ -44,7 +59,7 @@ class Cuisine(models.Model):
         return f"{self.name} ({self.region.name})"
 
 
-class Ingredient(models.Model):
+class Ingredient(FieldTrackerMixin, models.Model):
     """Ingredients used in African cooking"""
     name = models.CharField(max_length=200, unique=True)
     local_names = models.JSONField(
@@ -81,6 +96,11 @@ class Ingredient(models.Model):
         default=list,
         help_text="Months when ingredient is in season"
     )
+    season_mask = models.PositiveSmallIntegerField(
+        default=0xFFF,
+        db_index=True,
+        help_text="Bit per month (bit 0 = January) derived from seasonality"
+    )
     storage_tips = models.TextField(blank=True)
     substitutes = models.ManyToManyField(
         'self',
@@ -92,13 +112,37 @@ class Ingredient(models.Model):
         default=list,
         help_text="List of allergens this ingredient contains"
     )
+    density = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(0.01)],
+        help_text="Grams per millilitre, used to convert volumes to mass"
+    )
+    piece_weight = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(0.01)],
+        help_text="Average weight in grams of one piece"
+    )
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Inputs to derived recipe nutrition
+    NUTRITION_FIELDS = ('nutritional_info', 'density', 'piece_weight')
+    tracked_fields = NUTRITION_FIELDS + ('name', 'category', 'seasonality')
+    
     class Meta:
         db_table = 'ingredients'
         ordering = ['category', 'name']
     
+    def save(self, *args, **kwargs):
+        from .seasonality import season_mask
+        self.season_mask = season_mask(self.seasonality)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'seasonality' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'season_mask'}
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return self.name
 
@@ -148,6 +192,13 @@ class Recipe(models.Model):
         help_text="Detailed nutritional information per serving"
     )
     
+    # Indexed copies of key nutrients in nutritional_info (per serving)
+    protein_g = models.FloatField(null=True, blank=True)
+    carbs_g = models.FloatField(null=True, blank=True)
+    fat_g = models.FloatField(null=True, blank=True)
+    fiber_g = models.FloatField(null=True, blank=True)
+    sodium_mg = models.FloatField(null=True, blank=True)
+    
     # Media
     image = models.ImageField(upload_to='recipes/', null=True, blank=True)
     video_url = models.URLField(blank=True)
@@ -204,21 +255,77 @@ class Recipe(models.Model):
             models.Index(fields=['cuisine', 'difficulty']),
             models.Index(fields=['meal_type', 'is_published']),
             models.Index(fields=['average_rating', 'total_ratings']),
+            models.Index(fields=['calories_per_serving']),
+            models.Index(fields=['protein_g']),
+            models.Index(fields=['carbs_g']),
+            models.Index(fields=['fat_g']),
+            models.Index(fields=['fiber_g']),
+            models.Index(fields=['sodium_mg']),
         ]
     
+    # Column -> nutritional_info keys it mirrors, in order of preference
+    NUTRIENT_COLUMNS = {
+        'protein_g': ('protein',),
+        'carbs_g': ('carbohydrates', 'carbs'),
+        'fat_g': ('fat',),
+        'fiber_g': ('fiber', 'fibre'),
+        'sodium_mg': ('sodium',),
+    }
+    
+    SLUG_ATTEMPTS = 5
+    
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)
+        from .slugs import unique_slug
+        allocated_slug = not self.slug
+        if allocated_slug:
+            self.slug = unique_slug(self.name, self.pk)
         
         # Calculate total time if not provided
         if not self.total_time:
             self.total_time = self.prep_time + self.cook_time
         
-        super().save(*args, **kwargs)
+        # Derive nutrition from the ingredients whenever they may have changed
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'ingredients', 'servings'} & set(update_fields):
+            from .nutrition import apply_derived_nutrition
+            if apply_derived_nutrition(self) and update_fields is not None:
+                update_fields = set(update_fields) | {
+                    'nutritional_info', 'calories_per_serving'
+                }
+        
+        # Keep the indexed nutrient columns in sync with nutritional_info
+        self.sync_nutrient_columns()
+        if update_fields is not None and 'nutritional_info' in update_fields:
+            update_fields = set(update_fields) | set(self.NUTRIENT_COLUMNS)
+        if update_fields is not None:
+            kwargs['update_fields'] = update_fields
+        
+        if not allocated_slug:
+            super().save(*args, **kwargs)
+            return
+        # Another writer may take the allocated slug first; allocate again
+        for attempt in range(self.SLUG_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                if attempt + 1 == self.SLUG_ATTEMPTS or not Recipe.objects.filter(
+                    slug=self.slug
+                ).exclude(pk=self.pk).exists():
+                    raise
+                self.slug = unique_slug(self.name, self.pk)
     
     def __str__(self):
         return self.name
     
+    def sync_nutrient_columns(self):
+        """Copy key nutrients from nutritional_info into their indexed columns"""
+        info = self.nutritional_info or {}
+        for column, keys in self.NUTRIENT_COLUMNS.items():
+            value = next((info[key] for key in keys if info.get(key) is not None), None)
+            setattr(self, column, _as_number(value))
+    
     @property
     def total_time_display(self):
         """Human readable total time"""
@@ -230,6 +337,196 @@ class Recipe(models.Model):
         return f"{minutes}m"
 
 
+class RecipeCompatibility(models.Model):
+    """Precomputed compatibility of a recipe with a health condition or dietary preference"""
+    HEALTH_CONDITION = 'health_condition'
+    DIETARY_PREFERENCE = 'dietary_preference'
+    CONDITION_TYPES = [
+        (HEALTH_CONDITION, 'Health Condition'),
+        (DIETARY_PREFERENCE, 'Dietary Preference'),
+    ]
+    
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='compatibility')
+    condition_type = models.CharField(max_length=20, choices=CONDITION_TYPES)
+    condition_id = models.PositiveIntegerField()
+    is_compatible = models.BooleanField(default=True)
+    violations = models.JSONField(
+        default=list,
+        help_text="Rules the recipe breaks, see recipes.rules"
+    )
+    computed_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'recipe_compatibility'
+        unique_together = ['recipe', 'condition_type', 'condition_id']
+        indexes = [
+            models.Index(fields=['condition_type', 'condition_id', 'is_compatible']),
+        ]
+        verbose_name_plural = 'Recipe compatibility'
+    
+    def __str__(self):
+        status = 'compatible' if self.is_compatible else 'incompatible'
+        return f"{self.recipe.name} - {self.condition_type} {self.condition_id} ({status})"
+
+
+class RecipeSeasonality(models.Model):
+    """Share of a recipe's ingredients in season for a month, overall or in a region"""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='season_scores')
+    region = models.ForeignKey(
+        Region,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text="Empty for the score across all regions"
+    )
+    month = models.PositiveSmallIntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(12)]
+    )
+    score = models.FloatField()
+    
+    class Meta:
+        db_table = 'recipe_seasonality'
+        unique_together = ['recipe', 'region', 'month']
+        indexes = [
+            models.Index(fields=['month', 'region', 'score']),
+        ]
+        verbose_name_plural = 'Recipe seasonality'
+    
+    def __str__(self):
+        region = self.region.name if self.region else 'all regions'
+        return f"{self.recipe.name} - {region}, month {self.month} ({self.score:.0%})"
+
+
+class IngredientPrice(models.Model):
+    """Local market price of an ingredient, in a region or by default everywhere"""
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='prices')
+    region = models.ForeignKey(
+        Region,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='ingredient_prices',
+        help_text="Empty for the default price in regions without their own"
+    )
+    price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        validators=[MinValueValidator(0)],
+        help_text="In settings.PRICE_CURRENCY"
+    )
+    quantity = models.CharField(
+        max_length=50,
+        default='1 kg',
+        help_text='What the price buys, e.g. "1 kg", "500 ml" or "1 piece"'
+    )
+    
+    # Parsed from quantity on save
+    dimension = models.CharField(max_length=20, editable=False)
+    unit = models.CharField(max_length=20, editable=False)
+    amount = models.FloatField(editable=False)
+    
+    source = models.CharField(max_length=200, blank=True, help_text="Market survey or supplier")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'ingredient_prices'
+        unique_together = ['ingredient', 'region']
+        ordering = ['ingredient__name']
+    
+    def __str__(self):
+        region = self.region.name if self.region else 'default'
+        return f"{self.ingredient.name} - {region}: {self.price} per {self.quantity}"
+    
+    def clean(self):
+        from .quantities import parse_quantity
+        quantity = parse_quantity(self.quantity)
+        if quantity is None or not quantity.amount:
+            raise ValidationError({'quantity': f'Unreadable quantity "{self.quantity}"'})
+    
+    def save(self, *args, **kwargs):
+        from .quantities import parse_quantity
+        quantity = parse_quantity(self.quantity)
+        if quantity is not None and quantity.amount:
+            self.dimension, self.unit, self.amount = quantity.dimension, quantity.unit, quantity.amount
+        super().save(*args, **kwargs)
+    
+    @property
+    def unit_price(self):
+        """Price of one canonical ``unit``"""
+        return float(self.price) / self.amount if self.amount else None
+
+
+class RecipeCost(models.Model):
+    """Estimated cost of a recipe at a region's ingredient prices"""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='costs')
+    region = models.ForeignKey(
+        Region,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text="Empty for the cost at default prices"
+    )
+    total_cost = models.FloatField()
+    cost_per_serving = models.FloatField()
+    coverage = models.FloatField(help_text="Share of the measured ingredients with a price")
+    
+    class Meta:
+        db_table = 'recipe_costs'
+        unique_together = ['recipe', 'region']
+        indexes = [
+            models.Index(fields=['region', 'cost_per_serving']),
+        ]
+    
+    def __str__(self):
+        region = self.region.name if self.region else 'default prices'
+        return f"{self.recipe.name} - {region}: {self.cost_per_serving:.2f} per serving"
+
+
+class RecipeSignature(models.Model):
+    """MinHash signature of a recipe's ingredients and name (see recipes.duplicates)"""
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.CASCADE, primary_key=True, related_name='signature'
+    )
+    signature = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'recipe_signatures'
+    
+    def __str__(self):
+        return f"Signature of {self.recipe_id}"
+
+
+class RecipeSignatureBucket(models.Model):
+    """One LSH band of a recipe signature; recipes sharing a key are duplicate candidates"""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='signature_buckets')
+    key = models.BigIntegerField()
+    
+    class Meta:
+        db_table = 'recipe_signature_buckets'
+        indexes = [
+            models.Index(fields=['key']),
+        ]
+
+
+class RecipeDuplicate(models.Model):
+    """Likely near-duplicate of a recipe (pairs are stored in both directions)"""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='duplicate_candidates')
+    other = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='+')
+    similarity = models.FloatField(help_text="Estimated Jaccard similarity of ingredients and name")
+    detected_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'recipe_duplicates'
+        unique_together = ['recipe', 'other']
+        ordering = ['-similarity']
+    
+    def __str__(self):
+        return f"{self.recipe_id} ~ {self.other_id} ({self.similarity:.2f})"
+
+
 class RecipeRating(models.Model):
     """User ratings for recipes"""
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='ratings')
@@ -341,6 +638,7 @@ class CookingTip(models.Model):
     
     is_featured = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'cooking_tips'
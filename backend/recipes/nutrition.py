@@ -0,0 +1,191 @@
+"""
+Recipe nutrition derived from ingredient nutrition.
+
+``Ingredient.nutritional_info`` holds values per 100g. Each recipe's linked,
+parsed ingredient entries give a sparse recipe x ingredient grams matrix;
+multiplying it by the ingredient x nutrient matrix yields recipe totals,
+which are divided by ``Recipe.servings`` for per-serving figures.
+Hand-entered figures are only replaced once at least ``MIN_COVERAGE`` of
+the measurable entries contribute; computed ones are always refreshed.
+"""
+
+import re
+
+import numpy as np
+from django.dispatch import Signal
+from django.utils import timezone
+from africanmealplanner.caching import GenerationalSnapshot
+from .models import Ingredient, Recipe
+from .quantities import UNSPECIFIED, density_table, parse_quantity, quantity_from_dict, to_grams
+
+NUTRIENTS = (
+    'calories', 'protein', 'carbohydrates', 'fat', 'fiber', 'sugar', 'sodium',
+    'calcium', 'iron', 'potassium', 'vitamin_a', 'vitamin_c',
+)
+NUTRIENT_ALIASES = {
+    'kcal': 'calories', 'energy': 'calories', 'carbs': 'carbohydrates',
+    'carbohydrate': 'carbohydrates', 'fibre': 'fiber', 'sugars': 'sugar',
+    'proteins': 'protein', 'fats': 'fat', 'total_fat': 'fat',
+}
+
+MIN_COVERAGE = 0.5
+CHUNK_SIZE = 5000
+UPDATE_BATCH_SIZE = 500
+
+# Sent with ``recipe_ids`` after ``recompute_recipes`` rewrote their
+# nutrition (bulk_update sends no post_save)
+recipe_nutrition_changed = Signal()
+
+_NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+
+
+def _nutrient_value(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER.search(str(value))
+    return float(match.group()) if match else 0.0
+
+
+def build_nutrient_matrix():
+    """(ingredient id -> row, ingredients x NUTRIENTS matrix per 100g)"""
+    rows = list(Ingredient.objects.values_list('id', 'nutritional_info'))
+    index = {}
+    matrix = np.zeros((len(rows), len(NUTRIENTS)))
+    columns = {name: i for i, name in enumerate(NUTRIENTS)}
+    for row, (pk, info) in enumerate(rows):
+        index[pk] = row
+        for key, value in (info or {}).items():
+            key = str(key).strip().lower()
+            column = columns.get(NUTRIENT_ALIASES.get(key, key))
+            if column is not None:
+                matrix[row, column] = _nutrient_value(value)
+    return index, matrix
+
+
+nutrient_matrix = GenerationalSnapshot('ingredient-nutrients', build_nutrient_matrix)
+
+
+def compute_nutrition(recipes):
+    """
+    Per-serving nutrition for already-loaded recipes.
+
+    Returns ``{recipe_id: {nutrient: value, ..., 'coverage': fraction}}``;
+    coverage is the share of measurable entries that contributed.
+    """
+    index, matrix = nutrient_matrix.get()
+    densities = density_table.get()
+
+    rows, columns, grams = [], [], []
+    measurable = np.zeros(len(recipes))
+    for position, recipe in enumerate(recipes):
+        for entry in recipe.ingredients or []:
+            if not isinstance(entry, dict):
+                continue
+            quantity = quantity_from_dict(entry.get('parsed_quantity'))
+            if quantity is None:
+                quantity = parse_quantity(entry.get('quantity', ''))
+            if quantity is not None and quantity.dimension == UNSPECIFIED:
+                continue
+            measurable[position] += 1
+
+            ingredient_id = entry.get('ingredient_id')
+            column = index.get(ingredient_id)
+            weight = to_grams(quantity, ingredient_id, densities)
+            if column is not None and weight:
+                rows.append(position)
+                columns.append(column)
+                grams.append(weight)
+
+    rows = np.asarray(rows, dtype=np.int64)
+    grams = np.asarray(grams, dtype=float)
+    scaled = matrix[np.asarray(columns, dtype=np.int64)] * (grams / 100.0)[:, None]
+
+    # Sparse (recipe x ingredient grams) @ (ingredient x nutrient) product
+    totals = np.column_stack([
+        np.bincount(rows, weights=scaled[:, k], minlength=len(recipes))
+        for k in range(len(NUTRIENTS))
+    ]) if len(recipes) else np.zeros((0, len(NUTRIENTS)))
+    contributing = np.bincount(rows, minlength=len(recipes))
+
+    servings = np.array([max(recipe.servings or 1, 1) for recipe in recipes], dtype=float)
+    per_serving = np.round(totals / servings[:, None], 1)
+    coverage = np.divide(
+        contributing, measurable, out=np.zeros(len(recipes)), where=measurable > 0
+    )
+
+    results = {}
+    for position, recipe in enumerate(recipes):
+        values = dict(zip(NUTRIENTS, per_serving[position].tolist()))
+        values['coverage'] = round(float(coverage[position]), 2)
+        results[recipe.pk] = values
+    return results
+
+
+def apply_nutrition(recipe, values):
+    """
+    Copy computed values onto ``recipe``; returns False if nothing
+    contributed, or too little to replace hand-entered figures.
+    """
+    if not values or not values['coverage']:
+        return False
+    hand_entered = recipe.calories_per_serving and not (recipe.nutritional_info or {}).get('computed')
+    if hand_entered and values['coverage'] < MIN_COVERAGE:
+        return False
+    recipe.nutritional_info = {**(recipe.nutritional_info or {}), **values, 'computed': True}
+    recipe.calories_per_serving = round(values['calories'])
+    recipe.sync_nutrient_columns()
+    return True
+
+
+def apply_derived_nutrition(recipe):
+    """Recompute nutrition for a single recipe in memory (used by Recipe.save)"""
+    return apply_nutrition(recipe, compute_nutrition([recipe]).get(recipe.pk))
+
+
+def recompute_recipes(queryset, chunk_size=CHUNK_SIZE):
+    """Recompute and bulk-write nutrition for every recipe in ``queryset``"""
+    recipe_ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+    updated = []
+    for start in range(0, len(recipe_ids), chunk_size):
+        recipes = list(
+            Recipe.objects.filter(pk__in=recipe_ids[start:start + chunk_size])
+            .only('id', 'servings', 'ingredients', 'nutritional_info', 'calories_per_serving',
+                  *Recipe.NUTRIENT_COLUMNS)
+        )
+        results = compute_nutrition(recipes)
+        changed = []
+        for recipe in recipes:
+            # Recipes without derived values still get their nutrient columns synced
+            columns = [getattr(recipe, column) for column in Recipe.NUTRIENT_COLUMNS]
+            if apply_nutrition(recipe, results[recipe.pk]):
+                changed.append(recipe)
+                continue
+            recipe.sync_nutrient_columns()
+            if columns != [getattr(recipe, column) for column in Recipe.NUTRIENT_COLUMNS]:
+                changed.append(recipe)
+        # bulk_update skips auto_now; caches keyed on updated_at need the bump
+        now = timezone.now()
+        for recipe in changed:
+            recipe.updated_at = now
+        Recipe.objects.bulk_update(
+            changed, ['nutritional_info', 'calories_per_serving', *Recipe.NUTRIENT_COLUMNS, 'updated_at'],
+            batch_size=UPDATE_BATCH_SIZE
+        )
+        updated.extend(recipe.pk for recipe in changed)
+
+    if updated:
+        recipe_nutrition_changed.send(sender=Recipe, recipe_ids=updated)
+    return len(updated)
+
+
+def recipes_using(ingredient_ids):
+    """Recipes whose linked entries reference any of ``ingredient_ids``"""
+    queryset = Recipe.objects.none()
+    for ingredient_id in ingredient_ids:
+        queryset |= Recipe.objects.filter(ingredients__contains=[{'ingredient_id': ingredient_id}])
+    return queryset
+
+
+def recompute_for_ingredients(ingredient_ids):
+    """Incremental recompute after ingredient nutrition or density changes"""
+    return recompute_recipes(recipes_using(ingredient_ids))
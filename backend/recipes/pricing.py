@@ -0,0 +1,297 @@
+"""
+Ingredient price index and per-recipe cost estimates.
+
+``IngredientPrice`` rows hold a local price per region (or a default for
+regions without one). They are loaded into an ingredients x regions matrix
+of prices per basis unit: grams whenever the priced quantity converts to
+mass, otherwise the priced unit itself. Regions fall back to the default
+price, and the default to the mean of the regional prices.
+
+A recipe's cost is the sum over its measured ingredient entries of amount
+times price, in every region at once. Costs are stored in ``RecipeCost``
+(one row per region plus one at default prices) for recipes with at least
+``MIN_COVERAGE`` of their measured entries priced, so budget filters are a
+range lookup on an indexed column.
+"""
+
+import csv
+from collections import Counter, namedtuple
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.dispatch import Signal
+from django.utils import timezone
+from africanmealplanner.caching import GenerationalSnapshot
+from .linking import ingredient_linker, normalize_name
+from .models import IngredientPrice, Recipe, RecipeCost, Region
+from .quantities import (
+    MASS, convert_amount, density_table, grams_per_unit, parse_quantity, quantity_from_dict
+)
+from .regions import regions_for_country
+
+MIN_COVERAGE = 0.5
+CHUNK_SIZE = 2000
+CREATE_BATCH_SIZE = 1000
+
+# Sent with ``recipe_ids`` (None for every recipe) after stored costs change
+recipe_costs_changed = Signal()
+
+PriceTable = namedtuple('PriceTable', ['index', 'bases', 'prices', 'region_columns'])
+
+
+def build_price_table():
+    """
+    ``PriceTable``: ingredient id -> row, the ``(dimension, unit)`` basis of
+    each row, prices per basis unit (rows x regions, last column default)
+    and region id -> column.
+    """
+    region_ids = list(Region.objects.order_by('pk').values_list('pk', flat=True))
+    region_columns = {pk: i for i, pk in enumerate(region_ids)}
+    default = len(region_ids)
+    densities = density_table.get()
+
+    quotes = {}
+    for ingredient_id, region_id, price, dimension, unit, amount in IngredientPrice.objects.values_list(
+        'ingredient_id', 'region_id', 'price', 'dimension', 'unit', 'amount'
+    ):
+        if not amount:
+            continue
+        grams = grams_per_unit(ingredient_id, dimension, unit, densities)
+        basis, unit_price = ((MASS, 'g'), float(price) / (amount * grams)) if grams else (
+            (dimension, unit), float(price) / amount
+        )
+        column = default if region_id is None else region_columns[region_id]
+        quotes.setdefault(ingredient_id, []).append((column, basis, unit_price))
+
+    index, bases = {}, []
+    prices = np.full((len(quotes), default + 1), np.nan)
+    for row, (ingredient_id, rows) in enumerate(quotes.items()):
+        # Quotes in a unit that does not convert to the others are dropped
+        basis = Counter(basis for _, basis, _ in rows).most_common(1)[0][0]
+        index[ingredient_id] = row
+        bases.append(basis)
+        for column, quote_basis, unit_price in rows:
+            if quote_basis == basis:
+                prices[row, column] = unit_price
+
+    if len(quotes):
+        regional = prices[:, :default]
+        known = ~np.isnan(regional)
+        counts = known.sum(axis=1)
+        mean = np.divide(
+            np.where(known, regional, 0.0).sum(axis=1), counts,
+            out=np.full(len(quotes), np.nan), where=counts > 0
+        )
+        missing = np.isnan(prices[:, default])
+        prices[missing, default] = mean[missing]
+        prices[:, :default] = np.where(known, regional, prices[:, [default]])
+    return PriceTable(index, bases, prices, region_columns)
+
+
+price_table = GenerationalSnapshot('ingredient-prices', build_price_table)
+
+
+def region_column(table, region_id):
+    """Price matrix column for ``region_id`` (the default column for None or unknown)"""
+    return table.region_columns.get(region_id, len(table.region_columns))
+
+
+def price_region(country):
+    """Region whose prices apply in ``country`` (None for the defaults)"""
+    regions = regions_for_country(country)
+    return regions[0] if regions else None
+
+
+def unit_price(ingredient_id, dimension, unit, region_id=None, table=None, densities=None):
+    """Price of one ``unit`` of an ingredient in a region, or None when unpriced"""
+    table = price_table.get() if table is None else table
+    row = table.index.get(ingredient_id)
+    if row is None:
+        return None
+    amount = convert_amount(ingredient_id, 1.0, (dimension, unit), table.bases[row], densities)
+    if amount is None:
+        return None
+    return amount * table.prices[row, region_column(table, region_id)]
+
+
+def _entry_quantity(entry):
+    quantity = quantity_from_dict(entry.get('parsed_quantity'))
+    if quantity is None:
+        quantity = parse_quantity(entry.get('quantity', ''))
+    return quantity
+
+
+def compute_costs(recipes, table, densities):
+    """
+    Costs of already-loaded recipes in every price column; returns
+    ``{recipe_id: (totals per column, coverage)}`` for recipes with at least
+    one priced entry.
+    """
+    positions, rows, amounts = [], [], []
+    measured = np.zeros(len(recipes))
+    for position, recipe in enumerate(recipes):
+        for entry in recipe.ingredients or []:
+            if not isinstance(entry, dict):
+                continue
+            quantity = _entry_quantity(entry)
+            if quantity is None or quantity.amount is None:
+                # "To taste" entries are not costed
+                continue
+            measured[position] += 1
+            ingredient_id = entry.get('ingredient_id')
+            row = table.index.get(ingredient_id)
+            if row is None:
+                continue
+            amount = convert_amount(
+                ingredient_id, quantity.amount, (quantity.dimension, quantity.unit),
+                table.bases[row], densities
+            )
+            if amount is not None:
+                positions.append(position)
+                rows.append(row)
+                amounts.append(amount)
+
+    positions = np.asarray(positions, dtype=np.int64)
+    costs = table.prices[np.asarray(rows, dtype=np.int64)] * np.asarray(amounts)[:, None]
+    totals = np.column_stack([
+        np.bincount(positions, weights=costs[:, column], minlength=len(recipes))
+        for column in range(table.prices.shape[1])
+    ])
+    priced = np.bincount(positions, minlength=len(recipes))
+    coverage = np.divide(priced, measured, out=np.zeros(len(recipes)), where=measured > 0)
+    return {
+        recipes[position].pk: (totals[position], float(coverage[position]))
+        for position in np.flatnonzero(priced)
+    }
+
+
+def recompute_costs(recipe_ids=None, chunk_size=CHUNK_SIZE):
+    """
+    Replace the stored costs of ``recipe_ids`` (default: every recipe) from
+    the current prices. Returns the number of rows written.
+    """
+    everything = recipe_ids is None
+    if everything:
+        recipe_ids = Recipe.objects.order_by('pk').values_list('pk', flat=True)
+    recipe_ids = list(recipe_ids)
+
+    table = price_table.get()
+    densities = density_table.get()
+    regions = [None] * (len(table.region_columns) + 1)
+    for region_id, column in table.region_columns.items():
+        regions[column] = region_id
+
+    written = 0
+    for start in range(0, len(recipe_ids), chunk_size):
+        chunk = recipe_ids[start:start + chunk_size]
+        recipes = list(Recipe.objects.filter(pk__in=chunk).only('id', 'servings', 'ingredients'))
+        servings = {recipe.pk: recipe.servings or 1 for recipe in recipes}
+        rows = []
+        for recipe_id, (totals, coverage) in compute_costs(recipes, table, densities).items():
+            if coverage < MIN_COVERAGE:
+                continue
+            rows.extend(
+                RecipeCost(
+                    recipe_id=recipe_id,
+                    region_id=region_id,
+                    total_cost=round(float(total), 4),
+                    cost_per_serving=round(float(total) / servings[recipe_id], 4),
+                    coverage=round(coverage, 3),
+                )
+                for region_id, total in zip(regions, totals)
+            )
+        with transaction.atomic():
+            RecipeCost.objects.filter(recipe_id__in=chunk).delete()
+            RecipeCost.objects.bulk_create(rows, batch_size=CREATE_BATCH_SIZE)
+        written += len(rows)
+
+    recipe_costs_changed.send(sender=RecipeCost, recipe_ids=None if everything else recipe_ids)
+    return written
+
+
+def read_price_rows(lines):
+    """
+    ``(row number, ingredient, region, price, quantity, source)`` tuples
+    from CSV text lines with a header; ``region`` is blank for defaults and
+    ``quantity`` defaults to "1 kg".
+    """
+    for number, row in enumerate(csv.DictReader(lines), 2):
+        row = {str(key).strip().lower(): (value or '').strip() for key, value in row.items() if key}
+        yield (
+            number, row.get('ingredient', ''), row.get('region', ''), row.get('price', ''),
+            row.get('quantity') or row.get('unit') or '1 kg', row.get('source', ''),
+        )
+
+
+def import_prices(rows):
+    """
+    Upsert prices from ``read_price_rows`` output with a handful of queries.
+    Ingredients are matched by exact (normalized) name or local name and
+    regions by name. Returns ``(prices written, [(row number, error), ...])``.
+    """
+    ingredients = ingredient_linker.get().index
+    regions = {name.lower(): pk for pk, name in Region.objects.values_list('id', 'name')}
+
+    prices, errors = {}, []
+    for number, ingredient, region, price, quantity, source in rows:
+        ingredient_id = ingredients.get(normalize_name(ingredient))
+        region_id = regions.get(region.lower()) if region else None
+        parsed = parse_quantity(quantity)
+        try:
+            value = round(float(price), 2)
+        except ValueError:
+            value = None
+        if ingredient_id is None:
+            errors.append((number, f'Unknown ingredient "{ingredient}"'))
+        elif region and region_id is None:
+            errors.append((number, f'Unknown region "{region}"'))
+        elif value is None or value < 0:
+            errors.append((number, f'Invalid price "{price}"'))
+        elif parsed is None or not parsed.amount:
+            errors.append((number, f'Unreadable quantity "{quantity}"'))
+        else:
+            # Later rows for the same ingredient and region win
+            prices[(ingredient_id, region_id)] = (value, quantity, parsed, source)
+
+    # Default prices have a null region, which a unique constraint does not
+    # match on conflict, so existing rows are looked up and updated instead
+    existing = {
+        (item.ingredient_id, item.region_id): item
+        for item in IngredientPrice.objects.filter(ingredient_id__in={key[0] for key in prices})
+    }
+    now = timezone.now()
+    created, updated = [], []
+    for (ingredient_id, region_id), (value, quantity, parsed, source) in prices.items():
+        item = existing.get((ingredient_id, region_id))
+        if item is None:
+            item = IngredientPrice(ingredient_id=ingredient_id, region_id=region_id)
+            created.append(item)
+        else:
+            updated.append(item)
+        item.price, item.quantity, item.source, item.updated_at = value, quantity, source, now
+        item.dimension, item.unit, item.amount = parsed.dimension, parsed.unit, parsed.amount
+
+    with transaction.atomic():
+        IngredientPrice.objects.bulk_create(created, batch_size=CREATE_BATCH_SIZE)
+        IngredientPrice.objects.bulk_update(
+            updated,
+            ['price', 'quantity', 'dimension', 'unit', 'amount', 'source', 'updated_at'],
+            batch_size=CREATE_BATCH_SIZE
+        )
+    price_table.invalidate()
+    return len(prices), errors
+
+
+def filter_by_cost(queryset, region=None, minimum=None, maximum=None):
+    """Keep recipes whose cost per serving in ``region`` (default prices if None) is in range"""
+    bounds = {}
+    if minimum is not None:
+        bounds['cost_per_serving__gte'] = minimum
+    if maximum is not None:
+        bounds['cost_per_serving__lte'] = maximum
+    if not bounds:
+        return queryset
+    return queryset.filter(Exists(
+        RecipeCost.objects.filter(recipe=OuterRef('pk'), region=region, **bounds)
+    ))
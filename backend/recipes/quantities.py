@@ -0,0 +1,255 @@
+"""
+Parsing of free-text ingredient quantities ("2 cups", "1½ tbsp", "500g",
+"a handful") into canonical amounts: grams for mass, millilitres for volume
+and a count of a named unit (piece, clove, ...) otherwise.
+"""
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from africanmealplanner.caching import GenerationalSnapshot
+from .models import Ingredient
+
+Quantity = namedtuple('Quantity', ['amount', 'unit', 'dimension', 'source_unit'])
+
+MASS, VOLUME, COUNT, UNSPECIFIED = 'mass', 'volume', 'count', 'unspecified'
+UNSPECIFIED_QUANTITY = Quantity(None, None, UNSPECIFIED, None)
+CANONICAL_UNITS = {MASS: 'g', VOLUME: 'ml'}
+
+# alias -> (dimension, canonical unit or count unit, factor to canonical)
+UNITS = {}
+
+
+def _register(dimension, unit, factor, *aliases):
+    for alias in (unit,) + aliases:
+        UNITS[alias] = (dimension, CANONICAL_UNITS.get(dimension, unit), factor, unit)
+
+
+_register(MASS, 'g', 1, 'gram', 'grams', 'gramme', 'grammes', 'gr', 'grm')
+_register(MASS, 'kg', 1000, 'kgs', 'kilo', 'kilos', 'kilogram', 'kilograms')
+_register(MASS, 'mg', 0.001, 'milligram', 'milligrams')
+_register(MASS, 'oz', 28.3495, 'ounce', 'ounces')
+_register(MASS, 'lb', 453.592, 'lbs', 'pound', 'pounds')
+_register(VOLUME, 'ml', 1, 'millilitre', 'millilitres', 'milliliter', 'milliliters', 'mls')
+_register(VOLUME, 'cl', 10, 'centilitre', 'centilitres', 'centiliter', 'centiliters')
+_register(VOLUME, 'l', 1000, 'litre', 'litres', 'liter', 'liters', 'ltr')
+_register(VOLUME, 'tsp', 4.92892, 'teaspoon', 'teaspoons', 'tsps')
+_register(VOLUME, 'tbsp', 14.7868, 'tablespoon', 'tablespoons', 'tbsps', 'tbs', 'tbl', 'tb')
+_register(VOLUME, 'cup', 236.588, 'cups', 'c')
+_register(VOLUME, 'fl oz', 29.5735, 'fluid ounce', 'fluid ounces', 'fl. oz')
+_register(VOLUME, 'pint', 473.176, 'pints', 'pt')
+_register(VOLUME, 'quart', 946.353, 'quarts', 'qt')
+_register(VOLUME, 'gallon', 3785.41, 'gallons', 'gal')
+_register(VOLUME, 'pinch', 0.31, 'pinches')
+_register(VOLUME, 'dash', 0.62, 'dashes')
+_register(VOLUME, 'handful', 120, 'handfuls')
+for _unit, *_aliases in (
+    ('piece', 'pieces', 'pc', 'pcs', 'whole'),
+    ('clove', 'cloves'),
+    ('bunch', 'bunches'),
+    ('can', 'cans', 'tin', 'tins'),
+    ('cube', 'cubes'),
+    ('slice', 'slices'),
+    ('stalk', 'stalks', 'stick', 'sticks'),
+    ('sachet', 'sachets', 'packet', 'packets'),
+    ('leaf', 'leaves'),
+    ('head', 'heads', 'bulb', 'bulbs'),
+    ('sprig', 'sprigs'),
+    ('knob', 'knobs', 'thumb'),
+    ('fillet', 'fillets'),
+):
+    _register(COUNT, _unit, 1, *_aliases)
+
+# Rough weights for count units when the ingredient has no piece_weight
+COUNT_UNIT_GRAMS = {
+    'clove': 5, 'cube': 4, 'can': 400, 'slice': 25, 'sachet': 10,
+    'leaf': 0.5, 'sprig': 1, 'knob': 15, 'stalk': 40, 'bunch': 100,
+}
+
+# Grams per millilitre when the ingredient has no density of its own
+CATEGORY_DENSITY = {
+    'vegetables': 0.6, 'fruits': 0.7, 'grains': 0.8, 'legumes': 0.85,
+    'meat': 1.05, 'fish': 1.05, 'dairy': 1.03, 'spices': 0.5,
+    'oils': 0.92, 'nuts': 0.6, 'other': 1.0,
+}
+
+VAGUE_PHRASES = frozenset([
+    'to taste', 'as needed', 'as required', 'as desired', 'optional',
+    'for garnish', 'for frying', 'some', 'a little', 'few', 'a few',
+])
+
+_FRACTIONS = {
+    '½': '1/2', '⅓': '1/3', '⅔': '2/3', '¼': '1/4', '¾': '3/4', '⅕': '1/5',
+    '⅖': '2/5', '⅗': '3/5', '⅘': '4/5', '⅙': '1/6', '⅚': '5/6', '⅛': '1/8',
+    '⅜': '3/8', '⅝': '5/8', '⅞': '7/8', '⁄': '/',
+}
+_FRACTION_RE = re.compile('|'.join(map(re.escape, _FRACTIONS)))
+# Recipe shorthand where case matters: "2 T" is tablespoons, "2 t" teaspoons
+_CASED_UNIT_RE = re.compile(
+    '([0-9' + ''.join(_FRACTIONS) + r'])\s*(T|t)(?![\w-])'
+)
+_CASED_UNITS = {'T': 'tbsp', 't': 'tsp'}
+_APPROXIMATION_RE = re.compile(
+    r'^(?:about|approx\.?|approximately|around|roughly|nearly|almost|circa|ca\.|~)\s*'
+)
+
+# Size and heaping words between the amount and the unit ("2 heaped tbsp")
+_MODIFIER_RE = re.compile(
+    r'^(?:(?:small|medium|large|big|heaped|heaping|level|rounded|generous|scant|good|full)\s+)+'
+)
+
+_NUMBER = r'(?:\d+\s+\d+/\d+|\d+/\d+|\d*\.\d+|\d+)'
+_QUANTITY_RE = re.compile(
+    rf'^(?:(?:an?\s+)?(?P<half>half)(?:\s+an?)?(?:\s+|$)|(?P<article>an?|one)\s+|(?P<amount>{_NUMBER})'
+    rf'(?:\s*(?:-|–|to)\s*(?P<upper>{_NUMBER}))?\s*)'
+    r'(?P<rest>.*)$'
+)
+_UNIT_RE = re.compile(
+    r'^(?P<unit>'
+    + '|'.join(re.escape(alias) for alias in sorted(UNITS, key=len, reverse=True))
+    + r')\.?(?![a-z])\s*(?:of\s+)?(?P<note>.*)$'
+)
+
+
+def _to_number(text):
+    text = text.strip()
+    if ' ' in text:
+        whole, fraction = text.split(None, 1)
+        return float(whole) + _to_number(fraction)
+    if '/' in text:
+        numerator, denominator = text.split('/')
+        return float(numerator) / float(denominator) if float(denominator) else 0.0
+    return float(text)
+
+
+@lru_cache(maxsize=65536)
+def parse_quantity(text):
+    """
+    Parse a quantity string into a canonical ``Quantity``.
+
+    Returns a quantity with dimension ``'unspecified'`` for phrases such as
+    "to taste", and None when the text cannot be understood.
+    """
+    text = _CASED_UNIT_RE.sub(lambda m: f"{m.group(1)} {_CASED_UNITS[m.group(2)]}", str(text))
+    text = _APPROXIMATION_RE.sub('', text.strip().lower())
+    if not text:
+        return None
+    if text in VAGUE_PHRASES:
+        return UNSPECIFIED_QUANTITY
+
+    text = _FRACTION_RE.sub(lambda m: ' ' + _FRACTIONS[m.group()], text)
+    text = re.sub(r'\([^)]*\)', ' ', text)
+    text = re.sub(r'(\d)\s+/', r'\1/', text).strip()
+    text = re.sub(r'\s+', ' ', text)
+
+    match = _QUANTITY_RE.match(text)
+    if match is None:
+        # Bare unit such as "pinch" or "handful"
+        unit_match = _UNIT_RE.match(text)
+        if unit_match is None:
+            return None
+        amount, rest = 1.0, text
+    else:
+        if match.group('half'):
+            amount = 0.5
+        elif match.group('article'):
+            amount = 1.0
+        else:
+            amount = _to_number(match.group('amount'))
+            if match.group('upper'):
+                amount = (amount + _to_number(match.group('upper'))) / 2
+        rest = match.group('rest')
+
+    unit_match = _UNIT_RE.match(_MODIFIER_RE.sub('', rest))
+    if unit_match is None:
+        if match is None or match.group('article'):
+            return None
+        return Quantity(amount, 'piece', COUNT, 'piece')
+
+    dimension, unit, factor, source_unit = UNITS[unit_match.group('unit')]
+    return Quantity(round(amount * factor, 4), unit, dimension, source_unit)
+
+
+def parse_quantities(values):
+    """
+    Parse many quantity strings at once.
+
+    Each distinct string is parsed once, so backfills over millions of
+    entries cost roughly one parse per unique spelling.
+    """
+    parsed = {}
+    results = []
+    for value in values:
+        key = str(value)
+        if key not in parsed:
+            parsed[key] = parse_quantity(key)
+        results.append(parsed[key])
+    return results
+
+
+def quantity_to_dict(quantity):
+    """JSON form stored on ``Recipe.ingredients`` entries"""
+    if quantity is None:
+        return None
+    return {
+        'amount': quantity.amount,
+        'unit': quantity.unit,
+        'dimension': quantity.dimension,
+        'source_unit': quantity.source_unit,
+    }
+
+
+def quantity_from_dict(data):
+    if not data:
+        return None
+    return Quantity(data.get('amount'), data.get('unit'), data.get('dimension'), data.get('source_unit'))
+
+
+def build_density_table():
+    """ingredient id -> (grams per ml, grams per piece)"""
+    return {
+        pk: (density or CATEGORY_DENSITY.get(category, 1.0), piece_weight)
+        for pk, category, density, piece_weight in Ingredient.objects.values_list(
+            'id', 'category', 'density', 'piece_weight'
+        )
+    }
+
+
+density_table = GenerationalSnapshot('ingredient-densities', build_density_table)
+
+
+def to_grams(quantity, ingredient_id=None, table=None):
+    """Mass in grams for a parsed quantity, or None if it cannot be known"""
+    if quantity is None or quantity.amount is None:
+        return None
+    if quantity.dimension == MASS:
+        return quantity.amount
+
+    table = density_table.get() if table is None else table
+    density, piece_weight = table.get(ingredient_id, (1.0, None))
+    if quantity.dimension == VOLUME:
+        return quantity.amount * density
+    if quantity.dimension == COUNT:
+        if quantity.unit == 'piece':
+            weight = piece_weight
+        else:
+            weight = COUNT_UNIT_GRAMS.get(quantity.unit) or piece_weight
+        return quantity.amount * weight if weight else None
+    return None
+
+
+def grams_per_unit(ingredient_id, dimension, unit, table=None):
+    """Grams in one ``unit`` of an ingredient, or None when unknown"""
+    return to_grams(Quantity(1.0, unit, dimension, unit), ingredient_id, table)
+
+
+def convert_amount(ingredient_id, amount, source, target, table=None):
+    """``amount`` in the ``(dimension, unit)`` ``source`` expressed in ``target``"""
+    if source[1] == target[1]:
+        return amount
+    source_grams = grams_per_unit(ingredient_id, *source, table)
+    target_grams = grams_per_unit(ingredient_id, *target, table)
+    if not source_grams or not target_grams:
+        return None
+    return amount * source_grams / target_grams
@@ -0,0 +1,90 @@
+"""
+In-memory country -> region -> cuisine index.
+
+Built from ``Region.countries`` and ``Cuisine.region`` so a user's country
+resolves to their regions and local cuisines with dict lookups instead of
+scanning the countries JSON of every region.
+"""
+
+import re
+import unicodedata
+from collections import namedtuple
+
+from django.db.models import BooleanField, Case, Value, When
+from africanmealplanner.caching import GenerationalSnapshot
+from .models import Region, Cuisine
+
+RegionIndex = namedtuple('RegionIndex', ['country_regions', 'region_cuisines'])
+
+# Common alternative spellings, keyed and valued by normalized name
+COUNTRY_ALIASES = {
+    'ivory coast': 'cote d ivoire',
+    'drc': 'democratic republic of the congo',
+    'dr congo': 'democratic republic of the congo',
+    'congo kinshasa': 'democratic republic of the congo',
+    'congo brazzaville': 'republic of the congo',
+    'swaziland': 'eswatini',
+    'cape verde': 'cabo verde',
+    'the gambia': 'gambia',
+}
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_country(name):
+    """Lookup key for a country name ("Côte d'Ivoire" -> "cote d ivoire")"""
+    text = unicodedata.normalize('NFKD', str(name or ''))
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    text = _NON_WORD.sub(' ', text).strip()
+    return COUNTRY_ALIASES.get(text, text)
+
+
+def build_region_index():
+    country_regions = {}
+    for region_id, countries in Region.objects.order_by('pk').values_list('id', 'countries'):
+        for country in countries or []:
+            regions = country_regions.setdefault(normalize_country(country), [])
+            if region_id not in regions:
+                regions.append(region_id)
+
+    region_cuisines = {}
+    for cuisine_id, region_id in Cuisine.objects.order_by('pk').values_list('id', 'region_id'):
+        region_cuisines.setdefault(region_id, []).append(cuisine_id)
+
+    return RegionIndex(
+        {country: tuple(regions) for country, regions in country_regions.items()},
+        {region: tuple(cuisines) for region, cuisines in region_cuisines.items()},
+    )
+
+
+region_index = GenerationalSnapshot('region-index', build_region_index)
+
+
+def regions_for_country(country):
+    """Region ids containing ``country`` (empty when unknown)"""
+    return region_index.get().country_regions.get(normalize_country(country), ())
+
+
+def local_cuisines(country):
+    """Cuisine ids from the regions containing ``country``"""
+    index = region_index.get()
+    return tuple(
+        cuisine_id
+        for region_id in index.country_regions.get(normalize_country(country), ())
+        for cuisine_id in index.region_cuisines.get(region_id, ())
+    )
+
+
+def boost_local(queryset, country):
+    """
+    Order recipes from ``country``'s cuisines first, keeping the existing
+    order within each group; annotates ``is_local``.
+    """
+    cuisines = local_cuisines(country)
+    is_local = Case(
+        When(cuisine_id__in=cuisines, then=Value(True)),
+        default=Value(False),
+        output_field=BooleanField()
+    ) if cuisines else Value(False)
+    ordering = queryset.query.order_by or queryset.model._meta.ordering
+    return queryset.annotate(is_local=is_local).order_by('-is_local', *ordering)
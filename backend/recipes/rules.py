@@ -0,0 +1,226 @@
+"""
+Compilation of free-text dietary rules into structured checks.
+
+``HealthCondition.dietary_restrictions`` and ``DietaryPreference.allowed_foods``
+/ ``restricted_foods`` are comma-separated text. Each entry is compiled into a
+``Rule``: a per-serving nutrient bound ("low sugar", "sodium < 600mg"), an
+excluded ingredient category ("no meat") or an excluded ingredient name
+("pork"). Conditions whose text compiles to nothing fall back to presets
+keyed on their name (diabetes, hypertension, vegetarian, ...).
+"""
+
+import re
+from collections import namedtuple
+
+from accounts.models import HealthCondition, DietaryPreference
+from .linking import normalize_name
+from .models import Ingredient, RecipeCompatibility
+from .nutrition import NUTRIENTS, NUTRIENT_ALIASES
+
+Rule = namedtuple('Rule', ['kind', 'target', 'bound', 'value', 'label'])
+RuleSet = namedtuple('RuleSet', ['condition_type', 'condition_id', 'name', 'rules', 'unparsed'])
+
+NUTRIENT, CATEGORY, INGREDIENT = 'nutrient', 'category', 'ingredient'
+MAX, MIN = 'max', 'min'
+
+HEALTH_CONDITION = RecipeCompatibility.HEALTH_CONDITION
+DIETARY_PREFERENCE = RecipeCompatibility.DIETARY_PREFERENCE
+
+# Per-serving bounds for "low X" / "high X" phrases
+LOW_LIMITS = {
+    'sugar': 10, 'sodium': 600, 'fat': 15, 'carbohydrates': 45,
+    'calories': 450, 'potassium': 700,
+}
+HIGH_MINIMUMS = {'protein': 20, 'fiber': 5, 'calcium': 200, 'iron': 4}
+
+# Sodium and the minerals are stored in mg, calories in kcal, the rest in g
+MILLIGRAM_NUTRIENTS = frozenset(['sodium', 'calcium', 'iron', 'potassium'])
+
+CATEGORIES = frozenset(value for value, _ in Ingredient._meta.get_field('category').choices)
+CATEGORY_ALIASES = {
+    'meats': 'meat', 'red meat': 'meat', 'poultry': 'meat',
+    'seafood': 'fish', 'sea food': 'fish',
+    'milk product': 'dairy', 'dairy product': 'dairy',
+    'vegetable': 'vegetables', 'veg': 'vegetables', 'fruit': 'fruits',
+    'grain': 'grains', 'cereal': 'grains', 'cereals': 'grains',
+    'legume': 'legumes', 'beans': 'legumes', 'pulses': 'legumes',
+    'spice': 'spices', 'herbs': 'spices', 'oil': 'oils', 'fats': 'oils',
+    'nut': 'nuts', 'seeds': 'nuts',
+}
+EXTRA_NUTRIENT_ALIASES = {'salt': 'sodium', 'carb': 'carbohydrates', 'calorie': 'calories'}
+
+CONDITION_PRESETS = {
+    'diabetes': 'low sugar, carbohydrates <= 60g',
+    'type 1 diabetes': 'low sugar, carbohydrates <= 60g',
+    'type 2 diabetes': 'low sugar, carbohydrates <= 60g',
+    'hypertension': 'low sodium',
+    'high blood pressure': 'low sodium',
+    'high cholesterol': 'low fat',
+    'heart disease': 'low sodium, low fat',
+    'kidney disease': 'sodium <= 500mg, low potassium',
+    'obesity': 'low calories',
+    'celiac disease': 'no wheat, no barley, no rye',
+    'gout': 'no offal, no organ meat',
+}
+PREFERENCE_PRESETS = {
+    'vegetarian': ('meat, fish', ''),
+    'vegan': ('meat, fish, dairy, egg, honey', ''),
+    'pescatarian': ('meat', 'fish'),
+    'halal': ('pork, bacon, ham, alcohol, wine, beer', ''),
+    'gluten free': ('wheat, barley, rye', ''),
+    'dairy free': ('dairy', ''),
+    'keto': ('carbohydrates <= 20g', ''),
+    'low carb': ('carbohydrates <= 30g', ''),
+}
+
+_NUMBER = r'(?P<value>\d+(?:\.\d+)?)\s*(?P<unit>mg|g|kcal|cal)?'
+_COMPARISON_RE = re.compile(
+    r'^(?P<nutrient>[a-z ]+?)\s*(?P<op><=|>=|<|>|under|below|over|above|at most|at least)\s*'
+    + _NUMBER + r'$'
+)
+_BOUND_RE = re.compile(r'^(?P<op>max|maximum|min|minimum)\s+(?P<nutrient>[a-z ]+?)\s+' + _NUMBER + r'$')
+_LEVEL_RE = re.compile(r'^(?P<level>low|lower|reduced|limited|limit|less|high|higher|rich in)\s+(?P<nutrient>[a-z ]+)$')
+_EXCLUDE_RE = re.compile(r'^(?:no|avoid|without|exclude)\s+(?P<food>.+)$')
+_FREE_RE = re.compile(r'^(?P<food>.+?)[\s-]free$')
+
+_MAX_OPS = frozenset(['<=', '<', 'under', 'below', 'at most', 'max', 'maximum'])
+
+
+def _split(text):
+    return [token.strip().lower() for token in str(text or '').split(',') if token.strip()]
+
+
+def _nutrient(text):
+    text = text.strip().replace(' ', '_')
+    text = EXTRA_NUTRIENT_ALIASES.get(text, NUTRIENT_ALIASES.get(text, text))
+    return text if text in NUTRIENTS else None
+
+
+def _category(text):
+    text = text.strip()
+    category = CATEGORY_ALIASES.get(text, text)
+    return category if category in CATEGORIES else None
+
+
+def _amount(nutrient, value, unit):
+    value = float(value)
+    if unit == 'g' and nutrient in MILLIGRAM_NUTRIENTS:
+        return value * 1000
+    if unit == 'mg' and nutrient not in MILLIGRAM_NUTRIENTS:
+        return value / 1000
+    return value
+
+
+def _nutrient_rule(nutrient, bound, value, label):
+    return Rule(NUTRIENT, nutrient, bound, value, label)
+
+
+def _exclusion(food, label):
+    category = _category(food)
+    if category:
+        return Rule(CATEGORY, category, None, None, label)
+    term = normalize_name(food)
+    return Rule(INGREDIENT, term, None, None, label) if term else None
+
+
+def compile_token(token):
+    """
+    Compile one comma-separated entry into a ``Rule`` (None if not understood).
+
+    A bare nutrient ("salt") reads as "low salt"; any other bare name is an
+    excluded category or ingredient.
+    """
+    match = _COMPARISON_RE.match(token) or _BOUND_RE.match(token)
+    if match:
+        nutrient = _nutrient(match.group('nutrient'))
+        if nutrient is None:
+            return None
+        bound = MAX if match.group('op') in _MAX_OPS else MIN
+        value = _amount(nutrient, match.group('value'), match.group('unit'))
+        return _nutrient_rule(nutrient, bound, value, token)
+
+    match = _LEVEL_RE.match(token)
+    if match:
+        nutrient = _nutrient(match.group('nutrient'))
+        if nutrient is None:
+            return None
+        if match.group('level').startswith(('high', 'rich')):
+            value = HIGH_MINIMUMS.get(nutrient)
+            return _nutrient_rule(nutrient, MIN, value, token) if value else None
+        value = LOW_LIMITS.get(nutrient)
+        return _nutrient_rule(nutrient, MAX, value, token) if value else None
+
+    match = _EXCLUDE_RE.match(token) or _FREE_RE.match(token)
+    if match:
+        food = match.group('food').replace('added ', '')
+        nutrient = _nutrient(food)
+        if nutrient in LOW_LIMITS:
+            # "sugar free", "no added salt"
+            return _nutrient_rule(nutrient, MAX, LOW_LIMITS[nutrient] / 2, token)
+        return _exclusion(food, token)
+
+    nutrient = _nutrient(token)
+    if nutrient is not None:
+        if nutrient in LOW_LIMITS:
+            return _nutrient_rule(nutrient, MAX, LOW_LIMITS[nutrient], token)
+        return None
+    return _exclusion(token, token)
+
+
+def compile_rules(restricted, allowed=''):
+    """Compile restriction text into ``(rules, unparsed tokens)``"""
+    rules, unparsed = [], []
+    for token in _split(restricted):
+        rule = compile_token(token)
+        if rule is None:
+            unparsed.append(token)
+        else:
+            rules.append(rule)
+
+    # Allowed foods carve exceptions out of the exclusions
+    exceptions = set()
+    for token in _split(allowed):
+        rule = _exclusion(token, token)
+        if rule is not None:
+            exceptions.add((rule.kind, rule.target))
+    rules = [rule for rule in rules if (rule.kind, rule.target) not in exceptions]
+    return rules, unparsed
+
+
+def _preset_key(name):
+    return re.sub(r'[\s_-]+', ' ', str(name).strip().lower())
+
+
+def compile_health_condition(condition):
+    rules, unparsed = compile_rules(condition.dietary_restrictions)
+    if not rules:
+        preset = CONDITION_PRESETS.get(_preset_key(condition.name))
+        if preset:
+            rules, _ = compile_rules(preset)
+    return RuleSet(HEALTH_CONDITION, condition.pk, condition.name, rules, unparsed)
+
+
+def compile_dietary_preference(preference):
+    rules, unparsed = compile_rules(preference.restricted_foods, preference.allowed_foods)
+    if not rules:
+        preset = PREFERENCE_PRESETS.get(_preset_key(preference.name))
+        if preset:
+            rules, _ = compile_rules(*preset)
+    return RuleSet(DIETARY_PREFERENCE, preference.pk, preference.name, rules, unparsed)
+
+
+def load_rulesets(condition_type=None, condition_ids=None):
+    """Compiled rule sets for every (or the selected) condition and preference"""
+    sources = (
+        (HEALTH_CONDITION, HealthCondition, compile_health_condition),
+        (DIETARY_PREFERENCE, DietaryPreference, compile_dietary_preference),
+    )
+    rulesets = []
+    for kind, model, compile_one in sources:
+        if condition_type is not None and kind != condition_type:
+            continue
+        queryset = model.objects.all()
+        if condition_ids is not None:
+            queryset = queryset.filter(pk__in=condition_ids)
+        rulesets.extend(compile_one(obj) for obj in queryset)
+    return rulesets
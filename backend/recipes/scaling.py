@@ -0,0 +1,205 @@
+"""
+Scaling of recipe ingredients and nutrition to a number of servings.
+
+Quantities are scaled in canonical units (see ``quantities``) and then
+rendered back in the most readable kitchen unit, so 16 tbsp becomes
+"1 cup" and 1200 g becomes "1.2 kg".
+"""
+
+from django.core.cache import cache
+from .nutrition import NUTRIENTS
+from .quantities import (
+    MASS, VOLUME, COUNT, UNITS, parse_quantity, quantity_from_dict, quantity_to_dict
+)
+
+CACHE_TTL = 60 * 60 * 24
+MAX_SERVINGS = 100
+MAX_BATCH_SIZE = 100
+
+# Source units that are scaled along the spoon/cup ladder
+SPOON_UNITS = frozenset(['tsp', 'tbsp', 'cup', 'fl oz', 'pint', 'quart', 'gallon'])
+# Imperial mass units stay imperial
+IMPERIAL_MASS_UNITS = frozenset(['oz', 'lb'])
+# Approximate units are never converted, only multiplied
+APPROXIMATE_UNITS = frozenset(['pinch', 'dash', 'handful'])
+# Stored amounts are rounded (3 tsp = 14.7867 ml < 1 tbsp = 14.7868 ml), so
+# unit thresholds are compared with this relative slack
+PROMOTION_TOLERANCE = 1e-4
+
+PLURALS = {
+    'cup': 'cups', 'pinch': 'pinches', 'dash': 'dashes', 'handful': 'handfuls',
+    'bunch': 'bunches', 'leaf': 'leaves', 'pint': 'pints', 'quart': 'quarts',
+    'gallon': 'gallons',
+}
+
+# Fractions used when rendering kitchen measures
+_FRACTIONS = ((1, 8), (1, 4), (1, 3), (1, 2), (2, 3), (3, 4))
+
+
+def _factor(unit):
+    """Canonical amount (g or ml) in one ``unit``"""
+    return UNITS[unit][2]
+
+
+def _unit_label(unit, text):
+    # Singular for "1" and plain fractions such as "1/2"
+    if text == '1' or ('/' in text and ' ' not in text):
+        return unit
+    if unit in PLURALS:
+        return PLURALS[unit]
+    return unit + 's' if UNITS[unit][0] == COUNT else unit
+
+
+def format_fraction(amount, smallest=4):
+    """Render ``amount`` as a kitchen fraction such as "1 1/2" """
+    whole = int(amount)
+    remainder = amount - whole
+    candidates = [(0, 1), (1, 1)] + [f for f in _FRACTIONS if f[1] <= smallest]
+    numerator, denominator = min(candidates, key=lambda f: abs(remainder - f[0] / f[1]))
+    if numerator == denominator:
+        whole, numerator = whole + 1, 0
+    if whole == 0 and numerator == 0:
+        # Never round a real amount down to nothing
+        return f"1/{smallest}"
+    if numerator == 0:
+        return str(whole)
+    fraction = f"{numerator}/{denominator}"
+    return f"{whole} {fraction}" if whole else fraction
+
+
+def format_decimal(amount):
+    """Render a metric amount with precision that suits its size"""
+    if amount >= 100:
+        return str(int(round(amount / 5) * 5))
+    if amount >= 10:
+        return str(int(round(amount)))
+    return f"{round(amount, 1):g}"
+
+
+def _spoon_measure(ml):
+    if ml >= _factor('cup') / 4 * (1 - PROMOTION_TOLERANCE):
+        return ml / _factor('cup'), 'cup', 4
+    if ml >= _factor('tbsp') * (1 - PROMOTION_TOLERANCE):
+        return ml / _factor('tbsp'), 'tbsp', 2
+    return ml / _factor('tsp'), 'tsp', 8
+
+
+def display_quantity(quantity):
+    """
+    Human readable text for a canonical quantity, promoting to the unit
+    that reads best (16 tbsp -> 1 cup, 1500 g -> 1.5 kg).
+    """
+    amount, source_unit = quantity.amount, quantity.source_unit
+
+    if quantity.dimension == MASS:
+        if source_unit in IMPERIAL_MASS_UNITS:
+            ounces = amount / _factor('oz')
+            if ounces >= 16:
+                return f"{format_fraction(ounces / 16)} lb"
+            return f"{format_fraction(ounces)} oz"
+        if amount >= 1000:
+            return f"{format_decimal(amount / 1000)} kg"
+        if amount < 1:
+            return f"{format_decimal(amount * 1000)} mg"
+        return f"{format_decimal(amount)} g"
+
+    if quantity.dimension == VOLUME:
+        if source_unit in APPROXIMATE_UNITS:
+            text = format_fraction(amount / _factor(source_unit))
+            return f"{text} {_unit_label(source_unit, text)}"
+        if source_unit in SPOON_UNITS:
+            value, unit, smallest = _spoon_measure(amount)
+            text = format_fraction(value, smallest)
+            return f"{text} {_unit_label(unit, text)}"
+        if amount >= 1000:
+            return f"{format_decimal(amount / 1000)} l"
+        return f"{format_decimal(amount)} ml"
+
+    if quantity.dimension == COUNT:
+        text = format_fraction(amount)
+        if quantity.unit == 'piece':
+            return text
+        return f"{text} {_unit_label(quantity.unit, text)}"
+
+    return None
+
+
+def scale_entry(entry, factor):
+    """Copy of an ingredient entry with its quantity multiplied by ``factor``"""
+    quantity = quantity_from_dict(entry.get('parsed_quantity'))
+    if quantity is None:
+        quantity = parse_quantity(entry.get('quantity', ''))
+
+    scaled = dict(entry, original_quantity=entry.get('quantity'))
+    if quantity is None or quantity.amount is None:
+        # Unparseable or "to taste" quantities are passed through untouched
+        scaled['scaled'] = False
+        return scaled
+
+    quantity = quantity._replace(amount=quantity.amount * factor)
+    scaled['quantity'] = display_quantity(quantity)
+    scaled['parsed_quantity'] = quantity_to_dict(
+        quantity._replace(amount=round(quantity.amount, 4))
+    )
+    scaled['scaled'] = True
+    return scaled
+
+
+def scale_nutrition(nutritional_info, servings):
+    """Total nutrition for ``servings`` from per-serving values"""
+    totals = {}
+    for nutrient in NUTRIENTS:
+        value = (nutritional_info or {}).get(nutrient)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            totals[nutrient] = round(value * servings, 2)
+    return totals
+
+
+def build_scaled_recipe(recipe, servings):
+    """Scaled ingredients and nutrition for ``recipe`` as a JSON-ready dict"""
+    base_servings = recipe.servings or 1
+    factor = servings / base_servings
+    calories = recipe.calories_per_serving
+    return {
+        'recipe_id': recipe.pk,
+        'servings': servings,
+        'original_servings': base_servings,
+        'factor': round(factor, 4),
+        'ingredients': [scale_entry(entry, factor) for entry in recipe.ingredients or []],
+        'nutrition_per_serving': recipe.nutritional_info or {},
+        'nutrition_total': scale_nutrition(recipe.nutritional_info, servings),
+        'total_calories': calories * servings if calories is not None else None,
+    }
+
+
+def _cache_key(recipe, servings):
+    updated = recipe.updated_at.timestamp() if recipe.updated_at else 0
+    return f"recipe-scaled:{recipe.pk}:{updated}:{servings}"
+
+
+def scale_recipes(requests):
+    """
+    Scale many recipes at once from ``(recipe, servings)`` pairs; returns
+    ``{(recipe_id, servings): scaled}``. Results are cached per
+    (recipe, servings) and keyed on ``updated_at`` so edits invalidate them.
+    """
+    keys = {(recipe.pk, servings): _cache_key(recipe, servings) for recipe, servings in requests}
+    cached = cache.get_many(keys.values())
+
+    results = {}
+    missing = {}
+    for recipe, servings in requests:
+        key = keys[(recipe.pk, servings)]
+        value = cached.get(key)
+        if value is None:
+            value = missing[key] = build_scaled_recipe(recipe, servings)
+        results[(recipe.pk, servings)] = value
+
+    if missing:
+        cache.set_many(missing, CACHE_TTL)
+    return results
+
+
+def scale_recipe(recipe, servings):
+    """Scale a single recipe (see ``scale_recipes``)"""
+    return scale_recipes([(recipe, servings)])[(recipe.pk, servings)]
@@ -0,0 +1,196 @@
+"""
+Ingredient seasonality as 12-bit month masks and per-recipe season scores.
+
+``Ingredient.seasonality`` (a JSON list of months) is folded into
+``Ingredient.season_mask`` on save. A recipe's season score for a month is
+the share of its linked ingredients in season that month, overall and per
+region, where an ingredient only counts for the regions in its
+``common_regions`` (all regions when none are set). Scores for the current
+month are stored in ``RecipeSeasonality``; ``refresh_recipe_seasonality``
+rolls them over monthly.
+"""
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Exists, FloatField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Ingredient, Recipe, Region, RecipeSeasonality
+
+MONTHS = (
+    'january', 'february', 'march', 'april', 'may', 'june', 'july',
+    'august', 'september', 'october', 'november', 'december',
+)
+ALL_MONTHS = (1 << 12) - 1
+YEAR_ROUND = frozenset(['all', 'all year', 'year round', 'year-round', 'yearround'])
+
+IN_SEASON_THRESHOLD = 0.5
+CHUNK_SIZE = 2000
+CREATE_BATCH_SIZE = 1000
+
+
+def month_bit(month):
+    return 1 << (month - 1)
+
+
+def current_month():
+    return timezone.localdate().month
+
+
+def _month_number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value if 1 <= value <= 12 else None
+    text = str(value).strip().lower().rstrip('.')
+    if text.isdigit():
+        return _month_number(int(text))
+    if len(text) >= 3:
+        for number, name in enumerate(MONTHS, 1):
+            if name.startswith(text):
+                return number
+    return None
+
+
+def season_mask(seasonality):
+    """
+    Month mask for a seasonality list such as ``[1, 2, 3]``,
+    ``["Jan", "February"]`` or ``["Nov-Feb"]``. Empty or unreadable
+    seasonality means year-round.
+    """
+    if isinstance(seasonality, str):
+        seasonality = seasonality.split(',')
+    mask = 0
+    for value in seasonality or []:
+        text = str(value).strip().lower()
+        if text in YEAR_ROUND:
+            return ALL_MONTHS
+        if '-' in text or '–' in text:
+            start, _, end = text.replace('–', '-').partition('-')
+            start, end = _month_number(start), _month_number(end)
+            if start and end:
+                # Ranges may wrap around the new year
+                for offset in range((end - start) % 12 + 1):
+                    mask |= month_bit((start - 1 + offset) % 12 + 1)
+            continue
+        number = _month_number(value)
+        if number:
+            mask |= month_bit(number)
+    return mask or ALL_MONTHS
+
+
+def load_ingredient_seasons():
+    """(ingredient id -> row, month masks, ingredients x regions membership, region ids)"""
+    region_ids = list(Region.objects.order_by('pk').values_list('pk', flat=True))
+    region_columns = {pk: i for i, pk in enumerate(region_ids)}
+    rows = list(Ingredient.objects.values_list('id', 'season_mask'))
+    index = {pk: i for i, (pk, _) in enumerate(rows)}
+    masks = np.array([mask for _, mask in rows], dtype=np.int64)
+
+    membership = np.zeros((len(rows), len(region_ids)), dtype=bool)
+    restricted = np.zeros(len(rows), dtype=bool)
+    for ingredient_id, region_id in Ingredient.common_regions.through.objects.values_list(
+        'ingredient_id', 'region_id'
+    ):
+        membership[index[ingredient_id], region_columns[region_id]] = True
+        restricted[index[ingredient_id]] = True
+    # Ingredients without common regions count everywhere
+    membership[~restricted] = True
+    return index, masks, membership, region_ids
+
+
+def compute_scores(recipes, month, seasons):
+    """
+    Season scores for already-loaded recipes; returns
+    ``{recipe_id: (overall score, {region_id: score})}`` for recipes with at
+    least one linked ingredient.
+    """
+    index, masks, membership, region_ids = seasons
+    positions, columns = [], []
+    for position, recipe in enumerate(recipes):
+        linked = {
+            index[entry['ingredient_id']] for entry in recipe.ingredients or []
+            if isinstance(entry, dict) and entry.get('ingredient_id') in index
+        }
+        positions.extend([position] * len(linked))
+        columns.extend(linked)
+
+    positions = np.asarray(positions, dtype=np.int64)
+    columns = np.asarray(columns, dtype=np.int64)
+    in_season = (masks[columns] & month_bit(month)) != 0
+
+    totals = np.bincount(positions, minlength=len(recipes)).astype(float)
+    known = totals > 0
+
+    def share(hits):
+        counts = np.bincount(positions, weights=hits.astype(float), minlength=len(recipes))
+        return np.divide(counts, totals, out=np.zeros(len(recipes)), where=known)
+
+    overall = share(in_season)
+    regional = np.column_stack([
+        share(in_season & membership[columns, r]) for r in range(len(region_ids))
+    ]) if region_ids else np.zeros((len(recipes), 0))
+
+    results = {}
+    for position in np.flatnonzero(known):
+        results[recipes[position].pk] = (
+            round(float(overall[position]), 3),
+            {
+                region_id: round(float(regional[position, r]), 3)
+                for r, region_id in enumerate(region_ids)
+            },
+        )
+    return results
+
+
+def recompute_seasonality(recipe_ids=None, month=None, chunk_size=CHUNK_SIZE):
+    """
+    Replace the stored season scores of ``recipe_ids`` (default: every
+    recipe) with scores for ``month`` (default: this month). Returns the
+    number of rows written.
+    """
+    month = month or current_month()
+    if recipe_ids is None:
+        recipe_ids = Recipe.objects.order_by('pk').values_list('pk', flat=True)
+    recipe_ids = list(recipe_ids)
+
+    seasons = load_ingredient_seasons()
+    written = 0
+    for start in range(0, len(recipe_ids), chunk_size):
+        chunk = recipe_ids[start:start + chunk_size]
+        recipes = list(Recipe.objects.filter(pk__in=chunk).only('id', 'ingredients'))
+        rows = []
+        for recipe_id, (overall, regional) in compute_scores(recipes, month, seasons).items():
+            rows.append(RecipeSeasonality(recipe_id=recipe_id, month=month, score=overall))
+            rows.extend(
+                RecipeSeasonality(recipe_id=recipe_id, region_id=region_id, month=month, score=score)
+                for region_id, score in regional.items()
+            )
+        with transaction.atomic():
+            RecipeSeasonality.objects.filter(recipe_id__in=chunk, month=month).delete()
+            RecipeSeasonality.objects.bulk_create(rows, batch_size=CREATE_BATCH_SIZE)
+        written += len(rows)
+    return written
+
+
+def prune_seasonality(keep_months):
+    """Delete stored scores for months not in ``keep_months``; returns the row count"""
+    deleted, _ = RecipeSeasonality.objects.exclude(month__in=list(keep_months)).delete()
+    return deleted
+
+
+def _scores(region=None, month=None):
+    return RecipeSeasonality.objects.filter(
+        recipe=OuterRef('pk'), month=month or current_month(), region=region
+    )
+
+
+def annotate_season_score(queryset, region=None, month=None):
+    """Add ``season_score`` for the month and region (0 when unknown, so it sorts last)"""
+    score = Subquery(_scores(region, month).values('score')[:1], output_field=FloatField())
+    return queryset.annotate(season_score=Coalesce(score, Value(0.0)))
+
+
+def filter_in_season(queryset, region=None, month=None, threshold=IN_SEASON_THRESHOLD):
+    """Keep recipes with at least ``threshold`` of their ingredients in season"""
+    return queryset.filter(Exists(_scores(region, month).filter(score__gte=threshold)))
@@ -1,8 +1,13 @@
 from rest_framework import serializers
 from .models import (
     Region, Cuisine, Ingredient, Recipe, RecipeRating, 
-    UserRecipe, RecipeCollection, CookingTip
+    UserRecipe, RecipeCollection, CookingTip, RecipeCost, RecipeDuplicate
 )
+from .linking import link_ingredients
+from .quantities import UNSPECIFIED_QUANTITY, parse_quantity, quantity_to_dict
+from .scaling import MAX_SERVINGS, MAX_BATCH_SIZE
+from .signals import recipe_cooked
+from .substitutes import substitute_graph
 
 
 class RegionSerializer(serializers.ModelSerializer):
@@ -21,7 +26,7 @@ class CuisineSerializer(serializers.ModelSerializer):
 
 class IngredientSerializer(serializers.ModelSerializer):
     common_regions = RegionSerializer(many=True, read_only=True)
-    substitutes = serializers.StringRelatedField(many=True, read_only=True)
+    substitutes = serializers.SerializerMethodField()
     
     class Meta:
         model = Ingredient
@@ -30,6 +35,10 @@ class IngredientSerializer(serializers.ModelSerializer):
             'nutritional_info', 'common_regions', 'seasonality',
             'storage_tips', 'substitutes', 'allergen_info'
         ]
+    
+    def get_substitutes(self, obj):
+        # Served from the in-memory graph so lists never query per row
+        return substitute_graph.get().direct_names(obj.id)
 
 
 class RecipeListSerializer(serializers.ModelSerializer):
@@ -47,11 +56,31 @@ class RecipeListSerializer(serializers.ModelSerializer):
         ]
 
 
+class RecipeCostSerializer(serializers.ModelSerializer):
+    """Estimated cost at a region's prices (region null for default prices)"""
+    
+    class Meta:
+        model = RecipeCost
+        fields = ['region', 'cost_per_serving', 'total_cost', 'coverage']
+
+
+class RecipeDuplicateSerializer(serializers.ModelSerializer):
+    """A likely near-duplicate of a recipe"""
+    id = serializers.IntegerField(source='other.id', read_only=True)
+    name = serializers.CharField(source='other.name', read_only=True)
+    slug = serializers.CharField(source='other.slug', read_only=True)
+    
+    class Meta:
+        model = RecipeDuplicate
+        fields = ['id', 'name', 'slug', 'similarity']
+
+
 class RecipeDetailSerializer(serializers.ModelSerializer):
     """Serializer for recipe detail view"""
     cuisine = CuisineSerializer(read_only=True)
     total_time_display = serializers.ReadOnlyField()
     created_by = serializers.StringRelatedField(read_only=True)
+    costs = RecipeCostSerializer(many=True, read_only=True)
     
     class Meta:
         model = Recipe
@@ -63,7 +92,7 @@ class RecipeDetailSerializer(serializers.ModelSerializer):
             'cultural_significance', 'origin_story', 'traditional_occasions',
             'tags', 'dietary_labels', 'allergen_warnings', 'created_by',
             'chef_notes', 'average_rating', 'total_ratings', 'is_featured',
-            'created_at', 'updated_at'
+            'costs', 'created_at', 'updated_at'
         ]
 
 
@@ -94,6 +123,13 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             for field in required_fields:
                 if field not in ingredient:
                     raise serializers.ValidationError(f"Ingredient missing required field: {field}")
+            
+            # Free text the parser cannot read is kept as an unmeasured amount
+            quantity = parse_quantity(ingredient['quantity']) or UNSPECIFIED_QUANTITY
+            ingredient['parsed_quantity'] = quantity_to_dict(quantity)
+        
+        # Resolve each entry to a catalog Ingredient (ingredient_id may be None)
+        link_ingredients(value)
         
         return value
     
@@ -153,10 +189,12 @@ class UserRecipeUpdateSerializer(serializers.ModelSerializer):
     
     def update(self, instance, validated_data):
         # Handle cooking completion
-        if (validated_data.get('cooking_completed_at') and 
+        completed = bool(
+            validated_data.get('cooking_completed_at') and 
             instance.cooking_started_at and 
-            not instance.cooking_completed_at):
-            
+            not instance.cooking_completed_at
+        )
+        if completed:
             # Calculate cooking duration
             duration = validated_data['cooking_completed_at'] - instance.cooking_started_at
             instance.cooking_duration = int(duration.total_seconds() / 60)
@@ -164,7 +202,14 @@ class UserRecipeUpdateSerializer(serializers.ModelSerializer):
             instance.last_cooked = validated_data['cooking_completed_at']
             instance.status = 'completed'
         
-        return super().update(instance, validated_data)
+        instance = super().update(instance, validated_data)
+        if completed:
+            recipe_cooked.send(
+                sender=UserRecipe,
+                user_recipe=instance,
+                servings=instance.user.family_size or 1
+            )
+        return instance
 
 
 class RecipeCollectionSerializer(serializers.ModelSerializer):
@@ -232,10 +277,80 @@ class RecipeSearchSerializer(serializers.Serializer):
         child=serializers.CharField(),
         required=False
     )
+    min_calories = serializers.IntegerField(required=False, min_value=0)
+    max_calories = serializers.IntegerField(required=False, min_value=0)
+    min_protein = serializers.FloatField(required=False, min_value=0)
+    max_protein = serializers.FloatField(required=False, min_value=0)
+    min_carbs = serializers.FloatField(required=False, min_value=0)
+    max_carbs = serializers.FloatField(required=False, min_value=0)
+    min_fat = serializers.FloatField(required=False, min_value=0)
+    max_fat = serializers.FloatField(required=False, min_value=0)
+    min_fiber = serializers.FloatField(required=False, min_value=0)
+    max_fiber = serializers.FloatField(required=False, min_value=0)
+    min_sodium = serializers.FloatField(required=False, min_value=0)
+    max_sodium = serializers.FloatField(required=False, min_value=0)
+    
+    # Search parameter -> indexed Recipe column
+    NUTRIENT_RANGES = {
+        'calories': 'calories_per_serving',
+        'protein': 'protein_g',
+        'carbs': 'carbs_g',
+        'fat': 'fat_g',
+        'fiber': 'fiber_g',
+        'sodium': 'sodium_mg',
+    }
+    
+    # Only recipes compatible with the user's health conditions and dietary preferences
+    compatible_only = serializers.BooleanField(default=False)
+    
+    # Sort by a nutrient, prefix with '-' for descending
+    sort_by = serializers.ChoiceField(
+        choices=[prefix + name for name in NUTRIENT_RANGES for prefix in ('', '-')],
+        required=False
+    )
+    
+    def validate(self, attrs):
+        for name in self.NUTRIENT_RANGES:
+            low, high = attrs.get(f'min_{name}'), attrs.get(f'max_{name}')
+            if low is not None and high is not None and low > high:
+                raise serializers.ValidationError({
+                    f'min_{name}': f"Must not exceed max_{name}."
+                })
+        return attrs
+
+
+class SubstituteQuerySerializer(serializers.Serializer):
+    """Serializer for safe substitute lookup parameters"""
+    allergies = serializers.CharField(required=False, allow_blank=True)
+    depth = serializers.IntegerField(default=2, min_value=1, max_value=4)
+
+
+class ScaleQuerySerializer(serializers.Serializer):
+    """Serializer for recipe scaling parameters"""
+    servings = serializers.IntegerField(required=False, min_value=1, max_value=MAX_SERVINGS)
+
+
+class ScaleItemSerializer(ScaleQuerySerializer):
+    """A single recipe in a batch scaling request"""
+    recipe = serializers.IntegerField()
+
+
+class ScaleBatchSerializer(serializers.Serializer):
+    """Serializer for batch recipe scaling"""
+    items = ScaleItemSerializer(many=True)
+    
+    def validate_items(self, value):
+        if not value:
+            raise serializers.ValidationError("At least one recipe is required")
+        if len(value) > MAX_BATCH_SIZE:
+            raise serializers.ValidationError(f"At most {MAX_BATCH_SIZE} recipes per request")
+        return value
 
 
 class RecipeRecommendationSerializer(serializers.Serializer):
     """Serializer for recipe recommendation parameters"""
+    in_season = serializers.BooleanField(default=False)
+    local = serializers.BooleanField(default=False)
     meal_type = serializers.ChoiceField(
         choices=Recipe.MEAL_TYPE_CHOICES,
         required=False
@@ -263,4 +378,5 @@ class RecipeRecommendationSerializer(serializers.Serializer):
         required=False
     )
     family_size = serializers.IntegerField(required=False, min_value=1)
-    count = serializers.IntegerField(default=10, min_value=1, max_value=50)
\ No newline at end of file
+    count = serializers.IntegerField(default=10, min_value=1, max_value=50)
+    include_adapted = serializers.BooleanField(default=False)
\ No newline at end of file
@@ -0,0 +1,177 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import Signal, receiver
+from accounts.models import HealthCondition, DietaryPreference
+from .models import Region, Cuisine, Ingredient, IngredientPrice, Recipe, RecipeCompatibility
+from .compatibility import (
+    CONDITION_MODELS, ingredient_catalog, recompute_for_recipes, recompute_in_background
+)
+from .duplicates import index_recipes
+from .linking import ingredient_linker
+from .nutrition import nutrient_matrix, recompute_for_ingredients, recipes_using
+from .pricing import price_table, recompute_costs
+from .quantities import density_table
+from .regions import region_index
+from .seasonality import recompute_seasonality
+from .substitutes import substitute_graph
+
+# Sent after a cooking session is completed, with ``user_recipe`` and
+# ``servings`` (the household size it was cooked for)
+recipe_cooked = Signal()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(m2m_changed, sender=Ingredient.substitutes.through)
+def invalidate_ingredient_indexes(sender, action=None, **kwargs):
+    """Rebuild the in-memory ingredient indexes after catalog edits"""
+    if action is None or action.startswith('post_'):
+        substitute_graph.invalidate()
+        if action is None:
+            ingredient_linker.invalidate()
+            density_table.invalidate()
+            nutrient_matrix.invalidate()
+            ingredient_catalog.invalidate()
+            price_table.invalidate()
+
+
+@receiver(post_save, sender=Region)
+@receiver(post_delete, sender=Region)
+@receiver(post_save, sender=Cuisine)
+@receiver(post_delete, sender=Cuisine)
+def invalidate_region_index(sender, **kwargs):
+    """Rebuild the country -> region -> cuisine index after edits"""
+    region_index.invalidate()
+    if sender is Region:
+        price_table.invalidate()
+
+
+@receiver(post_save, sender=Ingredient)
+def recompute_recipe_nutrition(sender, instance, created, **kwargs):
+    """Refresh derived nutrition and compatibility of recipes using a changed ingredient"""
+    if created:
+        return
+    nutrition_changed = instance.has_changed(*Ingredient.NUTRITION_FIELDS)
+    if not nutrition_changed and not instance.has_changed('name', 'category'):
+        return
+    ingredient_id = instance.pk
+    
+    def refresh():
+        if nutrition_changed:
+            recompute_for_ingredients([ingredient_id])
+        recompute_for_recipes(recipes_using([ingredient_id]).values_list('pk', flat=True))
+    
+    transaction.on_commit(refresh)
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_recipe_compatibility(sender, instance, update_fields=None, **kwargs):
+    """Re-evaluate dietary rules for a recipe whose ingredients or nutrition changed"""
+    if update_fields is not None and not {'ingredients', 'nutritional_info'} & set(update_fields):
+        return
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: recompute_for_recipes([recipe_id]))
+
+
+@receiver(post_save, sender=Recipe)
+def detect_duplicate_recipe(sender, instance, update_fields=None, **kwargs):
+    """Re-sign a recipe whose name or ingredients changed and record its near-duplicates"""
+    if update_fields is not None and not {'name', 'ingredients'} & set(update_fields):
+        return
+    transaction.on_commit(lambda: index_recipes([instance]))
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_ingredient_season_scores(sender, instance, created, **kwargs):
+    """Re-score recipes using an ingredient whose seasonality changed"""
+    if created or not instance.has_changed('seasonality'):
+        return
+    ingredient_id = instance.pk
+    transaction.on_commit(lambda: recompute_seasonality(
+        recipes_using([ingredient_id]).values_list('pk', flat=True)
+    ))
+
+
+@receiver(m2m_changed, sender=Ingredient.common_regions.through)
+def refresh_regional_season_scores(sender, instance, action, reverse, pk_set, **kwargs):
+    """Re-score recipes whose ingredients moved between regions"""
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        ingredient_ids = [instance.pk]
+    elif pk_set is not None:
+        ingredient_ids = list(pk_set)
+    else:
+        # Region cleared: any recipe may be affected
+        transaction.on_commit(recompute_seasonality)
+        return
+    transaction.on_commit(lambda: recompute_seasonality(
+        recipes_using(ingredient_ids).values_list('pk', flat=True)
+    ))
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_recipe_season_scores(sender, instance, update_fields=None, **kwargs):
+    """Re-score a recipe whose ingredients changed"""
+    if update_fields is not None and 'ingredients' not in update_fields:
+        return
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: recompute_seasonality([recipe_id]))
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_recipe_cost(sender, instance, update_fields=None, **kwargs):
+    """Re-price a recipe whose ingredients or yield changed"""
+    if update_fields is not None and not {'ingredients', 'servings'} & set(update_fields):
+        return
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: recompute_costs([recipe_id]))
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_ingredient_costs(sender, instance, created, **kwargs):
+    """Re-price recipes using an ingredient whose unit conversions changed"""
+    if created or not instance.has_changed('density', 'piece_weight'):
+        return
+    ingredient_id = instance.pk
+    if IngredientPrice.objects.filter(ingredient_id=ingredient_id).exists():
+        transaction.on_commit(lambda: recompute_costs(
+            recipes_using([ingredient_id]).values_list('pk', flat=True)
+        ))
+
+
+@receiver(post_save, sender=IngredientPrice)
+@receiver(post_delete, sender=IngredientPrice)
+def refresh_price_costs(sender, instance, origin=None, **kwargs):
+    """Re-price recipes using an ingredient whose price was edited"""
+    price_table.invalidate()
+    if isinstance(origin, (Ingredient, Region)):
+        # Cascade from a deleted ingredient or region
+        return
+    ingredient_id = instance.ingredient_id
+    transaction.on_commit(lambda: recompute_costs(
+        recipes_using([ingredient_id]).values_list('pk', flat=True)
+    ))
+
+
+@receiver(post_save, sender=HealthCondition)
+@receiver(post_save, sender=DietaryPreference)
+def compute_new_condition_compatibility(sender, instance, created, **kwargs):
+    """
+    Evaluate a new condition off the request thread once it is committed.
+    Edits are left to `recompute_recipe_compatibility --stale` (their old
+    results stay in place until then).
+    """
+    if not created:
+        return
+    condition_type, condition_id = CONDITION_MODELS[sender], instance.pk
+    transaction.on_commit(lambda: recompute_in_background(condition_type, condition_id))
+
+
+@receiver(post_delete, sender=HealthCondition)
+@receiver(post_delete, sender=DietaryPreference)
+def delete_condition_compatibility(sender, instance, **kwargs):
+    """Drop stored results for a deleted condition"""
+    RecipeCompatibility.objects.filter(
+        condition_type=CONDITION_MODELS[sender], condition_id=instance.pk
+    ).delete()
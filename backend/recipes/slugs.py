@@ -0,0 +1,59 @@
+"""
+Unique recipe slugs.
+
+A slug is the slugified name, suffixed "-2", "-3", ... past the ones taken.
+Names are allocated in batches: one query per ``QUERY_CHUNK_SIZE`` distinct
+base slugs reads every taken slug sharing a prefix, and the batch's own
+picks count as taken, so bulk creation never collides with itself.
+Concurrent writers can still pick the same slug; ``Recipe.save`` retries
+with a fresh allocation when the unique index rejects one.
+"""
+
+from django.db.models import Q
+from django.utils.text import slugify
+from .models import Recipe
+
+QUERY_CHUNK_SIZE = 100
+# Room kept for a "-<n>" suffix
+SUFFIX_LENGTH = 8
+
+
+def base_slug(name):
+    max_length = Recipe._meta.get_field('slug').max_length - SUFFIX_LENGTH
+    return slugify(name)[:max_length].strip('-') or 'recipe'
+
+
+def taken_slugs(bases, exclude_pk=None):
+    """Existing slugs starting with any of ``bases``"""
+    bases = sorted(set(bases))
+    taken = set()
+    for start in range(0, len(bases), QUERY_CHUNK_SIZE):
+        prefixes = Q()
+        for base in bases[start:start + QUERY_CHUNK_SIZE]:
+            prefixes |= Q(slug__startswith=base)
+        slugs = Recipe.objects.filter(prefixes)
+        if exclude_pk is not None:
+            slugs = slugs.exclude(pk=exclude_pk)
+        taken.update(slugs.values_list('slug', flat=True))
+    return taken
+
+
+def allocate_slugs(names, exclude_pk=None):
+    """A distinct, unused slug for each of ``names``, in order"""
+    bases = [base_slug(name) for name in names]
+    taken = taken_slugs(bases, exclude_pk)
+    next_suffix = {}
+    slugs = []
+    for base in bases:
+        slug, suffix = base, next_suffix.get(base, 2)
+        while slug in taken:
+            slug = f"{base}-{suffix}"
+            suffix += 1
+        next_suffix[base] = suffix
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def unique_slug(name, exclude_pk=None):
+    return allocate_slugs([name], exclude_pk)[0]
@@ -0,0 +1,139 @@
+"""
+In-memory ingredient substitute graph.
+
+``Ingredient.substitutes`` is loaded once per process into an adjacency map
+together with each ingredient's category and allergens, so substitute lookups
+and allergy-aware traversal never touch the database per row.
+"""
+
+import re
+from collections import deque, namedtuple
+from functools import lru_cache
+
+from africanmealplanner.caching import GenerationalSnapshot
+from .models import Ingredient
+
+IngredientNode = namedtuple(
+    'IngredientNode', ['id', 'name', 'category', 'allergens', 'is_active']
+)
+
+MAX_DEPTH = 4
+
+
+def normalize_allergens(allergens):
+    """Lower-cased, de-duplicated allergen names as a frozenset"""
+    return frozenset(a.strip().lower() for a in allergens if a and a.strip())
+
+
+@lru_cache(maxsize=8192)
+def allergen_tokens(name):
+    """Singular lower-case words of an allergen or ingredient name"""
+    return frozenset(
+        word[:-1] if len(word) > 3 and word.endswith('s') and not word.endswith('ss') else word
+        for word in re.findall(r'[a-z0-9]+', name.lower())
+    )
+
+
+def contains_allergen(ingredient_allergens, allergens):
+    """
+    True if any of ``allergens`` matches one of the ingredient's allergens:
+    the words of one are all among the words of the other, so "nuts"
+    matches "tree nuts" but not "coconut" or "nutmeg".
+    """
+    for allergen in allergens:
+        words = allergen_tokens(allergen)
+        if not words:
+            continue
+        for listed in ingredient_allergens:
+            listed_words = allergen_tokens(listed)
+            if listed_words and (words <= listed_words or listed_words <= words):
+                return True
+    return False
+
+
+class SubstituteGraph:
+    """Directed substitute graph over all ingredients"""
+
+    def __init__(self, nodes, edges):
+        self.nodes = nodes
+        adjacency = {}
+        for source, target in edges:
+            if source in nodes and target in nodes:
+                adjacency.setdefault(source, []).append(target)
+        # Match the Ingredient ordering the serializer used to render
+        self.adjacency = {
+            source: tuple(sorted(targets, key=lambda pk: (nodes[pk].category, nodes[pk].name)))
+            for source, targets in adjacency.items()
+        }
+        self._search = lru_cache(maxsize=8192)(self._bfs)
+
+    def direct_names(self, ingredient_id):
+        """Names of the direct substitutes of ``ingredient_id``"""
+        return [self.nodes[pk].name for pk in self.adjacency.get(ingredient_id, ())]
+
+    def is_safe(self, ingredient_id, allergens):
+        node = self.nodes.get(ingredient_id)
+        return node is not None and not contains_allergen(node.allergens, allergens)
+
+    def safe_substitutes(self, ingredient_id, allergens=(), max_depth=2):
+        """
+        Active substitutes reachable from ``ingredient_id`` within
+        ``max_depth`` hops that contain none of ``allergens``, best first:
+        nearer substitutes, then those in the same category.
+        """
+        max_depth = max(1, min(int(max_depth), MAX_DEPTH))
+        results = self._search(ingredient_id, normalize_allergens(allergens), max_depth)
+        # Copies, so callers cannot change the cached results
+        return [dict(result) for result in results]
+
+    def _bfs(self, ingredient_id, allergens, max_depth):
+        origin = self.nodes.get(ingredient_id)
+        if origin is None:
+            return ()
+
+        results = []
+        seen = {ingredient_id}
+        queue = deque([(ingredient_id, 0)])
+        while queue:
+            current, depth = queue.popleft()
+            if depth == max_depth:
+                continue
+            for pk in self.adjacency.get(current, ()):
+                if pk in seen:
+                    continue
+                seen.add(pk)
+                node = self.nodes[pk]
+                # Unsafe ingredients are still traversed: a substitute of a
+                # substitute may be safe even when the middle hop is not.
+                queue.append((pk, depth + 1))
+                if node.is_active and not contains_allergen(node.allergens, allergens):
+                    results.append({
+                        'id': node.id,
+                        'name': node.name,
+                        'category': node.category,
+                        'depth': depth + 1,
+                        'same_category': node.category == origin.category,
+                    })
+
+        results.sort(key=lambda r: (r['depth'], not r['same_category'], r['name']))
+        return tuple(results)
+
+
+def build_substitute_graph():
+    nodes = {
+        pk: IngredientNode(
+            pk, name, category,
+            tuple(str(a).strip().lower() for a in (allergens or [])),
+            is_active
+        )
+        for pk, name, category, allergens, is_active in Ingredient.objects.values_list(
+            'id', 'name', 'category', 'allergen_info', 'is_active'
+        )
+    }
+    edges = Ingredient.substitutes.through.objects.values_list(
+        'from_ingredient_id', 'to_ingredient_id'
+    )
+    return SubstituteGraph(nodes, edges)
+
+
+substitute_graph = GenerationalSnapshot('substitute-graph', build_substitute_graph)
@@ -0,0 +1,62 @@
+from django.test import SimpleTestCase
+from .quantities import COUNT, MASS, UNSPECIFIED, VOLUME, Quantity, parse_quantity
+from .scaling import display_quantity
+
+
+class ParseQuantityTests(SimpleTestCase):
+    """Every downstream module (nutrition, costs, scaling, shopping) reads these amounts"""
+
+    CASES = [
+        # text, (amount, unit, dimension, source unit) or None
+        ('2 cups', (473.176, 'ml', VOLUME, 'cup')),
+        ('500g', (500.0, 'g', MASS, 'g')),
+        ('1½ tbsp', (22.1802, 'ml', VOLUME, 'tbsp')),
+        ('1 1/2 kg', (1500.0, 'g', MASS, 'kg')),
+        ('2-3 cloves', (2.5, 'clove', COUNT, 'clove')),
+        ('a handful', (120.0, 'ml', VOLUME, 'handful')),
+        ('3 onions', (3.0, 'piece', COUNT, 'piece')),
+        ('2 T', (29.5736, 'ml', VOLUME, 'tbsp')),
+        ('2 t', (9.8578, 'ml', VOLUME, 'tsp')),
+        ('2T', (29.5736, 'ml', VOLUME, 'tbsp')),
+        ('10 T-bone steaks', (10.0, 'piece', COUNT, 'piece')),
+        ('2 Tomatoes', (2.0, 'piece', COUNT, 'piece')),
+        ('about 2 cups', (473.176, 'ml', VOLUME, 'cup')),
+        ('~500 g', (500.0, 'g', MASS, 'g')),
+        ('2 big cups', (473.176, 'ml', VOLUME, 'cup')),
+        ('2 heaped tbsp', (29.5736, 'ml', VOLUME, 'tbsp')),
+        ('1 large can', (1.0, 'can', COUNT, 'can')),
+        ('a level tsp', (4.9289, 'ml', VOLUME, 'tsp')),
+        ('half cup', (118.294, 'ml', VOLUME, 'cup')),
+        ('half a cup', (118.294, 'ml', VOLUME, 'cup')),
+        ('a half teaspoon', (2.4645, 'ml', VOLUME, 'tsp')),
+        ('half', (0.5, 'piece', COUNT, 'piece')),
+        ('to taste', (None, None, UNSPECIFIED, None)),
+        ('', None),
+        ('a bit of love', None),
+    ]
+
+    def test_table(self):
+        for text, expected in self.CASES:
+            with self.subTest(text=text):
+                quantity = parse_quantity(text)
+                if expected is None:
+                    self.assertIsNone(quantity)
+                    continue
+                amount, unit, dimension, source_unit = expected
+                self.assertEqual(
+                    (quantity.unit, quantity.dimension, quantity.source_unit),
+                    (unit, dimension, source_unit)
+                )
+                if amount is None:
+                    self.assertIsNone(quantity.amount)
+                else:
+                    self.assertAlmostEqual(quantity.amount, amount, places=3)
+
+
+class DisplayQuantityTests(SimpleTestCase):
+
+    def test_spoon_promotion_survives_rounding(self):
+        # 3 x 1 tsp and 4 x 1 tbsp as stored after scaling
+        self.assertEqual(display_quantity(Quantity(14.7867, 'ml', VOLUME, 'tsp')), '1 tbsp')
+        self.assertEqual(display_quantity(Quantity(59.1471, 'ml', VOLUME, 'tbsp')), '1/4 cup')
+        self.assertEqual(display_quantity(Quantity(9.8578, 'ml', VOLUME, 'tsp')), '2 tsp')
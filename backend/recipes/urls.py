@@ -8,6 +8,7 @@ urlpatterns = [
     path('regions/', views.RegionListView.as_view(), name='regions'),
     path('cuisines/', views.CuisineListView.as_view(), name='cuisines'),
     path('ingredients/', views.IngredientListView.as_view(), name='ingredients'),
+    path('ingredients/<int:ingredient_id>/substitutes/', views.ingredient_substitutes, name='ingredient_substitutes'),
     
     # Recipes
     path('', views.RecipeListView.as_view(), name='recipe_list'),
@@ -16,6 +17,7 @@ urlpatterns = [
     path('popular/', views.PopularRecipesView.as_view(), name='popular_recipes'),
     path('search/', views.search_recipes, name='search_recipes'),
     path('recommendations/', views.get_recommendations, name='get_recommendations'),
+    path('scale/', views.scale_recipes_batch, name='scale_recipes'),
     path('stats/', views.recipe_stats, name='recipe_stats'),
     
     # Recipe Details
@@ -31,6 +33,8 @@ urlpatterns = [
     path('<int:recipe_id>/save/', views.save_recipe, name='save_recipe'),
     path('<int:recipe_id>/favorite/', views.toggle_favorite, name='toggle_favorite'),
     path('<int:recipe_id>/update-interaction/', views.update_user_recipe, name='update_user_recipe'),
+    path('<int:recipe_id>/adapt/', views.adapt_recipe_for_user, name='adapt_recipe'),
+    path('<int:recipe_id>/scale/', views.scale_recipe_servings, name='scale_recipe'),
     
     # Recipe Collections
     path('collections/', views.RecipeCollectionListCreateView.as_view(), name='recipe_collections'),
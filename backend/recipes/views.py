@@ -6,16 +6,23 @@ from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import (
     Region, Cuisine, Ingredient, Recipe, RecipeRating,
-    UserRecipe, RecipeCollection, CookingTip
+    UserRecipe, RecipeCollection, CookingTip, RecipeDuplicate
 )
 from .serializers import (
     RegionSerializer, CuisineSerializer, IngredientSerializer,
     RecipeListSerializer, RecipeDetailSerializer, RecipeCreateUpdateSerializer,
     RecipeRatingSerializer, UserRecipeSerializer, UserRecipeUpdateSerializer,
     RecipeCollectionSerializer, CookingTipSerializer, RecipeSearchSerializer,
-    RecipeRecommendationSerializer
+    RecipeRecommendationSerializer, SubstituteQuerySerializer, ScaleQuerySerializer,
+    ScaleBatchSerializer, RecipeDuplicateSerializer
 )
+from .adaptation import adapt_recipe, adapt_recipes
+from .compatibility import exclude_incompatible_for_profile
+from .scaling import scale_recipe, scale_recipes
+from .regions import boost_local, regions_for_country
+from .seasonality import annotate_season_score, filter_in_season
 from .filters import RecipeFilter
+from .substitutes import substitute_graph
 import random
 
 
@@ -45,6 +52,33 @@ class IngredientListView(generics.ListAPIView):
     filterset_fields = ['category']
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def ingredient_substitutes(request, ingredient_id):
+    """Safe substitutes for an ingredient given a set of allergies"""
+    serializer = SubstituteQuerySerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    graph = substitute_graph.get()
+    if ingredient_id not in graph.nodes:
+        return Response({'error': 'Ingredient not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    # Default to the user's own allergies
+    if 'allergies' in data:
+        allergies = data['allergies'].split(',')
+    else:
+        allergies = request.user.profile.allergies.values_list('name', flat=True)
+    
+    substitutes = graph.safe_substitutes(ingredient_id, allergies, data['depth'])
+    return Response({
+        'ingredient': graph.nodes[ingredient_id].name,
+        'depth': data['depth'],
+        'substitutes': list(substitutes),
+    })
+
+
 class RecipeListView(generics.ListAPIView):
     """List recipes with filtering and search"""
     queryset = Recipe.objects.filter(is_published=True).select_related('cuisine__region')
@@ -53,8 +87,27 @@ class RecipeListView(generics.ListAPIView):
     filter_backends = [filters.SearchFilter, DjangoFilterBackend, filters.OrderingFilter]
     filterset_class = RecipeFilter
     search_fields = ['name', 'description', 'tags', 'ingredients']
-    ordering_fields = ['created_at', 'average_rating', 'total_time', 'difficulty']
+    ordering_fields = [
+        'created_at', 'average_rating', 'total_time', 'difficulty',
+        'calories_per_serving', 'protein_g', 'carbs_g', 'fat_g', 'fiber_g', 'sodium_mg',
+        'season_score',
+    ]
     ordering = ['-created_at']
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # Join season scores only when sorting by them
+        if 'season_score' in self.request.query_params.get('ordering', ''):
+            region = self.request.query_params.get('season_region', '')
+            queryset = annotate_season_score(queryset, region=int(region) if region.isdigit() else None)
+        return queryset
+    
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        # Local mode: recipes from the user's region first
+        if self.request.query_params.get('local', '').lower() in ('true', '1'):
+            queryset = boost_local(queryset, self.request.user.country)
+        return queryset
 
 
 class RecipeDetailView(generics.RetrieveAPIView):
@@ -65,6 +118,9 @@ class RecipeDetailView(generics.RetrieveAPIView):
     lookup_field = 'slug'
 
 
+MAX_DUPLICATES_SHOWN = 5
+
+
 class RecipeCreateView(generics.CreateAPIView):
     """Create a new recipe"""
     queryset = Recipe.objects.all()
@@ -73,6 +129,21 @@ class RecipeCreateView(generics.CreateAPIView):
     
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
+    
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        # Detected on save (see recipes.duplicates), so the author can reuse one
+        duplicates = RecipeDuplicate.objects.filter(
+            recipe=serializer.instance
+        ).select_related('other')[:MAX_DUPLICATES_SHOWN]
+        data = dict(
+            serializer.data,
+            slug=serializer.instance.slug,
+            possible_duplicates=RecipeDuplicateSerializer(duplicates, many=True).data,
+        )
+        return Response(data, status=status.HTTP_201_CREATED, headers=self.get_success_headers(data))
 
 
 class RecipeUpdateView(generics.UpdateAPIView):
@@ -168,8 +239,25 @@ def search_recipes(request):
         for ingredient in data['exclude_ingredients']:
             queryset = queryset.exclude(ingredients__icontains=ingredient)
     
-    # Order by relevance (rating and popularity)
-    queryset = queryset.order_by('-average_rating', '-total_ratings')
+    # Filter by the user's health conditions and dietary preferences
+    if data.get('compatible_only'):
+        queryset = exclude_incompatible_for_profile(queryset, request.user.profile)
+    
+    # Filter by nutrient ranges (indexed columns)
+    for param, field in RecipeSearchSerializer.NUTRIENT_RANGES.items():
+        if data.get(f'min_{param}') is not None:
+            queryset = queryset.filter(**{f'{field}__gte': data[f'min_{param}']})
+        if data.get(f'max_{param}') is not None:
+            queryset = queryset.filter(**{f'{field}__lte': data[f'max_{param}']})
+    
+    # Order by the requested nutrient, otherwise by relevance (rating and popularity)
+    if data.get('sort_by'):
+        sort_by = data['sort_by']
+        field = RecipeSearchSerializer.NUTRIENT_RANGES[sort_by.lstrip('-')]
+        queryset = queryset.filter(**{f'{field}__isnull': False})
+        queryset = queryset.order_by(f"{'-' if sort_by.startswith('-') else ''}{field}", '-average_rating')
+    else:
+        queryset = queryset.order_by('-average_rating', '-total_ratings')
     
     # Paginate results
     page = request.query_params.get('page', 1)
@@ -204,14 +292,16 @@ def get_recommendations(request):
     # Start with published recipes
     queryset = Recipe.objects.filter(is_published=True).select_related('cuisine__region')
     
-    # Filter by user's dietary preferences and allergies
+    # Filter by user's dietary preferences and allergies; allergen-bearing
+    # recipes stay in when the caller accepts allergy-safe rewrites
     user_allergies = [allergy.name.lower() for allergy in profile.allergies.all()]
-    for allergy in user_allergies:
-        queryset = queryset.exclude(allergen_warnings__icontains=allergy)
+    include_adapted = data.get('include_adapted') and user_allergies
+    if not include_adapted:
+        for allergy in user_allergies:
+            queryset = queryset.exclude(allergen_warnings__icontains=allergy)
     
-    user_dietary_prefs = [pref.name.lower() for pref in profile.dietary_preferences.all()]
-    for pref in user_dietary_prefs:
-        queryset = queryset.filter(dietary_labels__icontains=pref)
+    # Drop recipes that break the user's health conditions or dietary preferences
+    queryset = exclude_incompatible_for_profile(queryset, profile)
     
     # Filter by request parameters
     if data.get('meal_type'):
@@ -245,19 +335,126 @@ def get_recommendations(request):
     
     queryset = queryset.exclude(id__in=recently_cooked)
     
-    # Order by rating and randomize for variety
-    queryset = queryset.filter(average_rating__gte=3.0).order_by('-average_rating')
+    # Order by rating (in-season recipes first if asked) and randomize for variety
+    local = data.get('local')
+    ordering = ['-average_rating']
+    if data.get('in_season'):
+        # Seasonality for the user's own region in local mode
+        region = next(iter(regions_for_country(user.country)), None) if local else None
+        queryset = annotate_season_score(filter_in_season(queryset, region=region), region=region)
+        ordering.insert(0, '-season_score')
+    queryset = queryset.filter(average_rating__gte=3.0).order_by(*ordering)
+    
+    # Local mode: recipes from the user's region first
+    if local:
+        queryset = boost_local(queryset, user.country)
     
     # Get requested count
     count = data.get('count', 10)
     recipes = list(queryset[:count * 2])  # Get more than needed for randomization
     
+    # Rewrite allergen-bearing candidates in bulk, dropping unsafe ones
+    adaptations = {}
+    if include_adapted:
+        adaptations = adapt_recipes(recipes, user_allergies)
+        recipes = [recipe for recipe in recipes if adaptations[recipe.pk] is not None]
+    
     # Randomize and limit to requested count
     random.shuffle(recipes)
+    if local:
+        recipes.sort(key=lambda recipe: not recipe.is_local)
     recipes = recipes[:count]
     
-    serializer = RecipeListSerializer(recipes, many=True)
-    return Response(serializer.data)
+    results = RecipeListSerializer(recipes, many=True).data
+    for item in results:
+        adaptation = adaptations.get(item['id'])
+        if adaptation and 'allergen_warnings' in item:
+            item['allergen_warnings'] = adaptation.allergen_warnings
+        if adaptation and adaptation.substitutions:
+            item['adaptation'] = {
+                'confidence': adaptation.confidence,
+                'substitutions': adaptation.substitutions,
+            }
+    return Response(results)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def adapt_recipe_for_user(request, recipe_id):
+    """Recipe rewritten to avoid the current user's allergies"""
+    recipe = get_object_or_404(
+        Recipe.objects.select_related('cuisine__region'),
+        id=recipe_id,
+        is_published=True
+    )
+    allergies = list(request.user.profile.allergies.values_list('name', flat=True))
+    
+    adaptation = adapt_recipe(recipe, allergies)
+    if adaptation is None:
+        return Response(
+            {'error': 'No safe substitutes available for this recipe'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    
+    data = RecipeDetailSerializer(recipe).data
+    data['ingredients'] = adaptation.ingredients
+    data['allergen_warnings'] = adaptation.allergen_warnings
+    data['substitutions'] = adaptation.substitutions
+    data['confidence'] = adaptation.confidence
+    return Response(data)
+
+
+# Columns needed to scale a recipe
+SCALING_FIELDS = ('id', 'servings', 'ingredients', 'nutritional_info', 'calories_per_serving', 'updated_at')
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def scale_recipe_servings(request, recipe_id):
+    """Recipe ingredients and nutrition scaled to a number of servings"""
+    serializer = ScaleQuerySerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    recipe = get_object_or_404(
+        Recipe.objects.only(*SCALING_FIELDS),
+        id=recipe_id,
+        is_published=True
+    )
+    # Default to the user's household
+    servings = serializer.validated_data.get('servings') or request.user.family_size
+    return Response(scale_recipe(recipe, servings))
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def scale_recipes_batch(request):
+    """Scale several recipes at once, e.g. every recipe in a meal plan"""
+    serializer = ScaleBatchSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    items = serializer.validated_data['items']
+    recipes = Recipe.objects.filter(
+        id__in={item['recipe'] for item in items},
+        is_published=True
+    ).only(*SCALING_FIELDS).in_bulk()
+    
+    missing = sorted({item['recipe'] for item in items} - set(recipes))
+    if missing:
+        return Response(
+            {'error': 'Recipes not found', 'recipes': missing},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    requests = [
+        (recipes[item['recipe']], item.get('servings') or request.user.family_size)
+        for item in items
+    ]
+    scaled = scale_recipes(requests)
+    return Response({
+        'results': [scaled[(recipe.pk, servings)] for recipe, servings in requests]
+    })
 
 
 class RecipeRatingListCreateView(generics.ListCreateAPIView):
@@ -0,0 +1 @@
+# Shopping app for shopping lists built from meal plans
\ No newline at end of file
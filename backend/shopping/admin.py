@@ -0,0 +1,27 @@
+from django.contrib import admin
+from .models import ShoppingList, ShoppingListItem, PantryItem
+
+
+class ShoppingListItemInline(admin.TabularInline):
+    model = ShoppingListItem
+    extra = 0
+    fields = ['name', 'category', 'amount', 'unit', 'is_checked', 'is_manual']
+    readonly_fields = ['amount', 'unit']
+
+
+@admin.register(ShoppingList)
+class ShoppingListAdmin(admin.ModelAdmin):
+    list_display = ['user', 'name', 'start_date', 'end_date', 'status', 'created_at']
+    list_filter = ['status', 'start_date']
+    search_fields = ['user__username', 'user__email', 'name']
+    raw_id_fields = ['user', 'meal_plan']
+    readonly_fields = ['created_at', 'updated_at']
+    inlines = [ShoppingListItemInline]
+
+
+@admin.register(PantryItem)
+class PantryItemAdmin(admin.ModelAdmin):
+    list_display = ['user', 'ingredient', 'amount', 'unit', 'expires_on', 'updated_at']
+    list_filter = ['unit', 'expires_on']
+    search_fields = ['user__username', 'ingredient__name']
+    raw_id_fields = ['user', 'ingredient']
@@ -0,0 +1,285 @@
+"""
+Shopping list aggregation.
+
+A list's sources are the planned meals in its date range (``meal:<id>``)
+and, optionally, the recipes its owner marked as planned
+(``recipe:<user recipe id>``). Source recipes are fetched in one query;
+every ingredient entry is scaled to the source's servings, normalized to a
+canonical unit and merged in memory under a key of ingredient (or
+normalized name) and unit. Items remember what each source contributed, so
+when one meal changes only that source's share is replaced.
+"""
+
+from collections import namedtuple
+
+from django.db import transaction
+from django.utils import timezone
+from recipes.linking import normalize_name
+from recipes.models import Ingredient, Recipe, UserRecipe
+from recipes.pricing import price_region, price_table, unit_price
+from recipes.quantities import (
+    MASS, VOLUME, UNSPECIFIED, Quantity, density_table, parse_quantity, quantity_from_dict, to_grams
+)
+from recipes.scaling import display_quantity
+from meal_planning.models import PlannedMeal
+from .models import ShoppingList, ShoppingListItem
+
+Line = namedtuple('Line', ['key', 'ingredient_id', 'name', 'category', 'dimension', 'unit', 'amount'])
+ListCost = namedtuple('ListCost', ['items', 'total', 'unpriced'])
+
+# Store walk order for grouping items by Ingredient.category
+AISLE_ORDER = (
+    'vegetables', 'fruits', 'meat', 'fish', 'dairy', 'grains',
+    'legumes', 'nuts', 'spices', 'oils', 'other',
+)
+AISLE_LABELS = dict(Ingredient._meta.get_field('category').choices)
+# Bought by volume, so volumes are not converted to grams
+LIQUID_CATEGORIES = frozenset(['oils', 'dairy', 'other'])
+
+CREATE_BATCH_SIZE = 500
+
+
+def meal_source(meal_id):
+    return f"meal:{meal_id}"
+
+
+def recipe_source(user_recipe_id):
+    return f"recipe:{user_recipe_id}"
+
+
+def entry_line(entry, factor, ingredients, densities):
+    """Normalized ``Line`` for one recipe ingredient entry scaled by ``factor``"""
+    ingredient_id = entry.get('ingredient_id')
+    name, category = ingredients.get(ingredient_id, (None, 'other'))
+    if name is None:
+        ingredient_id = None
+        name = str(entry.get('name', '')).strip()
+        if not name:
+            return None
+    identity = str(ingredient_id) if ingredient_id else f"name:{normalize_name(name)}"
+
+    quantity = quantity_from_dict(entry.get('parsed_quantity'))
+    if quantity is None:
+        quantity = parse_quantity(entry.get('quantity', ''))
+    if quantity is None or quantity.amount is None:
+        # "To taste" or unreadable: listed once, without an amount
+        return Line(f"{identity}|", ingredient_id, name, category, UNSPECIFIED, '', None)
+
+    dimension, unit, amount = quantity.dimension, quantity.unit, quantity.amount
+    if dimension == VOLUME and ingredient_id and category not in LIQUID_CATEGORIES:
+        dimension, unit, amount = MASS, 'g', to_grams(quantity, ingredient_id, densities)
+    return Line(f"{identity}|{unit}", ingredient_id, name, category, dimension, unit, amount * factor)
+
+
+def source_lines(sources):
+    """
+    ``{source: [Line, ...]}`` for ``(source, recipe id, servings)`` triples,
+    with one query for the recipes and one for their linked ingredients.
+    """
+    recipes = Recipe.objects.filter(
+        pk__in={recipe_id for _, recipe_id, _ in sources}
+    ).only('id', 'servings', 'ingredients').in_bulk()
+    linked = {
+        entry.get('ingredient_id')
+        for recipe in recipes.values()
+        for entry in recipe.ingredients or []
+        if isinstance(entry, dict) and entry.get('ingredient_id')
+    }
+    ingredients = {
+        pk: (name, category)
+        for pk, name, category in Ingredient.objects.filter(pk__in=linked).values_list('id', 'name', 'category')
+    } if linked else {}
+    densities = density_table.get()
+
+    lines = {}
+    for source, recipe_id, servings in sources:
+        recipe = recipes.get(recipe_id)
+        if recipe is None:
+            lines[source] = []
+            continue
+        factor = servings / (recipe.servings or 1)
+        lines[source] = [
+            line for line in (
+                entry_line(entry, factor, ingredients, densities)
+                for entry in recipe.ingredients or [] if isinstance(entry, dict)
+            ) if line is not None
+        ]
+    return lines
+
+
+def list_sources(shopping_list):
+    """Every ``(source, recipe id, servings)`` feeding ``shopping_list``"""
+    family_size = shopping_list.user.family_size or 1
+    meals = PlannedMeal.objects.filter(
+        meal_plan__user_id=shopping_list.user_id,
+        date__range=(shopping_list.start_date, shopping_list.end_date)
+    ).exclude(meal_plan__status='archived')
+    if shopping_list.meal_plan_id:
+        meals = meals.filter(meal_plan_id=shopping_list.meal_plan_id)
+    sources = [
+        (meal_source(pk), recipe_id, servings or family_size)
+        for pk, recipe_id, servings in meals.values_list('id', 'recipe_id', 'servings')
+    ]
+    if shopping_list.include_planned_recipes:
+        sources.extend(
+            (recipe_source(pk), recipe_id, family_size)
+            for pk, recipe_id in UserRecipe.objects.filter(
+                user_id=shopping_list.user_id, status='planned'
+            ).values_list('id', 'recipe_id')
+        )
+    return sources
+
+
+def _total(contributions):
+    amounts = [amount for amount in contributions.values() if amount is not None]
+    return round(sum(amounts), 4) if amounts else None
+
+
+def apply_lines(shopping_list, lines, replace_all=False):
+    """
+    Replace the contributions of the sources in ``lines`` (of every source
+    when ``replace_all``) and sync the items: one read, then bulk create,
+    update and delete. Checked state and manual items are kept.
+    """
+    items = {item.key: item for item in shopping_list.items.all()}
+    changed = set()
+    for item in items.values():
+        if item.is_manual:
+            continue
+        stale = list(item.contributions) if replace_all else [s for s in item.contributions if s in lines]
+        for source in stale:
+            del item.contributions[source]
+            changed.add(item.key)
+
+    created = {}
+    for source, entries in lines.items():
+        for line in entries:
+            item = items.get(line.key) or created.get(line.key)
+            if item is None:
+                item = created[line.key] = ShoppingListItem(
+                    shopping_list=shopping_list,
+                    ingredient_id=line.ingredient_id,
+                    key=line.key,
+                    name=line.name,
+                    category=line.category,
+                    dimension=line.dimension,
+                    unit=line.unit,
+                    contributions={},
+                )
+            previous = item.contributions.get(source)
+            if line.amount is not None:
+                item.contributions[source] = round((previous or 0) + line.amount, 4)
+            else:
+                item.contributions.setdefault(source, None)
+            changed.add(line.key)
+
+    updated, removed = [], []
+    for key in changed:
+        item = created.get(key) or items[key]
+        item.amount = _total(item.contributions)
+        if key in items:
+            if item.contributions or item.is_manual:
+                updated.append(item)
+            else:
+                removed.append(item.pk)
+
+    with transaction.atomic():
+        ShoppingListItem.objects.bulk_create(created.values(), batch_size=CREATE_BATCH_SIZE)
+        ShoppingListItem.objects.bulk_update(updated, ['contributions', 'amount'], batch_size=CREATE_BATCH_SIZE)
+        if removed:
+            ShoppingListItem.objects.filter(pk__in=removed).delete()
+        ShoppingList.objects.filter(pk=shopping_list.pk).update(updated_at=timezone.now())
+    return len(created), len(updated), len(removed)
+
+
+def rebuild_shopping_list(shopping_list):
+    """Recompute every generated item of ``shopping_list`` from its sources"""
+    return apply_lines(shopping_list, source_lines(list_sources(shopping_list)), replace_all=True)
+
+
+def generate_shopping_list(user, start_date, end_date, meal_plan=None,
+                           include_planned_recipes=True, name='', budget=None):
+    """Create a shopping list for a date range and fill it from the user's meals"""
+    shopping_list = ShoppingList.objects.create(
+        user=user,
+        name=name or f"Shopping {start_date:%b %d} - {end_date:%b %d}",
+        meal_plan=meal_plan,
+        start_date=start_date,
+        end_date=end_date,
+        include_planned_recipes=include_planned_recipes,
+        budget=budget,
+    )
+    rebuild_shopping_list(shopping_list)
+    return shopping_list
+
+
+def refresh_source(user_id, source, recipe_id=None, servings=None, date=None, meal_plan_id=None):
+    """
+    Incrementally update the user's active lists after one source changed.
+
+    Lists covering ``date`` (every list for planned recipes) get the
+    source's new lines; the others drop whatever it contributed before.
+    ``recipe_id`` None removes the source everywhere.
+    """
+    lists = list(ShoppingList.objects.filter(user_id=user_id, status='active').select_related('user'))
+    if not lists:
+        return
+    lines = None
+    for shopping_list in lists:
+        if recipe_id is None:
+            covered = False
+        elif date is None:
+            covered = shopping_list.include_planned_recipes
+        else:
+            covered = (
+                shopping_list.start_date <= date <= shopping_list.end_date
+                and shopping_list.meal_plan_id in (None, meal_plan_id)
+            )
+        if covered and lines is None:
+            family_size = shopping_list.user.family_size or 1
+            lines = source_lines([(source, recipe_id, servings or family_size)])[source]
+        apply_lines(shopping_list, {source: lines if covered else []})
+
+
+def group_by_aisle(items):
+    """Items grouped by ingredient category in ``AISLE_ORDER``"""
+    groups = {}
+    for item in items:
+        groups.setdefault(item.category if item.category in AISLE_LABELS else 'other', []).append(item)
+    return [
+        {'category': category, 'label': AISLE_LABELS[category], 'items': groups[category]}
+        for category in AISLE_ORDER if category in groups
+    ]
+
+
+def estimate_costs(shopping_list, amounts=None):
+    """
+    ``ListCost`` of a list's items at the prices of its owner's region:
+    ``{item id: cost or None}``, the total of the priced items and the
+    number of measured items without a price. ``amounts`` optionally
+    overrides item amounts (e.g. what is left to buy after the pantry).
+    """
+    region_id = price_region(shopping_list.user.country)
+    table = price_table.get()
+    densities = density_table.get()
+    costs, total, unpriced = {}, 0.0, 0
+    for item in shopping_list.items.all():
+        amount = item.amount if amounts is None else amounts.get(item.pk, item.amount)
+        if amount is None:
+            costs[item.pk] = None
+            continue
+        price = unit_price(item.ingredient_id, item.dimension, item.unit, region_id, table, densities)
+        if price is None:
+            costs[item.pk] = None
+            unpriced += 1
+            continue
+        costs[item.pk] = round(amount * price, 2)
+        total += amount * price
+    return ListCost(costs, round(total, 2), unpriced)
+
+
+def item_quantity(item):
+    """Display text for an item's merged amount"""
+    if item.amount is None:
+        return 'as needed' if item.dimension == UNSPECIFIED else item.notes
+    return display_quantity(Quantity(item.amount, item.unit, item.dimension, item.unit))
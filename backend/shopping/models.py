@@ -0,0 +1,114 @@
+from django.db import models
+from django.contrib.auth import get_user_model
+from recipes.models import Ingredient
+from meal_planning.models import MealPlan
+
+User = get_user_model()
+
+
+class ShoppingList(models.Model):
+    """Ingredients to buy for a date range of planned meals"""
+    STATUS_CHOICES = [
+        ('active', 'Active'),
+        ('completed', 'Completed'),
+        ('archived', 'Archived'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='shopping_lists')
+    name = models.CharField(max_length=200, blank=True)
+    meal_plan = models.ForeignKey(
+        MealPlan,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='shopping_lists'
+    )
+    start_date = models.DateField()
+    end_date = models.DateField()
+    include_planned_recipes = models.BooleanField(
+        default=True,
+        help_text="Also add recipes the user marked as planned"
+    )
+    budget = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Spending limit for the whole list (settings.PRICE_CURRENCY)"
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'shopping_lists'
+        ordering = ['-start_date', '-created_at']
+        indexes = [
+            models.Index(fields=['user', 'status', 'start_date', 'end_date']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.start_date} to {self.end_date}"
+
+
+class ShoppingListItem(models.Model):
+    """One ingredient line, merged from every meal that needs it"""
+    shopping_list = models.ForeignKey(ShoppingList, on_delete=models.CASCADE, related_name='items')
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='shopping_list_items'
+    )
+    key = models.CharField(
+        max_length=255,
+        help_text="Merge key: ingredient (or normalized name) and canonical unit"
+    )
+    name = models.CharField(max_length=200)
+    category = models.CharField(max_length=50, default='other')
+    
+    # Canonical quantity (g, ml or a count unit); null when only "to taste"
+    dimension = models.CharField(max_length=20, blank=True)
+    unit = models.CharField(max_length=20, blank=True)
+    amount = models.FloatField(null=True, blank=True)
+    contributions = models.JSONField(
+        default=dict,
+        help_text="Amount per source, e.g. {\"meal:12\": 250.0, \"recipe:7\": 100.0}"
+    )
+    
+    is_checked = models.BooleanField(default=False)
+    is_manual = models.BooleanField(default=False)
+    notes = models.CharField(max_length=255, blank=True)
+    
+    class Meta:
+        db_table = 'shopping_list_items'
+        ordering = ['category', 'name']
+        unique_together = ['shopping_list', 'key']
+    
+    def __str__(self):
+        return f"{self.name} ({self.shopping_list_id})"
+
+
+class PantryItem(models.Model):
+    """Stock of an ingredient a user already has at home"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='pantry_items')
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='pantry_items')
+    
+    # Canonical quantity, in the same units shopping list items use
+    dimension = models.CharField(max_length=20)
+    unit = models.CharField(max_length=20)
+    amount = models.FloatField(default=0)
+    expires_on = models.DateField(null=True, blank=True, db_index=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'pantry_items'
+        ordering = ['ingredient__name']
+        unique_together = ['user', 'ingredient']
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.ingredient.name}"
@@ -0,0 +1,141 @@
+"""
+Pantry stock and its diff against shopping lists.
+
+Stock is kept per ingredient in the same canonical units as shopping list
+items (see ``aggregation.entry_line``). Diffs walk two ingredient-sorted
+vectors, the list's linked items and the unexpired stock, in a single
+merge pass; amounts in different units are compared through grams using
+the ingredient density and piece weight.
+"""
+
+from collections import namedtuple
+
+from django.utils import timezone
+from recipes.quantities import UNSPECIFIED, convert_amount, density_table
+from .aggregation import entry_line, source_lines
+from .models import PantryItem
+
+Stock = namedtuple('Stock', ['ingredient_id', 'dimension', 'unit', 'amount'])
+Need = namedtuple('Need', ['in_pantry', 'to_buy'])
+
+
+def normalize_stock(ingredient, text):
+    """Canonical ``Stock`` for a quantity such as "2 kg" or "3 cups" (None if unreadable)"""
+    line = entry_line(
+        {'ingredient_id': ingredient.pk, 'name': ingredient.name, 'quantity': text},
+        1,
+        {ingredient.pk: (ingredient.name, ingredient.category)},
+        density_table.get()
+    )
+    if line is None or line.amount is None or line.dimension == UNSPECIFIED:
+        return None
+    return Stock(ingredient.pk, line.dimension, line.unit, line.amount)
+
+
+def stock_vector(user, today=None):
+    """Unexpired stock sorted by ingredient id"""
+    today = today or timezone.localdate()
+    rows = PantryItem.objects.filter(user=user, amount__gt=0).exclude(
+        expires_on__lt=today
+    ).order_by('ingredient_id').values_list('ingredient_id', 'dimension', 'unit', 'amount')
+    return [Stock(*row) for row in rows]
+
+
+def diff(needs, stock, densities):
+    """
+    Merge two ingredient-sorted vectors: ``needs`` as ``(key, Stock)`` pairs
+    and ``stock``. Returns ``{key: Need}``; several needs for one ingredient
+    (in different units) draw on the same stock in order.
+    """
+    result = {}
+    position = 0
+    remaining = None
+    for key, need in needs:
+        while position < len(stock) and stock[position].ingredient_id < need.ingredient_id:
+            position += 1
+            remaining = None
+        if position == len(stock) or stock[position].ingredient_id != need.ingredient_id:
+            result[key] = Need(0.0, need.amount)
+            continue
+
+        have = stock[position]
+        if remaining is None:
+            remaining = have.amount
+        available = convert_amount(
+            need.ingredient_id, remaining, (have.dimension, have.unit),
+            (need.dimension, need.unit), densities
+        )
+        if available is None:
+            result[key] = Need(0.0, need.amount)
+            continue
+        used = min(available, need.amount)
+        result[key] = Need(round(used, 4), round(need.amount - used, 4))
+        remaining -= convert_amount(
+            need.ingredient_id, used, (need.dimension, need.unit),
+            (have.dimension, have.unit), densities
+        )
+    return result
+
+
+def diff_shopping_list(shopping_list, today=None):
+    """``{item id: Need}`` for the items of ``shopping_list`` after pantry stock"""
+    items = shopping_list.items.all()
+    needs = sorted(
+        (
+            (item.pk, Stock(item.ingredient_id, item.dimension, item.unit, item.amount))
+            for item in items if item.ingredient_id and item.amount is not None
+        ),
+        key=lambda pair: (pair[1].ingredient_id, pair[0])
+    )
+    result = diff(needs, stock_vector(shopping_list.user_id, today), density_table.get())
+    for item in items:
+        result.setdefault(item.pk, Need(0.0, item.amount))
+    return result
+
+
+def add_stock(user, ingredient, stock, expires_on=None):
+    """Add ``stock`` to the user's pantry, converting into the unit already tracked"""
+    item = PantryItem.objects.filter(user=user, ingredient=ingredient).first()
+    if item is None:
+        return PantryItem.objects.create(
+            user=user, ingredient=ingredient, dimension=stock.dimension,
+            unit=stock.unit, amount=stock.amount, expires_on=expires_on
+        )
+    amount = convert_amount(
+        ingredient.pk, stock.amount, (stock.dimension, stock.unit),
+        (item.dimension, item.unit), density_table.get()
+    )
+    if amount is None:
+        raise ValueError(f"{ingredient.name} is tracked in {item.unit}")
+    item.amount += amount
+    if expires_on:
+        item.expires_on = expires_on
+    item.save(update_fields=['amount', 'expires_on', 'updated_at'])
+    return item
+
+
+def consume_recipe(user_id, recipe_id, servings):
+    """
+    Take what a cooked recipe used out of the user's pantry: one read and
+    one bulk update. Returns the number of pantry items changed.
+    """
+    lines = source_lines([('cooked', recipe_id, servings)])['cooked']
+    used = {}
+    for line in lines:
+        if line.ingredient_id and line.amount is not None:
+            used.setdefault(line.ingredient_id, []).append(line)
+    if not used:
+        return 0
+
+    densities = density_table.get()
+    items = list(PantryItem.objects.filter(user_id=user_id, ingredient_id__in=used, amount__gt=0))
+    for item in items:
+        for line in used[item.ingredient_id]:
+            amount = convert_amount(
+                item.ingredient_id, line.amount, (line.dimension, line.unit),
+                (item.dimension, item.unit), densities
+            )
+            if amount is not None:
+                item.amount = round(max(item.amount - amount, 0.0), 4)
+    PantryItem.objects.bulk_update(items, ['amount'])
+    return len(items)
@@ -0,0 +1,192 @@
+import datetime
+from decimal import Decimal
+
+from rest_framework import serializers
+from recipes.linking import normalize_name
+from meal_planning.models import MealPlan
+from django.conf import settings
+from .aggregation import AISLE_LABELS, estimate_costs, group_by_aisle, item_quantity
+from django.utils import timezone
+from .models import ShoppingList, ShoppingListItem, PantryItem
+from .pantry import add_stock, normalize_stock
+
+MAX_LIST_DAYS = 31
+
+
+def cost_summary(costs, budget):
+    """Estimated total of a ``ListCost`` against an optional budget"""
+    return {
+        'total': costs.total,
+        'currency': settings.PRICE_CURRENCY,
+        'unpriced_items': costs.unpriced,
+        'budget': None if budget is None else float(budget),
+        'over_budget': None if budget is None else costs.total > float(budget),
+    }
+
+
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    quantity = serializers.SerializerMethodField()
+    sources = serializers.SerializerMethodField()
+    estimated_cost = serializers.SerializerMethodField()
+    category = serializers.ChoiceField(choices=list(AISLE_LABELS.items()), default='other')
+    
+    class Meta:
+        model = ShoppingListItem
+        fields = [
+            'id', 'ingredient', 'name', 'category', 'quantity', 'amount', 'unit',
+            'is_checked', 'is_manual', 'notes', 'sources', 'estimated_cost'
+        ]
+        read_only_fields = ['ingredient', 'amount', 'unit', 'is_manual']
+    
+    def get_quantity(self, obj):
+        return item_quantity(obj)
+    
+    def get_sources(self, obj):
+        return len(obj.contributions)
+    
+    def get_estimated_cost(self, obj):
+        # Priced per list by the parent serializer
+        return self.context.get('costs', {}).get(obj.pk)
+    
+    def validate_name(self, value):
+        if self.instance is not None and not self.instance.is_manual and value != self.instance.name:
+            raise serializers.ValidationError("Only manually added items can be renamed")
+        return value
+    
+    def create(self, validated_data):
+        validated_data['key'] = f"manual:{normalize_name(validated_data['name'])}"
+        validated_data['is_manual'] = True
+        return super().create(validated_data)
+
+
+class ShoppingListListSerializer(serializers.ModelSerializer):
+    """Serializer for shopping list list view"""
+    item_count = serializers.IntegerField(read_only=True)
+    checked_count = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = ShoppingList
+        fields = [
+            'id', 'name', 'meal_plan', 'start_date', 'end_date', 'status', 'budget',
+            'item_count', 'checked_count', 'created_at', 'updated_at'
+        ]
+
+
+class ShoppingListSerializer(serializers.ModelSerializer):
+    """Serializer for a shopping list with its items grouped by aisle"""
+    aisles = serializers.SerializerMethodField()
+    estimated_cost = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ShoppingList
+        fields = [
+            'id', 'name', 'meal_plan', 'start_date', 'end_date',
+            'include_planned_recipes', 'status', 'budget', 'estimated_cost',
+            'aisles', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['meal_plan', 'start_date', 'end_date', 'include_planned_recipes']
+    
+    def to_representation(self, instance):
+        self._costs = estimate_costs(instance)
+        return super().to_representation(instance)
+    
+    def get_aisles(self, obj):
+        return [
+            dict(group, items=ShoppingListItemSerializer(
+                group['items'], many=True, context={'costs': self._costs.items}
+            ).data)
+            for group in group_by_aisle(obj.items.all())
+        ]
+    
+    def get_estimated_cost(self, obj):
+        return cost_summary(self._costs, obj.budget)
+
+
+class GenerateShoppingListSerializer(serializers.Serializer):
+    """Serializer for shopping list generation parameters"""
+    meal_plan = serializers.IntegerField(required=False)
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    include_planned_recipes = serializers.BooleanField(default=True)
+    name = serializers.CharField(max_length=200, required=False, allow_blank=True)
+    budget = serializers.DecimalField(
+        max_digits=10, decimal_places=2, required=False, min_value=Decimal('0'),
+        help_text="Defaults to the meal plan's daily budget for the household and range"
+    )
+    
+    def validate(self, attrs):
+        meal_plan_id = attrs.pop('meal_plan', None)
+        if meal_plan_id is not None:
+            user = self.context['request'].user
+            meal_plan = MealPlan.objects.filter(pk=meal_plan_id, user=user).first()
+            if meal_plan is None:
+                raise serializers.ValidationError({'meal_plan': "Meal plan not found"})
+            attrs['meal_plan'] = meal_plan
+            attrs.setdefault('start_date', meal_plan.start_date)
+            attrs.setdefault('end_date', meal_plan.end_date)
+        
+        if 'start_date' not in attrs:
+            raise serializers.ValidationError("Provide a meal plan or a start date")
+        attrs.setdefault('end_date', attrs['start_date'] + datetime.timedelta(days=6))
+        if attrs['end_date'] < attrs['start_date']:
+            raise serializers.ValidationError({'end_date': "End date must not be before the start date"})
+        if (attrs['end_date'] - attrs['start_date']).days >= MAX_LIST_DAYS:
+            raise serializers.ValidationError(f"A shopping list covers at most {MAX_LIST_DAYS} days")
+        
+        meal_plan = attrs.get('meal_plan')
+        if 'budget' not in attrs and meal_plan is not None and meal_plan.daily_budget:
+            days = (attrs['end_date'] - attrs['start_date']).days + 1
+            household = self.context['request'].user.family_size or 1
+            attrs['budget'] = meal_plan.daily_budget * days * household
+        return attrs
+
+
+class PantryItemSerializer(serializers.ModelSerializer):
+    ingredient_name = serializers.CharField(source='ingredient.name', read_only=True)
+    category = serializers.CharField(source='ingredient.category', read_only=True)
+    quantity = serializers.CharField(write_only=True, help_text='e.g. "2 kg" or "3 cups"')
+    stock = serializers.SerializerMethodField()
+    is_expired = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = PantryItem
+        fields = [
+            'id', 'ingredient', 'ingredient_name', 'category', 'quantity', 'stock',
+            'amount', 'unit', 'expires_on', 'is_expired', 'updated_at'
+        ]
+        read_only_fields = ['amount', 'unit']
+    
+    def get_stock(self, obj):
+        return item_quantity(obj)
+    
+    def get_is_expired(self, obj):
+        return bool(obj.expires_on and obj.expires_on < timezone.localdate())
+    
+    def validate(self, attrs):
+        ingredient = attrs.get('ingredient') or getattr(self.instance, 'ingredient', None)
+        if self.instance is not None and attrs.get('ingredient', ingredient) != self.instance.ingredient:
+            raise serializers.ValidationError({'ingredient': "Ingredient cannot be changed"})
+        if 'quantity' in attrs:
+            stock = normalize_stock(ingredient, attrs.pop('quantity'))
+            if stock is None:
+                raise serializers.ValidationError({'quantity': "Could not understand this quantity"})
+            attrs['stock'] = stock
+        return attrs
+    
+    def create(self, validated_data):
+        # Adding an ingredient already in the pantry tops up its stock
+        try:
+            return add_stock(
+                self.context['request'].user,
+                validated_data['ingredient'],
+                validated_data['stock'],
+                validated_data.get('expires_on')
+            )
+        except ValueError as exc:
+            raise serializers.ValidationError({'quantity': str(exc)})
+    
+    def update(self, instance, validated_data):
+        stock = validated_data.pop('stock', None)
+        if stock is not None:
+            instance.dimension, instance.unit, instance.amount = stock.dimension, stock.unit, stock.amount
+        return super().update(instance, validated_data)
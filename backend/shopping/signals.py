@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from recipes.models import UserRecipe
+from recipes.signals import recipe_cooked
+from meal_planning.models import MealPlan, PlannedMeal
+from .aggregation import meal_source, rebuild_shopping_list, recipe_source, refresh_source
+from .models import ShoppingList
+from .pantry import consume_recipe
+
+
+@receiver(post_save, sender=PlannedMeal)
+@receiver(post_delete, sender=PlannedMeal)
+def refresh_lists_for_meal(sender, instance, signal, origin=None, **kwargs):
+    """Replace one meal's share of the user's active shopping lists"""
+    deleted = signal is post_delete
+    if deleted and origin is not instance and getattr(origin, 'model', None) is not PlannedMeal:
+        # Removed along with its plan (or user); handled by refresh_lists_for_plan
+        return
+    user_id = instance.meal_plan.user_id
+    source = meal_source(instance.pk)
+    recipe_id = None if deleted else instance.recipe_id
+    servings, date, meal_plan_id = instance.servings, instance.date, instance.meal_plan_id
+    transaction.on_commit(lambda: refresh_source(
+        user_id, source, recipe_id, servings, date=date, meal_plan_id=meal_plan_id
+    ))
+
+
+@receiver(post_save, sender=MealPlan)
+@receiver(post_delete, sender=MealPlan)
+def refresh_lists_for_plan(sender, instance, **kwargs):
+    """Rebuild active lists overlapping a plan that was replaced, archived or deleted"""
+    user_id, start_date, end_date = instance.user_id, instance.start_date, instance.end_date
+    
+    def rebuild():
+        for shopping_list in ShoppingList.objects.filter(
+            user_id=user_id, status='active', start_date__lte=end_date, end_date__gte=start_date
+        ).select_related('user'):
+            rebuild_shopping_list(shopping_list)
+    
+    transaction.on_commit(rebuild)
+
+
+@receiver(post_save, sender=UserRecipe)
+@receiver(post_delete, sender=UserRecipe)
+def refresh_lists_for_planned_recipe(sender, instance, signal, **kwargs):
+    """Add or drop a recipe the user (un)marked as planned"""
+    planned = signal is post_save and instance.status == 'planned'
+    user_id, source = instance.user_id, recipe_source(instance.pk)
+    recipe_id = instance.recipe_id if planned else None
+    transaction.on_commit(lambda: refresh_source(user_id, source, recipe_id))
+
+
+@receiver(recipe_cooked)
+def consume_pantry_stock(sender, user_recipe, servings, **kwargs):
+    """Take what a completed cooking session used out of the pantry"""
+    user_id, recipe_id = user_recipe.user_id, user_recipe.recipe_id
+    transaction.on_commit(lambda: consume_recipe(user_id, recipe_id, servings))
@@ -0,0 +1,21 @@
+from django.urls import path
+from . import views
+
+app_name = 'shopping'
+
+urlpatterns = [
+    # Shopping Lists
+    path('lists/', views.ShoppingListListView.as_view(), name='shopping_lists'),
+    path('lists/create/', views.create_shopping_list, name='create_shopping_list'),
+    path('lists/<int:pk>/', views.ShoppingListDetailView.as_view(), name='shopping_list_detail'),
+    path('lists/<int:pk>/refresh/', views.refresh_shopping_list, name='refresh_shopping_list'),
+    path('lists/<int:pk>/to-buy/', views.shopping_list_to_buy, name='shopping_list_to_buy'),
+    
+    # Items
+    path('lists/<int:list_id>/items/', views.ShoppingListItemCreateView.as_view(), name='add_shopping_list_item'),
+    path('items/<int:pk>/', views.ShoppingListItemDetailView.as_view(), name='shopping_list_item_detail'),
+    
+    # Pantry
+    path('pantry/', views.PantryItemListCreateView.as_view(), name='pantry'),
+    path('pantry/<int:pk>/', views.PantryItemDetailView.as_view(), name='pantry_item_detail'),
+]
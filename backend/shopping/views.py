@@ -0,0 +1,141 @@
+from rest_framework import generics, status, permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from django.db.models import Count, Q, Prefetch
+from django.shortcuts import get_object_or_404
+from .aggregation import (
+    estimate_costs, generate_shopping_list, group_by_aisle, item_quantity, rebuild_shopping_list
+)
+from .models import ShoppingList, ShoppingListItem, PantryItem
+from .pantry import diff_shopping_list
+from .serializers import (
+    ShoppingListSerializer, ShoppingListListSerializer, ShoppingListItemSerializer,
+    GenerateShoppingListSerializer, PantryItemSerializer, cost_summary
+)
+
+
+def _lists(user):
+    return ShoppingList.objects.filter(user=user).select_related('user').prefetch_related(
+        Prefetch('items', queryset=ShoppingListItem.objects.order_by('name'))
+    )
+
+
+class ShoppingListListView(generics.ListAPIView):
+    """List the user's shopping lists"""
+    serializer_class = ShoppingListListSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        queryset = ShoppingList.objects.filter(user=self.request.user).annotate(
+            item_count=Count('items'),
+            checked_count=Count('items', filter=Q(items__is_checked=True))
+        ).order_by('-start_date', '-created_at')
+        
+        # Filter by status
+        list_status = self.request.query_params.get('status')
+        if list_status:
+            queryset = queryset.filter(status=list_status)
+        return queryset
+
+
+class ShoppingListDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """Get, rename/complete, or delete a shopping list"""
+    serializer_class = ShoppingListSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return _lists(self.request.user)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def create_shopping_list(request):
+    """Build a shopping list from planned meals in a date range"""
+    serializer = GenerateShoppingListSerializer(data=request.data, context={'request': request})
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    shopping_list = generate_shopping_list(request.user, **serializer.validated_data)
+    return Response(
+        ShoppingListSerializer(_lists(request.user).get(pk=shopping_list.pk)).data,
+        status=status.HTTP_201_CREATED
+    )
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def refresh_shopping_list(request, pk):
+    """Recompute a shopping list from its meals, keeping checked and manual items"""
+    shopping_list = get_object_or_404(ShoppingList.objects.select_related('user'), pk=pk, user=request.user)
+    rebuild_shopping_list(shopping_list)
+    return Response(ShoppingListSerializer(_lists(request.user).get(pk=pk)).data)
+
+
+class ShoppingListItemCreateView(generics.CreateAPIView):
+    """Add a manual item to a shopping list"""
+    serializer_class = ShoppingListItemSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def perform_create(self, serializer):
+        shopping_list = get_object_or_404(ShoppingList, pk=self.kwargs['list_id'], user=self.request.user)
+        serializer.save(shopping_list=shopping_list)
+
+
+class ShoppingListItemDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """Check off, annotate, or remove a shopping list item"""
+    serializer_class = ShoppingListItemSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return ShoppingListItem.objects.filter(shopping_list__user=self.request.user)
+
+
+def _amount_text(item, amount):
+    if not amount:
+        return None
+    return item_quantity(ShoppingListItem(amount=amount, unit=item.unit, dimension=item.dimension))
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def shopping_list_to_buy(request, pk):
+    """Shopping list items minus what is already in the pantry, priced as bought"""
+    shopping_list = get_object_or_404(_lists(request.user), pk=pk)
+    needs = diff_shopping_list(shopping_list)
+    costs = estimate_costs(shopping_list, {pk: need.to_buy for pk, need in needs.items()})
+    
+    aisles = []
+    for group in group_by_aisle(shopping_list.items.all()):
+        items = []
+        for item in group['items']:
+            need = needs[item.pk]
+            data = ShoppingListItemSerializer(item, context={'costs': costs.items}).data
+            data['in_pantry'] = _amount_text(item, need.in_pantry)
+            # Items without an amount ("to taste") are always listed
+            data['to_buy'] = _amount_text(item, need.to_buy) if item.amount is not None else data['quantity']
+            data['covered'] = item.amount is not None and not need.to_buy
+            items.append(data)
+        aisles.append(dict(group, items=items))
+    return Response({
+        'id': shopping_list.pk,
+        'estimated_cost': cost_summary(costs, shopping_list.budget),
+        'aisles': aisles,
+    })
+
+
+class PantryItemListCreateView(generics.ListCreateAPIView):
+    """List pantry stock or add to it"""
+    serializer_class = PantryItemSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return PantryItem.objects.filter(user=self.request.user).select_related('ingredient')
+
+
+class PantryItemDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """Get, correct, or remove pantry stock"""
+    serializer_class = PantryItemSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return PantryItem.objects.filter(user=self.request.user).select_related('ingredient')